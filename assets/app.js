@@ -56,7 +56,9 @@
   // ---------- STATE ----------
   let tools = [];                 // full list
   let visible = [];               // filtered list
-  let fuse = null;                // Fuse index
+  let bySlug = new Map();         // slug -> tools (slugs are not unique)
+  let searchHits = null;          // ranked slugs for searchFor
+  let searchFor = "";
   let selectedCategories = new Set(); // multi-select chips (by slug)
   // Pricing filters are not used. This value remains fixed.
   let currentPricing = "all";
@@ -247,6 +249,98 @@ function installLogoErrorFallback() {
   }
 
 
+  // ---------- SEARCH INDEX ----------
+  // Sharded inverted index built by scripts/build/build_search_index.py. The
+  // manifest and the shards a query needs are fetched on first search; shard
+  // names carry a content hash, so the browser cache can keep them.
+  const SEARCH_BASE = "data/search/";
+  const TYPO_MIN_SHARE = 0.5;     // share of a token's trigrams a typo match must have
+  let searchManifest = null;
+  const searchShards = new Map();
+
+  // Must match tokens() in build_search_index.py
+  function searchTokens(text) {
+    const s = (text || "").normalize("NFKD").toLowerCase().replace(/\p{M}/gu, "");
+    return s.match(/[\p{L}\p{N}_]+/gu) || [];
+  }
+  function shardOf(key) {
+    const c = key[0];
+    if (c >= "a" && c <= "z") return c;
+    return c >= "0" && c <= "9" ? "0" : "_";
+  }
+  function trigrams(tok) {
+    const s = `^${tok}$`, out = new Set();
+    for (let i = 0; i + 3 <= s.length; i++) out.add(s.slice(i, i + 3));
+    return [...out];
+  }
+  function loadManifest() {
+    if (!searchManifest) {
+      searchManifest = fetch(SEARCH_BASE + "manifest.json", { cache: "no-cache" })
+        .then(res => { if (!res.ok) throw new Error("search manifest not found"); return res.json(); })
+        .catch(err => { searchManifest = null; throw err; });
+    }
+    return searchManifest;
+  }
+  function loadShard(manifest, id) {
+    const file = manifest.shards[id];
+    if (!file) return Promise.resolve({});
+    if (!searchShards.has(id)) {
+      searchShards.set(id, fetch(SEARCH_BASE + file)
+        .then(res => res.ok ? res.json() : {})
+        .catch(() => { searchShards.delete(id); return {}; }));
+    }
+    return searchShards.get(id);
+  }
+  // Per-token doc scores: prefix/whole-token postings first, trigram overlap as the typo fallback
+  async function tokenScores(manifest, tok) {
+    const scores = new Map();
+    const pre = await loadShard(manifest, "p-" + shardOf(tok));
+    const list = pre[tok] || pre[tok.slice(0, manifest.prefix.max)];
+    if (list) {
+      for (let i = 0; i < list.length; i += 2) scores.set(list[i], list[i + 1]);
+      return scores;
+    }
+    if (tok.length < 3) return scores;
+    const grams = trigrams(tok);
+    const shards = await Promise.all(grams.map(g => loadShard(manifest, "g-" + shardOf(g))));
+    const hits = new Map();
+    grams.forEach((g, n) => {
+      const l = shards[n][g] || [];
+      for (let i = 0; i < l.length; i += 2) {
+        const h = hits.get(l[i]) || { n: 0, w: 0 };
+        h.n++; h.w = Math.max(h.w, l[i + 1]);
+        hits.set(l[i], h);
+      }
+    });
+    for (const [doc, h] of hits) {
+      const share = h.n / grams.length;
+      if (share >= TYPO_MIN_SHARE) scores.set(doc, h.w * share * 0.5);
+    }
+    return scores;
+  }
+  // Ranked slugs matching every query token
+  async function searchIndex(query) {
+    const manifest = await loadManifest();
+    const toks = [...new Set(searchTokens(query))];
+    if (!toks.length) return [];
+    const perTok = await Promise.all(toks.map(t => tokenScores(manifest, t)));
+    perTok.sort((a, b) => a.size - b.size);
+    const total = new Map(perTok[0]);
+    for (const m of perTok.slice(1)) {
+      for (const [doc, s] of total) {
+        if (m.has(doc)) total.set(doc, s + m.get(doc));
+        else total.delete(doc);
+      }
+    }
+    return [...total].sort((a, b) => b[1] - a[1] || a[0] - b[0]).map(([doc]) => manifest.docs[doc]);
+  }
+  // Fallback when the index can't be loaded (e.g. not built yet): plain substring match
+  function searchPlain(query) {
+    const q = query.toLowerCase();
+    return tools.filter(t => [t.name, t.tagline, t.description, ...t.tags].some(s => s.toLowerCase().includes(q)))
+      .map(t => t.slug);
+  }
+
   // ---------- FETCH & INIT ----------
 async function init() {
 
@@ -410,6 +504,10 @@ async function init() {
     }
 
 
+    // A ?q= search starts fetching its index shards now, alongside tools.json;
+    // applyFilters then finds them in searchShards
+    if (currentQuery) searchIndex(currentQuery).catch(() => {});
+
     // Page from URL
     const pageParam = parseInt(qs.get("page") || "1", 10);
     currentPage = Number.isFinite(pageParam) && pageParam>0 ? pageParam : 1;
@@ -465,13 +563,8 @@ function renderShowcases() {
 renderShowcases();
 
 
-    // Fuse index
-    fuse = new Fuse(tools, {
-      includeScore: true,
-      threshold: 0.35,
-      ignoreLocation: true,
-      keys: ["name", "tagline", "description", "tags"]
-    });
+    bySlug = new Map();
+    for (const t of tools) bySlug.set(t.slug, [...(bySlug.get(t.slug) || []), t]);
 
     // Wire inputs
     elSearch.addEventListener("input", debounce((e)=>{
@@ -560,6 +653,19 @@ renderShowcases();
     return;
   }
   // ... (existing code continues)
+    // Search results arrive asynchronously; re-run once the index answers
+    if (currentQuery && searchFor !== currentQuery) {
+      const q = currentQuery;
+      searchIndex(q).catch(err => { console.warn(err); return searchPlain(q); }).then(hits => {
+        if (q !== currentQuery) return;  // a newer query is in flight
+        searchHits = hits;
+        searchFor = q;
+        applyFilters(first);
+      });
+      return;
+    }
+    const hitTools = currentQuery ? [...new Set(searchHits)].flatMap(s => bySlug.get(s) || []) : null;
+
     const catFilter = Array.from(selectedCategories);
     let arr = tools.slice();
 
@@ -570,17 +676,17 @@ renderShowcases();
       );
     }
 
-    // 2) Apply search filter (Fuse) to the working set
+    // 2) Apply search filter to the working set, in rank order
     if (currentQuery) {
-      const results = fuse.search(currentQuery);
-      arr = results.map(r => r.item);
+      const inCats = new Set(arr);
+      arr = hitTools.filter(t => inCats.has(t));
     }
 
     // --- CATEGORY COUNTS ---
     // Build a pool that only considers the current search. Used for badge counts on category chips.
     let pool = tools.slice();
     if (currentQuery) {
-      const poolResults = new Set(fuse.search(currentQuery).map(r => r.item));
+      const poolResults = new Set(hitTools);
       pool = pool.filter(t => poolResults.has(t));
     }
     const countsBySlug = {};
@@ -11,6 +11,9 @@ document.addEventListener('DOMContentLoaded', () => {
   if (!document.getElementById('best-things')) return;
   
   // Data definitions for each category. Images reference local assets.
+  // `id` is the canonical place id (data/places.ndjson) an item stands for;
+  // its Open/Closed badge then comes from data/open_now.json. Sample items
+  // with no place in the data keep their static `status`.
   const bestThingsData = {
     eat: {
       featured: {
@@ -35,6 +38,7 @@ document.addEventListener('DOMContentLoaded', () => {
       top: [
         {
           rankBadge: 'Top 5 in Restaurants',
+          id: 'bestmuscat:restaurant:seafood-grill',
           name: 'Seafood Grill',
           location: 'Shatti Al‑Qurum',
           status: 'open',
@@ -75,6 +79,7 @@ document.addEventListener('DOMContentLoaded', () => {
         },
         {
           rankBadge: 'Top 5 in Restaurants',
+          id: 'bestmuscat:restaurant:omani-house',
           name: 'Omani House',
           location: 'Ruwi',
           status: 'open',
@@ -161,6 +166,7 @@ document.addEventListener('DOMContentLoaded', () => {
     explore: {
       featured: {
         rank: '#1 Places to Explore in Muscat',
+        id: 'bestmuscat:hotel:the-chedi',
         name: 'The Chedi Muscat',
         location: 'Al Azaiba',
         status: 'open',
@@ -181,6 +187,7 @@ document.addEventListener('DOMContentLoaded', () => {
       top: [
         {
           rankBadge: 'Top 5 in Explore',
+          id: 'bestmuscat:hotel:al-bustan-palace',
           name: 'Al Bustan Palace',
           location: 'Muttrah',
           status: 'open',
@@ -211,6 +218,7 @@ document.addEventListener('DOMContentLoaded', () => {
         },
         {
           rankBadge: 'Top 5 in Explore',
+          id: 'bestmuscat:mall:muscat-grand-mall',
           name: 'Muscat Grand Mall',
           location: 'Al Khuwayr',
           status: 'open',
@@ -236,6 +244,37 @@ document.addEventListener('DOMContentLoaded', () => {
   // Elements
   const featuredEl = document.getElementById('featured-card');
   const listingsEl = document.getElementById('top-listings');
+  let currentCat = 'eat';
+
+  // Open-now index built from place opening hours (scripts/build/emit_open_now.py).
+  // Items with an `id` (canonical place id) found in it get a live status; the rest
+  // keep their static one.
+  let openIndex = null;
+
+  function weekSlot(index) {
+    const mins = Math.floor(Date.now() / 60000) + index.utc_offset_min;
+    const day = (Math.floor(mins / 1440) + 3) % 7; // 1970-01-01 was a Thursday; Monday = 0
+    return day * (1440 / index.slot_minutes) + Math.floor((mins % 1440) / index.slot_minutes);
+  }
+
+  function statusOf(item) {
+    const i = openIndex && item.id !== undefined ? openIndex.pos.get(item.id) : undefined;
+    if (i === undefined) return item.status;
+    const s = openIndex.slots[weekSlot(openIndex)];
+    if (!openIndex.bytes[s]) openIndex.bytes[s] = atob(openIndex.sets[s]);
+    return (openIndex.bytes[s].charCodeAt(i >> 3) >> (i & 7)) & 1 ? 'open' : 'closed';
+  }
+
+  fetch('data/open_now.json')
+    .then(res => (res.ok ? res.json() : null))
+    .then(index => {
+      if (!index || index.version !== 1) return;
+      index.pos = new Map(index.ids.map((id, i) => [id, i]));
+      index.bytes = [];
+      openIndex = index;
+      loadCategory(currentCat);
+    })
+    .catch(() => {}); // no index: static statuses
 
   /**
    * Renders the featured card for the given category.
@@ -256,7 +295,7 @@ document.addEventListener('DOMContentLoaded', () => {
         <h3 class="name">${item.name}</h3>
         <div class="meta">
           <span>${item.location}</span> ·
-          <span>${item.status === 'open' ? '<span class="status open">Open</span>' : '<span class="status closed">Closed</span>'}</span> ·
+          <span>${statusOf(item) === 'open' ? '<span class="status open">Open</span>' : '<span class="status closed">Closed</span>'}</span> ·
           <span>${item.price}</span> ·
           <span>${item.type}</span>
         </div>
@@ -275,8 +314,9 @@ document.addEventListener('DOMContentLoaded', () => {
    */
   function renderListings(list) {
     listingsEl.innerHTML = list.map(item => {
-      const statusClass = item.status === 'open' ? 'open' : 'closed';
-      const statusLabel = item.status === 'open' ? 'Open' : 'Closed';
+      const open = statusOf(item) === 'open';
+      const statusClass = open ? 'open' : 'closed';
+      const statusLabel = open ? 'Open' : 'Closed';
       return `
         <div class="listing-card">
           <img src="${item.image}" alt="">
@@ -298,6 +338,7 @@ document.addEventListener('DOMContentLoaded', () => {
   function loadCategory(cat) {
     const data = bestThingsData[cat];
     if (!data) return;
+    currentCat = cat;
     renderFeatured(data.featured);
     renderListings(data.top);
   }
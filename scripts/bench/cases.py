@@ -0,0 +1,144 @@
+"""
+Benchmark cases. Each one runs in its own process, pointed at a synthetic
+tree through PIPELINE_DATA_DIR (set before scripts.build is imported):
+
+    python -m scripts.bench.cases CASE RESULT_JSON
+
+A case does its setup (loading places, clearing earlier outputs so every
+run is a cold build) and returns the callable to time plus the number of
+items it processes. Stage output goes to stdout; timings go to RESULT_JSON.
+"""
+
+import json, random, shutil, sys, time
+from io import BytesIO
+
+from scripts.utils.instrument import rss_peak_mb
+
+CASES = {}
+
+def case(name, reconcile=False, scaled=True):
+    """Register a case. `reconcile` cases write the canonical places, so they
+    get a tree of their own; unscaled ones run once, not per size."""
+    def register(fn):
+        CASES[name] = {"setup": fn, "reconcile": reconcile, "scaled": scaled}
+        return fn
+    return register
+
+def _places():
+    from scripts.build.utils import read_places
+    return read_places()
+
+def _raw_records():
+    from scripts.build import reconcile_merge as m
+    return sum(len(f()) for f in (m.extract_osm, m.extract_otm, m.extract_wd))
+
+def _clear(*paths):
+    for p in paths:
+        if p.is_dir():
+            shutil.rmtree(p)
+        elif p.exists():
+            p.unlink()
+
+@case("reconcile_cold", reconcile=True)
+def _reconcile_cold():
+    from scripts.build import reconcile_merge, reconcile_state
+    _clear(reconcile_state.REGISTRY_PATH)
+    return reconcile_merge.reconcile_and_merge, _raw_records()
+
+@case("reconcile_warm", reconcile=True)
+def _reconcile_warm():
+    # every record already registered: the attach-by-id path
+    from scripts.build import reconcile_merge, reconcile_state
+    _clear(reconcile_state.REGISTRY_PATH)
+    reconcile_merge.reconcile_and_merge()
+    return reconcile_merge.reconcile_and_merge, _raw_records()
+
+@case("tools")
+def _tools():
+    from scripts.build import generate_tools_from_places as m
+    places = _places()
+    _clear(m.TOOLS)
+    return lambda: m.run(places), len(places)
+
+@case("search_index")
+def _search_index():
+    from scripts.build import build_search_index as m
+    places = _places()
+    _clear(m.OUT_DIR)
+    return lambda: m.run(places), len(places)
+
+@case("sitemaps")
+def _sitemaps():
+    from scripts.build import build_sitemaps as m
+    places = _places()
+    _clear(m.out_dir, m.STATE_PATH)
+    return lambda: m.run(places), len(places)
+
+@case("category_feeds")
+def _category_feeds():
+    from scripts.build import emit_category_feeds as m
+    places = _places()
+    _clear(m.out_dir)
+    return lambda: m.run(places), len(places)
+
+@case("open_now")
+def _open_now():
+    from scripts.build import emit_open_now as m
+    places = _places()
+    _clear(m.OUT)
+    return lambda: m.run(places), len(places)
+
+@case("qa_checks")
+def _qa_checks():
+    from scripts.build import qa_checks as m
+    places = _places()
+    return lambda: m.run(places), len(places)
+
+IMAGES, IMAGE_SIZE = 6, (3000, 2000)
+
+@case("image_variants", scaled=False)
+def _image_variants():
+    from PIL import Image, ImageDraw, ImageFilter
+    from scripts.build.image_variants import encode_variants
+    from scripts.build.utils import DATA_DIR
+    rng = random.Random(0)
+    sources = []
+    for _ in range(IMAGES):
+        # camera-like content: soft shapes plus sensor noise, saved as a high-quality JPEG
+        img = Image.new("RGB", IMAGE_SIZE, tuple(rng.randrange(256) for _ in range(3)))
+        draw = ImageDraw.Draw(img)
+        for _ in range(60):
+            x, y = rng.randrange(IMAGE_SIZE[0]), rng.randrange(IMAGE_SIZE[1])
+            r = rng.randrange(50, 600)
+            draw.ellipse((x - r, y - r, x + r, y + r), fill=tuple(rng.randrange(256) for _ in range(3)))
+        img = img.filter(ImageFilter.GaussianBlur(8))
+        noise = Image.effect_noise(IMAGE_SIZE, 24).convert("RGB")
+        img = Image.blend(img, noise, 0.15)
+        buf = BytesIO()
+        img.save(buf, "JPEG", quality=92)
+        sources.append(buf.getvalue())
+    out = DATA_DIR / "bench-media"
+    _clear(out)
+
+    def encode():
+        for i, data in enumerate(sources):
+            encode_variants(data, out / str(i), force=True)
+    return encode, len(sources)
+
+def main():
+    name, result_path = sys.argv[1], sys.argv[2]
+    fn, items = CASES[name]["setup"]()
+    setup_rss = rss_peak_mb()
+    t0 = time.perf_counter()
+    try:
+        fn()
+    except SystemExit as e:  # stages keep their CLI-style exits (e.g. QA thresholds)
+        if e.code not in (None, 0, 3):
+            raise
+    seconds = time.perf_counter() - t0
+    with open(result_path, "w", encoding="utf-8") as f:
+        json.dump({"seconds": seconds, "items": items,
+                   "setup_rss_mb": setup_rss, "peak_rss_mb": rss_peak_mb()}, f)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Pipeline benchmarks on synthetic data:
+
+    python -m scripts.bench [--sizes 1k 10k] [--cases ...] [--repeat 3]
+                            [--out PATH] [--baseline PATH] [--tolerance 0.25]
+
+For every size a seeded tree is generated once (scripts/bench/synth.py)
+and cached under .cache/bench/trees. Each case then runs --repeat times,
+each time in a fresh process, and its best time is kept along with peak
+RSS. Results are written as JSON (--out); with --baseline, cases whose best
+time grew by more than --tolerance (and BENCH_MIN_DELTA seconds) are listed
+and the exit status is 1, so a CI job can gate on it.
+"""
+
+import argparse, datetime, json, os, platform, subprocess, sys, tempfile
+from pathlib import Path
+
+from . import synth
+from .cases import CASES
+
+ROOT = Path(__file__).resolve().parents[2]
+BENCH_DIR = ROOT / ".cache" / "bench"
+RESULTS_VERSION = 1
+TOLERANCE = float(os.getenv("BENCH_TOLERANCE", "0.25"))
+MIN_DELTA = float(os.getenv("BENCH_MIN_DELTA", "0.05"))  # seconds; below this it's timer noise
+
+def tree(size, seed):
+    """Cached synthetic tree for a size; returns (stage data dir, reconcile data dir)."""
+    base = BENCH_DIR / "trees" / f"{size}-s{seed}-v{synth.GENERATOR_VERSION}"
+    data = base / "data"
+    if not (data / "synth.json").exists():
+        print(f"[bench] generating {size} tree → {base}")
+        synth.generate(synth.size(size), base, seed)
+    # reconcile writes places.ndjson, so it runs in a tree that shares only raw/
+    rec = base / "reconcile" / "data"
+    rec.mkdir(parents=True, exist_ok=True)
+    if not (rec / "raw").exists():
+        (rec / "raw").symlink_to(data / "raw", target_is_directory=True)
+    return data, rec
+
+def run_case(name, data_dir, log):
+    with tempfile.NamedTemporaryFile(suffix=".json", delete=False) as f:
+        result = Path(f.name)
+    try:
+        env = {**os.environ, "PIPELINE_DATA_DIR": str(data_dir)}
+        proc = subprocess.run([sys.executable, "-m", "scripts.bench.cases", name, str(result)],
+                              cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+        if proc.returncode != 0:
+            raise RuntimeError(f"{name} failed (exit {proc.returncode}), see {log.name}")
+        return json.loads(result.read_text(encoding="utf-8"))
+    finally:
+        result.unlink(missing_ok=True)
+
+def _max_mb(values):
+    values = [v for v in values if v is not None]  # None: no RSS figures on this platform
+    return max(values) if values else None
+
+def measure(name, data_dir, repeat, log):
+    runs = [run_case(name, data_dir, log) for _ in range(repeat)]
+    secs = sorted(r["seconds"] for r in runs)
+    best = secs[0]
+    return {
+        "best_s": round(best, 4),
+        "median_s": round(secs[len(secs) // 2], 4),
+        "runs_s": [round(r["seconds"], 4) for r in runs],
+        "items": runs[0]["items"],
+        "us_per_item": round(best / runs[0]["items"] * 1e6, 2) if runs[0]["items"] else None,
+        "peak_rss_mb": _max_mb(r["peak_rss_mb"] for r in runs),
+        "setup_rss_mb": _max_mb(r["setup_rss_mb"] for r in runs),
+    }
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """[(case, size, best, baseline best, ratio)] for every case that got slower than allowed."""
+    slower = []
+    for name, sizes in results["results"].items():
+        for size, r in sizes.items():
+            b = (baseline.get("results", {}).get(name) or {}).get(size)
+            if not b:
+                continue
+            ratio = r["best_s"] / b["best_s"] if b["best_s"] else float("inf")
+            if ratio > 1 + tolerance and r["best_s"] - b["best_s"] > MIN_DELTA:
+                slower.append((name, size, r["best_s"], b["best_s"], ratio))
+    return slower
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Benchmark the build pipeline on synthetic data")
+    ap.add_argument("--sizes", nargs="+", default=["1k", "10k"], help=f"Tree sizes: {', '.join(synth.SIZES)} or a number")
+    ap.add_argument("--cases", nargs="+", choices=sorted(CASES), help="Cases to run (default: all)")
+    ap.add_argument("--repeat", type=int, default=3, help="Runs per case; the best is reported")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", default=str(BENCH_DIR / "results.json"), help="Where to write the results JSON")
+    ap.add_argument("--baseline", help="Earlier results JSON to compare against")
+    ap.add_argument("--tolerance", type=float, default=TOLERANCE, help="Allowed slowdown, as a fraction")
+    args = ap.parse_args(argv)
+
+    names = args.cases or list(CASES)
+    results = {
+        "version": RESULTS_VERSION,
+        "created": datetime.datetime.now(datetime.timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "seed": args.seed,
+        "generator": synth.GENERATOR_VERSION,
+        "repeat": args.repeat,
+        "results": {},
+    }
+    BENCH_DIR.mkdir(parents=True, exist_ok=True)
+    with open(BENCH_DIR / "last-run.log", "w", encoding="utf-8") as log:
+        for size in args.sizes:
+            data, rec = tree(size, args.seed)
+            for name in names:
+                if not CASES[name]["scaled"] and size != args.sizes[0]:
+                    continue
+                label = size if CASES[name]["scaled"] else "fixed"
+                log.write(f"\n### {name} @ {label}\n")
+                log.flush()
+                r = measure(name, rec if CASES[name]["reconcile"] else data, args.repeat, log)
+                results["results"].setdefault(name, {})[label] = r
+                print(f"[bench] {name:15} {label:>6}  {r['best_s']:9.3f}s  {r['items']:>8} items  "
+                      f"{r['us_per_item'] or 0:10.1f} µs/item  {r['peak_rss_mb'] or 0:8.1f} MB")
+
+    out = Path(args.out)
+    out.parent.mkdir(parents=True, exist_ok=True)
+    out.write_text(json.dumps(results, indent=2) + "\n", encoding="utf-8")
+    print(f"[bench] results → {out}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text(encoding="utf-8"))
+        slower = compare(results, baseline, args.tolerance)
+        for name, size, now, then, ratio in slower:
+            print(f"[bench] SLOWER {name} @ {size}: {then:.3f}s → {now:.3f}s ({ratio:.2f}x)")
+        if slower:
+            sys.exit(1)
+        print(f"[bench] no case slower than {args.tolerance:.0%} over {args.baseline}")
@@ -0,0 +1,228 @@
+"""
+Seeded synthetic data trees for benchmarks.
+
+    python -m scripts.bench.synth 10k OUT_DIR [--seed N]
+
+Writes OUT_DIR/data/raw/{osm,opentripmap,wikidata} in the shapes the ingest
+fetchers produce, plus the canonical places (places.ndjson and places.json)
+for the build stages. Venues are scattered in Gaussian clusters inside the
+Muscat BBOX with a long-tailed mix of chains, generic names, Arabic names
+and one-off names. Each venue is in OSM and/or OTM; OTM copies drift a few
+metres and vary the name (case, generic words, typos), and a few percent
+of venues appear twice within one source (node + way), as in the real feeds.
+"""
+
+import argparse, json, math, random, re
+from pathlib import Path
+
+from scripts.build.utils import slugify, write_json, write_ndjson
+
+BBOX = (58.20, 23.45, 58.80, 23.80)  # lon_min, lat_min, lon_max, lat_max, as in scripts/ingest
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+GENERATOR_VERSION = 2  # bump when the output changes, so cached trees are rebuilt
+
+CATEGORIES = (("restaurant", 0.6), ("mall", 0.25), ("hotel", 0.15))
+P_OSM, P_OTM, P_WD = 0.7, 0.75, 0.03
+P_DUP_OSM, P_DUP_OTM = 0.03, 0.04
+P_CHAIN, P_ARABIC, P_GENERIC = 0.15, 0.12, 0.05
+CLUSTERS, CLUSTER_SIGMA_M = 40, 1500
+
+CHAINS = {
+    "restaurant": ["Pizza Hut", "KFC", "McDonald's", "Subway", "Starbucks", "Costa Coffee",
+                   "Burger King", "Hardee's", "Nando's", "Tim Hortons", "Papa John's", "Shawarma Maker"],
+    "mall": ["Lulu Hypermarket", "Carrefour", "Spar", "Al Fair Supermarket", "Nesto Hypermarket",
+             "Al Meera", "Safeer Hypermarket", "Khimji Ramdas"],
+    "hotel": ["Ibis", "Holiday Inn", "Crowne Plaza", "Radisson Blu", "Best Western", "Centara"],
+}
+WORDS = ("bustan", "luban", "bahar", "shatti", "qurum", "mouj", "ruwi", "khuwair", "ghubra", "seeb",
+         "muttrah", "sultan", "zaatar", "sidr", "jabal", "wadi", "nakheel", "fanar", "bahja", "reef",
+         "diwan", "majlis", "khor", "dar", "najma", "yasmeen", "kahwa", "halwa", "samak", "tannour",
+         "kebab", "biryani", "karak", "mandi", "shuwa", "oasis", "pearl", "palm", "marina", "corniche",
+         "crescent", "falcon", "desert", "harbour", "golden", "royal", "grand", "blue", "green", "old")
+PREFIXES = ("", "", "", "Al ", "Bait Al ", "Dar Al ", "The ", "Cafe ", "Ras Al ")
+SUFFIXES = {
+    "restaurant": ("", "Restaurant", "Restaurant", "Cafe", "Grill", "Kitchen", "Coffee Shop", "Sweets"),
+    "mall": ("", "Supermarket", "Trading", "Mall", "Shopping Centre", "Bakery", "Stores"),
+    "hotel": ("Hotel", "Hotel", "Hotel Apartments", "Resort", "Inn", "Suites", "Guest House"),
+}
+GENERIC = {"restaurant": ("Restaurant", "Coffee Shop", "Cafeteria"),
+           "mall": ("Supermarket", "Food Stuff", "Grocery"),
+           "hotel": ("Hotel", "Guest House")}
+ARABIC_WORDS = ("الصدف", "البستان", "اللبان", "البحر", "النخيل", "الخير", "السلطان", "الجبل",
+                "الوادي", "الفنار", "الريف", "الديوان", "المجلس", "الياسمين", "النجمة")
+ARABIC_KIND = {"restaurant": "مطعم", "mall": "سوق", "hotel": "فندق"}
+NEIGHBORHOODS = ("Qurum", "Muttrah", "Shatti Al Qurum", "Al Mouj", "Ruwi", "Al Khuwair", "Ghubra", "Seeb",
+                 "Al Khoudh", "Bausher", "Azaiba", "Al Amerat", "Wattayah", "Madinat Sultan Qaboos")
+HOURS = ("Sa-Th 12:00-23:00", "Mo-Fr 09:00-17:00", "24/7", "Sa-Th 08:00-13:00,16:00-22:00; Fr 16:00-23:00",
+         "Mo-Su 18:00-02:00", "Su-Th 10:00-22:00; Fr,Sa 10:00-24:00", "Sa-Th 07:00-23:00; Fr off")
+CUISINES = ("omani", "indian", "lebanese", "turkish", "italian", "chinese", "fast_food", "seafood",
+            "coffee", "pakistani", "iranian", "american")
+
+def pick(rng, weighted):
+    x = rng.random() * sum(w for _, w in weighted)
+    for v, w in weighted:
+        x -= w
+        if x <= 0:
+            return v
+    return weighted[-1][0]
+
+def venue_name(rng, cat):
+    r = rng.random()
+    if r < P_CHAIN:
+        chains = CHAINS[cat]
+        # Zipf-ish: the first chains are much more common
+        return chains[min(int(rng.paretovariate(1.2)) - 1, len(chains) - 1)]
+    if r < P_CHAIN + P_ARABIC:
+        return f"{ARABIC_KIND[cat]} {' '.join(rng.sample(ARABIC_WORDS, rng.choice((1, 1, 2))))}"
+    if r < P_CHAIN + P_ARABIC + P_GENERIC:
+        return rng.choice(GENERIC[cat])
+    words = " ".join(w.title() for w in rng.sample(WORDS, rng.choice((1, 1, 2, 2, 3))))
+    return f"{rng.choice(PREFIXES)}{words} {rng.choice(SUFFIXES[cat])}".strip()
+
+def variant(rng, name):
+    """How another source spells the same venue."""
+    r = rng.random()
+    if r < 0.55:
+        return name
+    if r < 0.70:
+        return name.lower()
+    if r < 0.82:
+        extra = rng.choice((" Muscat", " Restaurant", " Hotel", " Oman", " LLC"))
+        return name[:-len(extra)] if name.endswith(extra) else name + extra
+    if r < 0.94 and len(name) > 4:
+        i = rng.randrange(1, len(name) - 1)
+        return name[:i] + name[i + 1:] if rng.random() < 0.5 else name[:i] + name[i + 1] + name[i] + name[i + 2:]
+    return re.sub(r"^(Al|The) ", "", name) if re.match(r"^(Al|The) ", name) else f"{name} {rng.choice(NEIGHBORHOODS)}"
+
+def jitter(rng, lat, lon, sigma_m):
+    dlat = rng.gauss(0, sigma_m) / 111_320
+    dlon = rng.gauss(0, sigma_m) / (111_320 * math.cos(math.radians(lat)))
+    return round(lat + dlat, 7), round(lon + dlon, 7)
+
+def venues(n, seed):
+    rng = random.Random(seed)
+    centers = [((rng.uniform(BBOX[1], BBOX[3]), rng.uniform(BBOX[0], BBOX[2])), rng.uniform(0.3, 1.0))
+               for _ in range(CLUSTERS)]
+    for i in range(n):
+        clat, clon = pick(rng, centers)
+        lat, lon = jitter(rng, clat, clon, CLUSTER_SIGMA_M)
+        lat, lon = min(max(lat, BBOX[1]), BBOX[3]), min(max(lon, BBOX[0]), BBOX[2])
+        cat = pick(rng, CATEGORIES)
+        hood = rng.choice(NEIGHBORHOODS)
+        yield {
+            "i": i,
+            "name": venue_name(rng, cat),
+            "category": cat,
+            "lat": lat, "lon": lon,
+            "neighborhood": hood,
+            "address": f"{rng.choice(WORDS).title()} Street, {hood}" if rng.random() < 0.5 else None,
+            "website": f"https://www.{rng.choice(WORDS)}{i}.om" if rng.random() < 0.2 else None,
+        }
+
+def raw_records(vs, seed):
+    """(osm, otm, wikidata bindings) for a list of venues."""
+    rng = random.Random(seed + 1)
+    osm, otm, wd = [], [], []
+    next_id = 1_000_000_000
+    for v in vs:
+        in_osm = rng.random() < P_OSM
+        in_otm = not in_osm or rng.random() < P_OTM
+        loc = {"lat": v["lat"], "lon": v["lon"], "address": v["address"]}
+        osm_ids = []
+        if in_osm:
+            for dup in range(2 if rng.random() < P_DUP_OSM else 1):
+                next_id += rng.randint(1, 5000)
+                kind = "way" if dup else rng.choice(("node", "node", "node", "way"))
+                osm_ids.append(f"{kind}/{next_id}")
+                lat, lon = jitter(rng, v["lat"], v["lon"], 20) if dup else (v["lat"], v["lon"])
+                osm.append({"id": f"osm:{kind}:{next_id}", "name": v["name"] if not dup else variant(rng, v["name"]),
+                            "category": v["category"],
+                            "location": {**loc, "lat": lat, "lon": lon},
+                            "contacts": {"website": v["website"]},
+                            "opening_hours": HOURS[v["i"] % len(HOURS)] if v["i"] % 3 == 0 else None,
+                            "sources": {"osm": {"id": osm_ids[-1]}}})
+        if in_otm:
+            for dup in range(2 if rng.random() < P_DUP_OTM else 1):
+                if osm_ids and not dup:
+                    kind, num = osm_ids[0].split("/")
+                    xid = f"{kind[0].upper()}{num}"
+                else:
+                    next_id += rng.randint(1, 5000)
+                    xid = f"{rng.choice('NNNW')}{next_id}"
+                lat, lon = jitter(rng, v["lat"], v["lon"], 25)
+                otm.append({"xid": xid, "name": variant(rng, v["name"]), "_bm_category": v["category"],
+                            "location": {"lat": lat, "lon": lon,
+                                         "address": v["address"] if rng.random() < 0.6 else None},
+                            "contacts": {"website": v["website"] if rng.random() < 0.5 else None}})
+        if rng.random() < P_WD * (3 if v["category"] != "restaurant" else 0.5):
+            lat, lon = jitter(rng, v["lat"], v["lon"], 30)
+            b = {"item": {"value": f"http://www.wikidata.org/entity/Q{7_000_000 + v['i']}"},
+                 "itemLabel": {"value": variant(rng, v["name"])},
+                 "coord": {"value": f"Point({lon} {lat})"}}
+            if v["website"]:
+                b["website"] = {"value": v["website"]}
+            if rng.random() < 0.6:
+                b["image"] = {"value": f"http://commons.wikimedia.org/wiki/Special:FilePath/Synthetic{v['i']}.jpg"}
+            wd.append(b)
+    return osm, otm, wd
+
+def places(vs, seed):
+    """Canonical places, with the optional fields filled at plausible rates."""
+    rng = random.Random(seed + 2)
+    seen = {}
+    for v in vs:
+        slug = slugify(v["name"])[:80] or "place"
+        n = seen[slug] = seen.get(slug, 0) + 1
+        if n > 1:
+            slug = f"{slug}-{n}"
+        restaurant = v["category"] == "restaurant"
+        yield {
+            "id": f"bestmuscat:{v['category']}:{slug}",
+            "name": v["name"],
+            "category": v["category"],
+            "subcategories": [],
+            "neighborhood": v["neighborhood"],
+            "location": {"lat": v["lat"], "lon": v["lon"], "address": v["address"]},
+            "contacts": {"website": v["website"]},
+            "cuisines": rng.sample(CUISINES, rng.choice((1, 1, 2))) if restaurant and rng.random() < 0.5 else [],
+            "open_hours": HOURS[v["i"] % len(HOURS)] if rng.random() < 0.3 else None,
+            "price_tier": rng.randint(1, 4) if rng.random() < 0.4 else None,
+            "rating": {"overall": round(rng.uniform(3.0, 5.0), 1)} if rng.random() < 0.4 else {},
+            "amenities": [],
+            "photos": [{"src": f"data/media/{slug}/hero.webp"}] if rng.random() < 0.3 else [],
+            "wikimedia_image_url": None,
+            "sources": {"osm": {"id": f"node/{v['i']}"}},
+            "status": "active",
+        }
+
+def generate(n, out, seed=0):
+    """Write a synthetic tree for n venues under out/data; returns the data dir."""
+    data = Path(out) / "data"
+    vs = list(venues(n, seed))
+    osm, otm, wd = raw_records(vs, seed)
+    write_json(data / "raw/osm/places.json", osm)
+    write_json(data / "raw/opentripmap/places.json", otm)
+    write_json(data / "raw/wikidata/muscat.json", {"results": {"bindings": wd}})
+    canonical = list(places(vs, seed))
+    write_ndjson(data / "places.ndjson", canonical)
+    write_json(data / "places.json", canonical)
+    (data / "synth.json").write_text(json.dumps({
+        "version": GENERATOR_VERSION, "venues": n, "seed": seed,
+        "osm": len(osm), "opentripmap": len(otm), "wikidata": len(wd),
+    }), encoding="utf-8")
+    return data
+
+def size(label):
+    return SIZES.get(label.lower()) or int(label)
+
+def main():
+    ap = argparse.ArgumentParser(description="Write a synthetic data tree")
+    ap.add_argument("size", help=f"{', '.join(SIZES)} or a number of venues")
+    ap.add_argument("out", help="Directory to write <out>/data into")
+    ap.add_argument("--seed", type=int, default=0)
+    args = ap.parse_args()
+    data = generate(size(args.size), args.out, args.seed)
+    print(f"Wrote {(data / 'synth.json').read_text(encoding='utf-8')} → {data}")
+
+if __name__ == "__main__":
+    main()
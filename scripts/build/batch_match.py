@@ -0,0 +1,246 @@
+import os
+from collections import defaultdict
+
+import numpy as np
+from rapidfuzz import fuzz, process
+
+from . import match_features
+from .spatial_index import GridIndex
+
+EARTH_R = 6371000.0
+
+# Coarse block size (metres). Rows in one block are scored against every
+# record in the surrounding 3x3 blocks in a single matrix call, so this only
+# needs to be >= the match radius; larger blocks mean fewer, bigger matrices.
+BLOCK_M = float(os.getenv("RECONCILE_BLOCK_M", "2000"))
+
+# rapidfuzz cdist worker threads (-1 = all cores)
+WORKERS = int(os.getenv("RECONCILE_WORKERS", "-1"))
+
+def haversine_matrix(lat1, lon1, lat2, lon2) -> np.ndarray:
+    """Pairwise great-circle distances (m), shape (len(lat1), len(lat2)).
+
+    Same formula as utils.haversine_m, broadcast over two coordinate arrays.
+    """
+    lat1 = np.asarray(lat1, dtype=np.float64)[:, None]
+    lon1 = np.asarray(lon1, dtype=np.float64)[:, None]
+    lat2 = np.asarray(lat2, dtype=np.float64)[None, :]
+    lon2 = np.asarray(lon2, dtype=np.float64)[None, :]
+    phi1, phi2 = np.radians(lat1), np.radians(lat2)
+    dphi = np.radians(lat2 - lat1)
+    dlambda = np.radians(lon2 - lon1)
+    a = np.sin(dphi/2)**2 + np.cos(phi1)*np.cos(phi2)*np.sin(dlambda/2)**2
+    return 2*EARTH_R*np.arcsin(np.sqrt(a))
+
+def name_matrix(names1, names2, workers=WORKERS) -> np.ndarray:
+    """token_sort_ratio for every pair of (already normalized) names, scaled to 0..1."""
+    return process.cdist(names1, names2, scorer=fuzz.token_sort_ratio,
+                         dtype=np.float64, workers=workers) / 100.0
+
+def dup_matrix(core1, core2, workers=WORKERS) -> np.ndarray:
+    """Same-venue score (0..1) for pairs of core names from one source.
+
+    token_sort_ratio, raised to token_set_ratio when both names keep at least
+    two distinctive words, so "al bustan palace" matches "al bustan palace
+    ritz-carlton" but "grand" does not match "grand hyatt". Empty core names
+    never match.
+    """
+    sort = process.cdist(core1, core2, scorer=fuzz.token_sort_ratio, dtype=np.float64, workers=workers)
+    subset = process.cdist(core1, core2, scorer=fuzz.token_set_ratio, dtype=np.float64, workers=workers)
+    words1 = np.array([sum(len(t) > 2 for t in c.split()) for c in core1])[:, None]
+    words2 = np.array([sum(len(t) > 2 for t in c.split()) for c in core2])[None, :]
+    score = np.where((words1 >= 2) & (words2 >= 2), np.maximum(sort, subset), sort)
+    empty1 = np.array([not c for c in core1])[:, None]
+    empty2 = np.array([not c for c in core2])[None, :]
+    score[empty1 | empty2] = 0
+    return score / 100.0
+
+class _Points:
+    """Column arrays for a list of records, built once per matching pass."""
+
+    def __init__(self, records):
+        self.lat = np.array([r["location"]["lat"] for r in records], dtype=np.float64)
+        self.lon = np.array([r["location"]["lon"] for r in records], dtype=np.float64)
+        feats = [match_features.of(r) for r in records]
+        self.names = [f.norm for f in feats]
+        self.core = [f.core for f in feats]
+        self.phonetic = [f.phonetic for f in feats]
+        self.arabic = np.array([f.arabic for f in feats], dtype=bool)
+        self.no_key = np.array([not f.phonetic for f in feats], dtype=bool)
+
+    def named(self, ids, core=False):
+        """The ids whose (core) name is non-empty; nameless records can't pass a name threshold."""
+        names = self.core if core else self.names
+        return [k for k in ids if names[k]]
+
+def name_scores(rows, cols, br, bc, workers=WORKERS) -> np.ndarray:
+    """Name similarity (0..1) of rows[br] x cols[bc].
+
+    Names in the same script compare on their normalized form, an
+    Arabic-only name and a Latin one on the phonetic keys; empty names never
+    match. match_features.similarity is the pairwise version.
+    """
+    sim = name_matrix([rows.names[j] for j in br], [cols.names[k] for k in bc], workers)
+    empty = np.array([not rows.names[j] for j in br])[:, None] | np.array([not cols.names[k] for k in bc])[None, :]
+    mixed = rows.arabic[br][:, None] != cols.arabic[bc][None, :]
+    if mixed.any():
+        sim = np.where(mixed, name_matrix([rows.phonetic[j] for j in br], [cols.phonetic[k] for k in bc], workers), sim)
+        empty = np.where(mixed, rows.no_key[br][:, None] | cols.no_key[bc][None, :], empty)
+    sim[empty] = 0
+    return sim
+
+def dup_scores(rows, cols, br, bc, workers=WORKERS) -> np.ndarray:
+    """dup_matrix on the core names, or the phonetic keys for Arabic/Latin pairs."""
+    sim = dup_matrix([rows.core[j] for j in br], [cols.core[k] for k in bc], workers)
+    mixed = rows.arabic[br][:, None] != cols.arabic[bc][None, :]
+    if mixed.any():
+        key = name_matrix([rows.phonetic[j] for j in br], [cols.phonetic[k] for k in bc], workers)
+        key[rows.no_key[br][:, None] | cols.no_key[bc][None, :]] = 0
+        sim = np.where(mixed, key, sim)
+    return sim
+
+def _blocks(rows, cols, row_ids, col_ids, lat_bound, block_m):
+    """Yield (row_ids, col_ids) blocks: rows sharing a coarse cell and all columns around it."""
+    grid = GridIndex(block_m, lat_bound)
+    for k in col_ids:
+        grid.add(k, cols.lat[k], cols.lon[k])
+    by_cell = defaultdict(list)
+    for j in row_ids:
+        by_cell[grid.cell(rows.lat[j], rows.lon[j])].append(j)
+    for cell, block_rows in by_cell.items():
+        block_cols = grid.near_cell(cell)
+        if block_cols:
+            yield np.array(block_rows), np.array(block_cols)
+
+def match_otm(osm, otm, lat_bound, radius=200, sim_thr=0.85, block_m=BLOCK_M, workers=WORKERS):
+    """Pick the merge target for every OTM record.
+
+    Returns one entry per OTM record: the index into `osm + otm` of the record
+    it merges into, or None if it is appended as a new place. Columns are in
+    merged-list order (OSM first, then OTM as appended), so taking the first
+    passing column that is already in the merged list reproduces the
+    sequential first-match scan.
+    """
+    pool = osm + otm
+    cols = _Points(pool)
+    rows = _Points(otm)
+    n_osm = len(osm)
+    hits = [()] * len(otm)
+
+    by_cat = defaultdict(lambda: ([], []))
+    for k, r in enumerate(pool):
+        by_cat[r["category"]][1].append(k)
+    for j, r in enumerate(otm):
+        by_cat[r["category"]][0].append(j)
+
+    for row_ids, col_ids in by_cat.values():
+        for br, bc in _blocks(rows, cols, rows.named(row_ids), cols.named(col_ids), lat_bound, block_m):
+            ok = haversine_matrix(rows.lat[br], rows.lon[br], cols.lat[bc], cols.lon[bc]) <= radius
+            near = np.flatnonzero(ok.any(axis=0))
+            if not len(near):
+                continue
+            ok = ok[:, near]
+            sim = name_scores(rows, cols, br, bc[near], workers)
+            ok &= sim >= sim_thr
+            for r, j in enumerate(br):
+                hits[j] = bc[near[np.flatnonzero(ok[r])]].tolist()
+
+    # resolve in OTM order: an OTM column only counts once it has been appended
+    live = [True] * n_osm + [False] * len(otm)
+    targets = []
+    for j in range(len(otm)):
+        k = next((k for k in hits[j] if live[k]), None)
+        if k is None:
+            live[n_osm + j] = True
+        targets.append(k)
+    return targets
+
+def match_wd(merged, wd, lat_bound, radius=120, block_m=BLOCK_M, workers=WORKERS):
+    """Pick the enrichment target (index into `merged`) for every Wikidata row, or None.
+
+    score = sim + proximity * 0.2 over records within `radius`; the best
+    positive score wins and ties go to the earliest merged record.
+    """
+    cols = _Points(merged)
+    rows = _Points(wd)
+    targets = [None] * len(wd)
+    for br, bc in _blocks(rows, cols, range(len(wd)), range(len(merged)), lat_bound, block_m):
+        d = haversine_matrix(rows.lat[br], rows.lon[br], cols.lat[bc], cols.lon[bc])
+        within = d <= radius
+        near = np.flatnonzero(within.any(axis=0))
+        if not len(near):
+            continue
+        d, within = d[:, near], within[:, near]
+        sim = name_scores(rows, cols, br, bc[near], workers)
+        score = sim + (1 - np.minimum(d/radius, 1)) * 0.2
+        score[~within] = -np.inf
+        best = score.argmax(axis=1)
+        for r, j in enumerate(br):
+            if score[r, best[r]] > 0:
+                targets[j] = int(bc[near[best[r]]])
+    return targets
+
+def duplicate_pairs(records, lat_bound, radius=150, sim_thr=0.9, block_m=BLOCK_M, workers=WORKERS):
+    """Yield (i, j), i < j, for records of one source that look like the same venue.
+
+    Same category, within `radius` metres and at `sim_thr` dup_matrix score.
+    """
+    pts = _Points(records)
+    by_cat = defaultdict(list)
+    for k, r in enumerate(records):
+        by_cat[r["category"]].append(k)
+    for ids in by_cat.values():
+        ids = pts.named(ids, core=True)
+        for br, bc in _blocks(pts, pts, ids, ids, lat_bound, block_m):
+            ok = haversine_matrix(pts.lat[br], pts.lon[br], pts.lat[bc], pts.lon[bc]) <= radius
+            ok &= br[:, None] < bc[None, :]
+            near = np.flatnonzero(ok.any(axis=0))
+            if not len(near):
+                continue
+            sim = dup_scores(pts, pts, br, bc[near], workers)
+            ok = ok[:, near] & (sim >= sim_thr)
+            for r, c in zip(*np.nonzero(ok)):
+                yield int(br[r]), int(bc[near[c]])
+
+def match_known(known, new, lat_bound, known_src, new_src, cross_src=~0, radius=200, sim_thr=0.85,
+                dup_radius=150, dup_thr=0.9, block_m=BLOCK_M, workers=WORKERS):
+    """Pick the known place (index into `known`) each new cluster folds into, or None.
+
+    `known` and `new` are the clusters' seed records; `known_src` and
+    `new_src` are bitmasks of the sources in each cluster. A new cluster
+    matches a known place of the same category within `radius` at `sim_thr`
+    name similarity when either side has a `cross_src` source, or one
+    sharing a source that passes the duplicate rule (`dup_radius`,
+    `dup_thr`, see dup_matrix). The first known place wins.
+    """
+    cols = _Points(known)
+    rows = _Points(new)
+    known_src, new_src = np.asarray(known_src), np.asarray(new_src)
+    targets = [None] * len(new)
+
+    by_cat = defaultdict(lambda: ([], []))
+    for k, r in enumerate(known):
+        by_cat[r["category"]][1].append(k)
+    for j, r in enumerate(new):
+        by_cat[r["category"]][0].append(j)
+
+    for row_ids, col_ids in by_cat.values():
+        for br, bc in _blocks(rows, cols, rows.named(row_ids), cols.named(col_ids), lat_bound, block_m):
+            d = haversine_matrix(rows.lat[br], rows.lon[br], cols.lat[bc], cols.lon[bc])
+            rs, cs = new_src[br][:, None], known_src[bc][None, :]
+            cross = (d <= radius) & (((rs | cs) & cross_src) != 0)
+            dup = (d <= dup_radius) & ((rs & cs) != 0)
+            near = np.flatnonzero((cross | dup).any(axis=0))
+            if not len(near):
+                continue
+            cross, dup = cross[:, near], dup[:, near]
+            sim = name_scores(rows, cols, br, bc[near], workers)
+            ok = cross & (sim >= sim_thr)
+            if dup.any():
+                dsim = dup_scores(rows, cols, br, bc[near], workers)
+                ok |= dup & (dsim >= dup_thr)
+            for r, j in enumerate(br):
+                hit = np.flatnonzero(ok[r])
+                if len(hit):
+                    targets[j] = int(bc[near[hit[0]]])  # columns are sorted, so this is the first
+    return targets
@@ -1,16 +1,143 @@
-# Simple search index builder (basic subset for Fuse-like fields)
-import json, hashlib
-places = json.load(open("data/places.json"))
-index = []
-for p in places:
-    index.append({
-        "slug": p["slug"],
-        "name": p["name"],
-        "categories": p.get("categories", []),
-        "neighborhood": (p.get("location") or {}).get("neighborhood"),
-        "badges": p.get("badges", []),
-        "cuisines": p.get("cuisines", []),
-        "rating": p.get("rating_overall", 0)
-    })
-open("data/search-index.json","w").write(json.dumps(index, indent=2))
-print("Wrote data/search-index.json")
+"""
+Build the sharded inverted search index the front-end loads lazily.
+
+data/search/manifest.json lists the documents (tools.json slugs, in index
+order), the field weights and the shard files. Postings are
+{key: [doc, score, doc, score, ...]} and live in two families of shards:
+
+  p-<c>.<hash>.json  whole tokens and their edge n-grams (prefixes), sharded
+                     by the key's first character (a-z, 0 for digits, _ for
+                     anything else); one shard per query token
+  g-<c>.<hash>.json  trigrams of "^token$", for typo tolerance; only fetched
+                     when a query token has no prefix hit
+
+A prefix posting scores PREFIX_FACTOR of the field weight, so whole-word
+matches rank above partial ones. Besides the place fields, the card text
+from tools.json (tagline, description, tags) is indexed at low weights, so
+the index answers every query the old in-browser Fuse search did.
+Shard file names carry a content hash, so they can be cached forever;
+the manifest itself is small and always refetched.
+
+Tokenization must stay in sync with searchTokens() in assets/app.js.
+"""
+
+import hashlib, json, re, unicodedata
+from collections import defaultdict
+
+from .utils import DATA_DIR, iter_places
+from .generate_tools_from_places import CAT_MAP, to_tool
+
+OUT_DIR = DATA_DIR / "search"
+MANIFEST = OUT_DIR / "manifest.json"
+INDEX_VERSION = 2  # 2 adds the tagline, description and tags fields
+
+# Integer weights keep the postings compact
+FIELD_WEIGHTS = {"name": 10, "category": 4, "neighborhood": 3, "cuisine": 3,
+                 "tags": 3, "tagline": 2, "description": 1}
+PREFIX_FACTOR = 0.6
+MIN_PREFIX = 2
+MAX_PREFIX = 12
+
+_TOKEN = re.compile(r"\w+")
+
+def tokens(text: str) -> list[str]:
+    """Casefold, drop combining marks (accents, Arabic harakat), split on non-word characters."""
+    s = unicodedata.normalize("NFKD", text or "").casefold()
+    s = "".join(ch for ch in s if not unicodedata.combining(ch))
+    return _TOKEN.findall(s)
+
+def prefixes(tok: str):
+    return (tok[:n] for n in range(MIN_PREFIX, min(len(tok), MAX_PREFIX + 1)))
+
+def trigrams(tok: str) -> set[str]:
+    s = f"^{tok}$"
+    return {s[i:i + 3] for i in range(len(s) - 2)}
+
+def shard_of(key: str) -> str:
+    c = key[0]
+    if "a" <= c <= "z":
+        return c
+    return "0" if "0" <= c <= "9" else "_"  # digits share one shard; so does every other script
+
+def fields(p, tool) -> dict:
+    """Text per indexed field for a place and its tools.json card."""
+    cat = (p.get("category") or "").strip().lower()
+    loc = p.get("location") or {}
+    return {
+        "name": [p.get("name") or ""],
+        "category": [cat, CAT_MAP[cat]],
+        "neighborhood": [loc.get("neighborhood") or ""],
+        "cuisine": list(p.get("cuisines") or []) + list(p.get("subcategories") or []),
+        "tags": list(tool.get("tags") or []),
+        "tagline": [tool.get("tagline") or ""],
+        "description": [tool.get("description") or ""],
+    }
+
+def build(places):
+    """Returns (slugs, prefix postings, trigram postings) for the places tools.json exports."""
+    slugs = []
+    postings = {"p": defaultdict(dict), "g": defaultdict(dict)}
+    for p in places:
+        tool = to_tool(p)
+        if tool is None:
+            continue  # not exported to tools.json
+        doc = len(slugs)
+        slugs.append(tool["slug"])
+        for field, values in fields(p, tool).items():
+            w = FIELD_WEIGHTS[field]
+            for tok in {t for v in values for t in tokens(v)}:
+                keys = [(tok, w)] + [(pre, round(w * PREFIX_FACTOR)) for pre in prefixes(tok)]
+                for key, score in keys:
+                    row = postings["p"][key]
+                    row[doc] = max(row.get(doc, 0), score)
+                for key in trigrams(tok):
+                    row = postings["g"][key]
+                    row[doc] = max(row.get(doc, 0), w)
+    return slugs, postings["p"], postings["g"]
+
+def _shards(family, postings):
+    by_shard = defaultdict(dict)
+    for key in sorted(postings):
+        flat = []
+        for doc, score in sorted(postings[key].items()):
+            flat += (doc, score)
+        by_shard[shard_of(key)][key] = flat
+    for shard, body in sorted(by_shard.items()):
+        blob = json.dumps(body, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        yield f"{family}-{shard}", f"{family}-{shard}.{hashlib.sha1(blob).hexdigest()[:10]}.json", blob
+
+def run(places):
+    slugs, pre, tri = build(places)
+
+    OUT_DIR.mkdir(parents=True, exist_ok=True)
+    files, total = {}, 0
+    for family, postings in (("p", pre), ("g", tri)):
+        for shard_id, name, blob in _shards(family, postings):
+            path = OUT_DIR / name
+            if not path.exists():
+                path.write_bytes(blob)
+            files[shard_id] = name
+            total += len(blob)
+
+    manifest = {
+        "version": INDEX_VERSION,
+        "docs": slugs,
+        "fields": FIELD_WEIGHTS,
+        "prefix": {"min": MIN_PREFIX, "max": MAX_PREFIX},
+        "shards": files,
+    }
+    MANIFEST.write_text(json.dumps(manifest, ensure_ascii=False, separators=(",", ":")), encoding="utf-8")
+
+    # drop shards from earlier builds
+    keep = set(files.values()) | {MANIFEST.name}
+    for f in OUT_DIR.glob("*.json"):
+        if f.name not in keep:
+            f.unlink()
+    print(f"Wrote search index: {len(slugs)} docs, {len(pre)} prefix keys, "
+          f"{len(tri)} trigram keys, {len(files)} shards ({total // 1024} KB) → {OUT_DIR}")
+
+def main():
+    run(iter_places())
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,90 @@
-import json, os, pathlib, datetime
+"""
+Place sitemaps: gzip-compressed chunks of up to CHUNK_SIZE URLs plus an index.
+
+Each URL's lastmod is the date its place content last changed: a content
+hash per URL is kept in data/sitemap_state.json, and the stored date is
+reused while the hash is unchanged. A chunk is only rewritten when one of
+its (loc, lastmod) entries changed, so an unchanged build rewrites no
+chunks.
+"""
+
+import datetime, gzip, hashlib, os
 from urllib.parse import quote
+from xml.sax.saxutils import escape
+
+from .utils import DATA_DIR, iter_places, read_json, write_json
+from .reconcile_state import record_hash
 
 BASE_URL = os.getenv("SITE_BASE_URL", "https://<your-domain-or-pages-url>")
-places = json.load(open("data/places.json"))
-out_dir = pathlib.Path("data/sitemaps"); out_dir.mkdir(parents=True, exist_ok=True)
+CHUNK_SIZE = int(os.getenv("SITEMAP_CHUNK_SIZE", "50000"))  # protocol limit is 50,000 URLs per file
+out_dir = DATA_DIR / "sitemaps"
+STATE_PATH = DATA_DIR / "sitemap_state.json"
+INDEX = "sitemap-index.xml"
 
 def url(loc):
     return f"{BASE_URL.rstrip('/')}/{loc.lstrip('/')}"
 
-urls = [url(f"tool.html?slug={p['slug']}") for p in places]
-def sm(urls):
-    parts = ["<?xml version='1.0' encoding='UTF-8'?>",
-             "<urlset xmlns='http://www.sitemaps.org/schemas/sitemap/0.9'>"]
-    today = datetime.date.today().isoformat()
-    for u in urls:
-        parts.append(f"<url><loc>{u}</loc><lastmod>{today}</lastmod></url>")
-    parts.append("</urlset>")
-    return "\n".join(parts)
-
-(open(out_dir/"sitemap-places.xml","w")).write(sm(urls))
-(open(out_dir/"sitemap-index.xml","w")).write("""<?xml version='1.0' encoding='UTF-8'?>
-<sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">
-  <sitemap><loc>""" + url("data/sitemaps/sitemap-places.xml") + """</loc></sitemap>
-</sitemapindex>
-""")
-print("Wrote sitemaps")
+def chunk_name(i):
+    return f"sitemap-places-{i + 1}.xml.gz"
+
+def entries(places, prev, today):
+    """[(loc, lastmod)] in place order, plus the new per-URL state."""
+    hashes = {}
+    for p in places:
+        # same slug as tools.json: last segment of "bestmuscat:category:slug"
+        loc = url(f"tool.html?slug={quote(p.get('slug') or p['id'].split(':')[-1])}")
+        h = record_hash(p)
+        hashes[loc] = h if loc not in hashes else record_hash([hashes[loc], h])  # slugs can repeat
+    urls = {}
+    for loc, h in hashes.items():
+        old = prev.get(loc)
+        urls[loc] = {"hash": h, "lastmod": old["lastmod"] if old and old["hash"] == h else today}
+    return [(loc, u["lastmod"]) for loc, u in urls.items()], urls
+
+def write_chunk(path, rows):
+    tmp = path.with_name(path.name + ".tmp")
+    # mtime=0 keeps the gzip bytes identical for identical content
+    with open(tmp, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", mtime=0) as f:
+        f.write(b"<?xml version='1.0' encoding='UTF-8'?>\n"
+                b"<urlset xmlns='http://www.sitemaps.org/schemas/sitemap/0.9'>\n")
+        for loc, lastmod in rows:
+            f.write(f"<url><loc>{escape(loc)}</loc><lastmod>{lastmod}</lastmod></url>\n".encode("utf-8"))
+        f.write(b"</urlset>\n")
+    os.replace(tmp, path)
+
+def run(places):
+    out_dir.mkdir(parents=True, exist_ok=True)
+    state = read_json(STATE_PATH, default={}) or {}
+    today = datetime.datetime.now(datetime.timezone.utc).date().isoformat()
+    rows, urls = entries(places, state.get("urls", {}), today)
+
+    chunks, written = {}, 0
+    for i in range(0, max(len(rows), 1), CHUNK_SIZE):
+        part = rows[i:i + CHUNK_SIZE]
+        name = chunk_name(i // CHUNK_SIZE)
+        digest = hashlib.sha1("".join(f"{loc}\t{lm}\n" for loc, lm in part).encode("utf-8")).hexdigest()
+        chunks[name] = {"digest": digest, "lastmod": max((lm for _, lm in part), default=today)}
+        if (state.get("chunks", {}).get(name) or {}).get("digest") != digest or not (out_dir/name).exists():
+            write_chunk(out_dir/name, part)
+            written += 1
+
+    for f in out_dir.glob("sitemap-places*.xml*"):
+        if f.name not in chunks:
+            f.unlink()  # chunks past the end, and the old uncompressed sitemap
+
+    index = ["<?xml version='1.0' encoding='UTF-8'?>",
+             "<sitemapindex xmlns='http://www.sitemaps.org/schemas/sitemap/0.9'>"]
+    for name, c in chunks.items():
+        index.append(f"  <sitemap><loc>{escape(url(f'data/sitemaps/{name}'))}</loc>"
+                     f"<lastmod>{c['lastmod']}</lastmod></sitemap>")
+    index.append("</sitemapindex>\n")
+    (out_dir/INDEX).write_text("\n".join(index), encoding="utf-8")
+
+    write_json(STATE_PATH, {"urls": urls, "chunks": chunks})
+    print(f"Wrote sitemaps: {len(rows)} URLs in {len(chunks)} chunk(s), {written} rewritten")
+
+def main():
+    run(iter_places())
+
+if __name__ == "__main__":
+    main()
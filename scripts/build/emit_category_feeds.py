@@ -1,11 +1,73 @@
-import json, os, pathlib
-places = json.load(open("data/places.json"))
-out_dir = pathlib.Path("data/categories"); out_dir.mkdir(parents=True, exist_ok=True)
-by_cat = {}
-for p in places:
-    for c in p.get("categories",[]):
-        by_cat.setdefault(c, []).append(p)
-for c, rows in by_cat.items():
-    fn = out_dir / (c.lower().replace(" ","-") + ".json")
-    fn.write_text(json.dumps(rows, indent=2), encoding="utf-8")
-print("Wrote category shards to data/categories/")
+"""
+Paged category feeds for listing views.
+
+Each place is projected to the card fields (FIELDS, as in tools.json plus
+coordinates and rating), ranked by rank_key() and split into PAGE_SIZE
+pages: data/categories/<category>-<n>.<hash>.json. The hash is of the page
+content, so pages can be cached as immutable; data/categories/manifest.json
+(small, always refetched) lists the pages and counts per category.
+"""
+
+import hashlib, json, os
+
+from .utils import DATA_DIR, iter_places, slugify, dumps_json, write_json
+from .generate_tools_from_places import to_tool
+
+out_dir = DATA_DIR / "categories"
+MANIFEST = out_dir / "manifest.json"
+FEED_VERSION = 1
+
+PAGE_SIZE = int(os.getenv("FEED_PAGE_SIZE", "45"))  # five 3x3 grid pages
+FIELDS = ("slug", "name", "url", "tagline", "image", "categories")
+
+def rating(p) -> float:
+    r = p.get("rating")
+    r = r.get("overall") if isinstance(r, dict) else r
+    return float(r or p.get("rating_overall") or 0)
+
+def rank_key(p):
+    """Best rated first, then places with a photo, then by name."""
+    return (-rating(p), not p.get("photos"), (p.get("name") or "").casefold(), p.get("id") or "")
+
+def project(p, tool):
+    row = {k: tool[k] for k in FIELDS}
+    loc = p.get("location") or {}
+    row["lat"], row["lon"] = loc.get("lat"), loc.get("lon")
+    if rating(p):
+        row["rating"] = rating(p)
+    return row
+
+def run(places):
+    out_dir.mkdir(parents=True, exist_ok=True)
+    by_cat = {}
+    for p in places:
+        tool = to_tool(p)
+        if tool:
+            by_cat.setdefault(tool["categories"][0], []).append((rank_key(p), project(p, tool)))
+
+    cats, files = {}, set()
+    for name, rows in sorted(by_cat.items()):
+        slug = slugify(name)
+        rows.sort(key=lambda r: r[0])
+        pages = []
+        for i in range(0, len(rows), PAGE_SIZE):
+            blob = dumps_json([row for _, row in rows[i:i + PAGE_SIZE]], pretty=False)
+            fn = f"{slug}-{len(pages) + 1}.{hashlib.sha1(blob.encode('utf-8')).hexdigest()[:10]}.json"
+            if not (out_dir / fn).exists():
+                (out_dir / fn).write_text(blob, encoding="utf-8")
+            pages.append(fn)
+        cats[slug] = {"name": name, "count": len(rows), "pages": pages}
+        files.update(pages)
+
+    write_json(MANIFEST, {"version": FEED_VERSION, "page_size": PAGE_SIZE, "categories": cats})
+    for f in out_dir.glob("*.json"):
+        if f.name not in files and f != MANIFEST:
+            f.unlink()  # pages from earlier builds, and the old unpaged feeds
+    summary = ", ".join(f"{s} {c['count']} in {len(c['pages'])} pages" for s, c in cats.items())
+    print(f"Wrote category feeds: {summary}")
+
+def main():
+    run(iter_places())
+
+if __name__ == "__main__":
+    main()
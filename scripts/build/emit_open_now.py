@@ -0,0 +1,71 @@
+"""
+Open-now index: which places are open in each quarter hour of the week.
+
+Every place's open_hours is parsed into a weekly bitmap
+(scripts/enrich/hours_parser.py). data/open_now.json then holds
+
+    ids     canonical place ids ("bestmuscat:restaurant:pizza-hut-2"), in index order
+    sets    distinct "open" bitsets over ids, base64, bit i = ids[i] (little-endian bytes)
+    slots   672 indices into sets, slot 0 = Monday 00:00 at utc_offset_min
+
+Most slots of a week repeat one of a few sets (nights, mornings, evenings),
+so the index stays small. A page finds its slot from the clock and tests
+one bit per badge; nothing is parsed at view time.
+"""
+
+import base64
+
+import numpy as np
+
+from .utils import DATA_DIR, iter_places, write_json
+from scripts.enrich import hours_parser
+
+OUT = DATA_DIR / "open_now.json"
+INDEX_VERSION = 1
+
+def run(places):
+    ids, weeks, seen, unparsed, dups = [], [], set(), 0, []
+    for p in places:
+        pid = p.get("id")
+        try:
+            week = hours_parser.parse(p.get("open_hours"))
+        except ValueError:
+            unparsed += 1
+            continue
+        if week is None or not pid:
+            continue
+        if pid in seen:  # ids are unique by construction; never let one place show another's hours
+            dups.append(pid)
+            continue
+        seen.add(pid)
+        ids.append(pid)
+        weeks.append(week)
+
+    bits = hours_parser.to_array(weeks)
+    by_slot = np.packbits(hours_parser.open_matrix(bits).T, axis=1, bitorder="little")  # (672, ceil(n/8))
+    sets, index, slots = [], {}, []
+    for row in by_slot:
+        key = row.tobytes()
+        if key not in index:
+            index[key] = len(sets)
+            sets.append(base64.b64encode(key).decode("ascii"))
+        slots.append(index[key])
+
+    write_json(OUT, {
+        "version": INDEX_VERSION,
+        "utc_offset_min": hours_parser.UTC_OFFSET_MIN,
+        "slot_minutes": hours_parser.SLOT_MIN,
+        "ids": ids,
+        "sets": sets,
+        "slots": slots,
+    }, pretty=False)
+    print(f"Wrote {OUT} with {len(ids)} places with hours, {len(sets)} distinct slot sets"
+          + (f" ({unparsed} unparsed hours skipped)" if unparsed else ""))
+    if dups:
+        print(f"open_now: skipped {len(dups)} repeated place ids, e.g. {', '.join(list(dict.fromkeys(dups))[:5])}")
+
+def main():
+    run(iter_places())
+
+if __name__ == "__main__":
+    main()
@@ -1,25 +1,47 @@
-import os, json, requests
+import hashlib, os, json, multiprocessing
+from collections import defaultdict, deque
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor, wait, FIRST_COMPLETED
 from io import BytesIO
 from PIL import Image
 from pathlib import Path
 
-from .utils import DATA_DIR, MEDIA_DIR, read_json, write_json
+from scripts.utils import http_client as http, instrument
+from scripts.utils.ratelimit import HostLimiter
+from .utils import DATA_DIR, MEDIA_DIR, places_path, read_places, write_places
+from . import image_variants
 
 OPENVERSE_ENDPOINT = "https://api.openverse.org/v1/images/"
 
-def _download_image(url: str) -> Image.Image:
-    r = requests.get(url, timeout=60)
+# Source images and Commons lookups are effectively immutable; searches drift slowly
+IMAGE_TTL = 30 * http.DAY
+SEARCH_TTL = 7 * http.DAY
+
+# Pipeline sizing: network threads, simultaneous requests per host, encoder processes
+IO_WORKERS = int(os.getenv("PHOTO_IO_WORKERS", "8"))
+PER_HOST = int(os.getenv("PHOTO_PER_HOST", "4"))
+ENCODE_WORKERS = int(os.getenv("PHOTO_ENCODE_WORKERS", str(os.cpu_count() or 2)))
+
+# One JSON line per finished place; lets an interrupted run resume where it stopped.
+# The first line names the places file and photo settings it was made for;
+# a checkpoint for anything else is discarded. Removed after a finished run.
+CHECKPOINT = DATA_DIR / "photos_checkpoint.jsonl"
+
+HOSTS = HostLimiter(PER_HOST)
+
+def _get(url, **kw):
+    with HOSTS.slot(url):
+        return http.get(url, **kw)
+
+def _download_image(url: str) -> bytes:
+    """Fetch raw image bytes; only the header is parsed here, decoding happens in the encoder."""
+    r = _get(url, timeout=60, ttl=IMAGE_TTL)
     r.raise_for_status()
-    img = Image.open(BytesIO(r.content))
-    if img.mode not in ("RGB", "RGBA"):
-        img = img.convert("RGB")
-    return img
+    Image.open(BytesIO(r.content))  # raises if the payload isn't an image
+    return r.content
 
-def _save_variants(img: Image.Image, outdir: Path):
-    outdir.mkdir(parents=True, exist_ok=True)
-    im = img.copy(); im.thumbnail((1600, 1200)); im.save(outdir/"hero.webp", "WEBP", quality=85)
-    im = img.copy(); im.thumbnail((640, 480)); im.save(outdir/"thumb.webp", "WEBP", quality=82)
-    im = img.copy(); im.thumbnail((1200, 630)); im.save(outdir/"social.jpg", "JPEG", quality=86)
+def _encode_job(data: bytes, outdir: str):
+    # runs in the process pool
+    image_variants.encode_variants(data, Path(outdir), force=True)
 
 def _resolve_commons_image_url(file_page_url: str) -> str | None:
     # Converts https://commons.wikimedia.org/wiki/File:XYZ.jpg → original file URL via API
@@ -35,7 +57,7 @@ def _resolve_commons_image_url(file_page_url: str) -> str | None:
         "titles": title
     }
     try:
-        r = requests.get(api, params=params, timeout=30, headers={"User-Agent":"bestmuscat/1.0"})
+        r = _get(api, params=params, timeout=30, ttl=IMAGE_TTL)
         r.raise_for_status()
         js = r.json()
         pages = js.get("query", {}).get("pages", {})
@@ -55,74 +77,168 @@ def _search_openverse(q: str):
         "format": "json"
     }
     try:
-        r = requests.get(OPENVERSE_ENDPOINT, params=params, timeout=20, headers={"User-Agent":"bestmuscat/1.0"})
+        r = _get(OPENVERSE_ENDPOINT, params=params, timeout=20, ttl=SEARCH_TTL)
         r.raise_for_status()
         return r.json().get("results", [])
     except Exception:
         return []
 
+def _find_image(p):
+    """Network stage: returns (image bytes, attribution meta) or (None, None)."""
+    wm = p.get("wikimedia_image_url")
+    if wm:
+        direct = _resolve_commons_image_url(wm) or wm
+        try:
+            return _download_image(direct), {
+                "license": "See Wikimedia page",
+                "attribution": "Wikimedia Commons",
+                "source_url": wm
+            }
+        except Exception:
+            pass
+
+    q = f"{p['name']} Muscat {p['category']}"
+    for r in _search_openverse(q):
+        url = r.get("url") or r.get("thumbnail")
+        if not url:
+            continue
+        try:
+            return _download_image(url), {
+                "license": r.get("license"),
+                "attribution": (r.get("creator") or "Unknown"),
+                "source_url": r.get("foreign_landing_url") or r.get("url")
+            }
+        except Exception:
+            continue
+    return None, None
+
+def _slug(p):
+    return p["id"].split(":")[-1]
+
+def _photo_entry(slug, at_meta):
+    return {
+        "type": "hero",
+        "src": f"data/media/{slug}/hero.webp",
+        "license": at_meta.get("license"),
+        "attribution": at_meta.get("attribution"),
+        "source_url": at_meta.get("source_url")
+    }
+
+def _checkpoint_header():
+    h = hashlib.sha1()
+    with open(places_path(), "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    config = json.dumps([OPENVERSE_ENDPOINT, image_variants.VARIANTS])
+    return {"checkpoint": {"places": h.hexdigest(), "config": hashlib.sha1(config.encode("utf-8")).hexdigest()}}
+
+def _load_checkpoint(header):
+    """Photo results by place id from an interrupted run over the same places and settings."""
+    done = {}
+    if not CHECKPOINT.exists():
+        return done
+    lines = CHECKPOINT.read_text(encoding="utf-8").splitlines()
+    try:
+        fresh = bool(lines) and json.loads(lines[0]) == header
+    except ValueError:
+        fresh = False
+    if not fresh:
+        print(f"Discarding {CHECKPOINT.name}: made for other places or photo settings")
+        CHECKPOINT.unlink()
+        return done
+    for line in lines[1:]:
+        try:
+            row = json.loads(line)
+        except ValueError:
+            continue  # torn last line from an interrupted write
+        done[row["id"]] = row.get("photo")
+    return done
+
 def add_photos():
-    places = read_json(DATA_DIR/"places.json", default=[]) or []
-    changed = False
+    places = read_places()
+    header = _checkpoint_header()
+    done = _load_checkpoint(header)
+    if done:
+        print(f"Resuming: {len(done)} places already processed")
+    if not CHECKPOINT.exists():
+        CHECKPOINT.parent.mkdir(parents=True, exist_ok=True)
+        CHECKPOINT.write_text(json.dumps(header) + "\n", encoding="utf-8")
 
+    changed = False
+    todo = deque()
     for p in places:
         if p.get("photos"):
             continue  # already has photos
-        img = None
-        at_meta = None
-
-        wm = p.get("wikimedia_image_url")
-        if wm:
-            direct = _resolve_commons_image_url(wm) or wm
-            try:
-                img = _download_image(direct)
-                at_meta = {
-                    "license": "See Wikimedia page",
-                    "attribution": "Wikimedia Commons",
-                    "source_url": wm
-                }
-            except Exception:
-                img = None
-
-        if img is None:
-            q = f"{p['name']} Muscat {p['category']}"
-            for r in _search_openverse(q):
-                url = r.get("url") or r.get("thumbnail")
-                if not url:
-                    continue
-                try:
-                    img = _download_image(url)
-                    at_meta = {
-                        "license": r.get("license"),
-                        "attribution": (r.get("creator") or "Unknown"),
-                        "source_url": r.get("foreign_landing_url") or r.get("url")
-                    }
-                    break
-                except Exception:
-                    continue
-
-        if img is None:
+        if p["id"] in done:
+            if done[p["id"]]:
+                p.setdefault("photos", []).append(done[p["id"]])
+                changed = True
             continue
-
-        slug = p["id"].split(":")[-1]
-        outdir = MEDIA_DIR / slug
-        _save_variants(img, outdir)
-
-        p.setdefault("photos", []).append({
-            "type": "hero",
-            "src": f"data/media/{slug}/hero.webp",
-            "license": at_meta.get("license"),
-            "attribution": at_meta.get("attribution"),
-            "source_url": at_meta.get("source_url")
-        })
-
-        changed = True
+        todo.append(p)
+
+    # Places sharing a media slug are processed one after another so their
+    # variant files are never written concurrently.
+    busy, deferred = set(), defaultdict(deque)
+    window = IO_WORKERS * 2  # places in flight (network + encode), bounds memory
+    pending = {}
+
+    # spawn, not fork: the encoder pool starts while network threads hold locks
+    with ThreadPoolExecutor(IO_WORKERS) as io, \
+         ProcessPoolExecutor(ENCODE_WORKERS, mp_context=multiprocessing.get_context("spawn")) as cpu, \
+         open(CHECKPOINT, "a", encoding="utf-8") as ckpt:
+
+        def start(p):
+            busy.add(_slug(p))
+            pending[io.submit(_find_image, p)] = ("fetch", p, None)
+
+        def finish(p, photo):
+            nonlocal changed
+            if photo:
+                p.setdefault("photos", []).append(photo)
+                changed = True
+            ckpt.write(json.dumps({"id": p["id"], "photo": photo}, ensure_ascii=False) + "\n")
+            ckpt.flush()
+            slug = _slug(p)
+            busy.discard(slug)
+            if deferred[slug]:
+                start(deferred[slug].popleft())
+
+        while todo or pending:
+            while todo and len(pending) < window:
+                p = todo.popleft()
+                if _slug(p) in busy:
+                    deferred[_slug(p)].append(p)
+                else:
+                    start(p)
+            if not pending:
+                continue
+            finished, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                stage, p, at_meta = pending.pop(fut)
+                if stage == "fetch":
+                    data, at_meta = fut.result()
+                    outdir = MEDIA_DIR / _slug(p)
+                    if data is None:
+                        finish(p, None)
+                    elif image_variants.is_up_to_date(outdir, image_variants.source_hash(data)):
+                        finish(p, _photo_entry(_slug(p), at_meta))  # same source, variants current
+                    else:
+                        pending[cpu.submit(_encode_job, data, str(outdir))] = ("encode", p, at_meta)
+                else:
+                    try:
+                        fut.result()
+                        finish(p, _photo_entry(_slug(p), at_meta))
+                    except Exception as e:
+                        print(f"[photos] encode failed for {p['id']}: {e}")
+                        finish(p, None)
 
     if changed:
-        write_json(DATA_DIR/"places.json", places)
-        print("Updated places.json with photo metadata")
+        write_places(places)
+        print("Updated places with photo metadata")
     else:
         print("No photo updates were necessary")
+    CHECKPOINT.unlink(missing_ok=True)
 
 if __name__ == "__main__":
-    add_photos()
+    with instrument.run("fetch_photos"):
+        add_photos()
@@ -1,13 +1,7 @@
 # scripts/build/generate_tools_from_places.py
-from pathlib import Path
-import json
+from .utils import DATA_DIR, iter_places, places_path, write_json
 
-# Reuse paths used elsewhere in your repo
-ROOT = Path(__file__).resolve().parents[2]
-DATA = ROOT / "data"
-
-PLACES = DATA / "places.json"
-TOOLS  = DATA / "tools.json"
+TOOLS  = DATA_DIR / "tools.json"
 
 # UI expects these category names
 CAT_MAP = {
@@ -23,56 +17,57 @@ FALLBACK_IMG = {
     "mall": "assets/images/malls.png",
 }
 
-def main():
-    if not PLACES.exists():
-        raise SystemExit("places.json not found; run reconcile step first")
-
-    places = json.loads(PLACES.read_text(encoding="utf-8"))
+def to_tool(p):
+    """The card record the UI renders for one place, or None if its category isn't shown."""
+    cat_key = (p.get("category") or "").strip().lower()
+    cat_ui  = CAT_MAP.get(cat_key)
+    if not cat_ui:
+        # only export categories your UI supports
+        return None
 
-    tools = []
-    for p in places:
-        cat_key = (p.get("category") or "").strip().lower()
-        cat_ui  = CAT_MAP.get(cat_key)
-        if not cat_ui:
-            # only export categories your UI supports
-            continue
+    # slug from id "bestmuscat:category:slug"
+    pid = p.get("id") or ""
+    slug = pid.split(":")[-1] if ":" in pid else pid
 
-        # slug from id "bestmuscat:category:slug"
-        pid = p.get("id") or ""
-        slug = pid.split(":")[-1] if ":" in pid else pid
+    # prefer our hero image, otherwise fallback per category
+    img = None
+    photos = p.get("photos") or []
+    if photos and isinstance(photos, list):
+        img = photos[0].get("src")
+    if not img:
+        img = FALLBACK_IMG[cat_key]
 
-        # prefer our hero image, otherwise fallback per category
-        img = None
-        photos = p.get("photos") or []
-        if photos and isinstance(photos, list):
-            img = photos[0].get("src")
-        if not img:
-            img = FALLBACK_IMG[cat_key]
+    # subtitle line on your cards uses tagline/description
+    address = (p.get("location") or {}).get("address") or ""
+    tagline = address or f"{CAT_MAP[cat_key]} in Muscat"
 
-        # subtitle line on your cards uses tagline/description
-        address = (p.get("location") or {}).get("address") or ""
-        tagline = address or f"{CAT_MAP[cat_key]} in Muscat"
+    website = (p.get("contacts") or {}).get("website") or "#"
 
-        website = (p.get("contacts") or {}).get("website") or "#"
+    return {
+        "id": slug,
+        "slug": slug,
+        "name": p.get("name") or slug,
+        "url": website,
+        "tagline": tagline,
+        "description": "",           # optional for your UI; empty is fine
+        "pricing": "free",           # neutral default
+        "categories": [cat_ui],      # your UI expects exactly one of its 6
+        "tags": [],                  # you can enrich later
+        "logo": "",                  # optional
+        "image": img,                # used for the card hero image
+        "short_description": tagline,
+        "price": ""
+    }
 
-        tools.append({
-            "id": slug,
-            "slug": slug,
-            "name": p.get("name") or slug,
-            "url": website,
-            "tagline": tagline,
-            "description": "",           # optional for your UI; empty is fine
-            "pricing": "free",           # neutral default
-            "categories": [cat_ui],      # your UI expects exactly one of its 6
-            "tags": [],                  # you can enrich later
-            "logo": "",                  # optional
-            "image": img,                # used for the card hero image
-            "short_description": tagline,
-            "price": ""
-        })
-
-    TOOLS.write_text(json.dumps(tools, ensure_ascii=False, indent=2), encoding="utf-8")
+def run(places):
+    tools = [t for t in map(to_tool, places) if t]
+    write_json(TOOLS, tools)
     print(f"Wrote {len(tools)} items → {TOOLS}")
 
+def main():
+    if not places_path().exists():
+        raise SystemExit("places not found; run reconcile step first")
+    run(iter_places())
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,57 @@
+import hashlib, json
+from io import BytesIO
+from pathlib import Path
+from PIL import Image
+
+# (file name, bounding box, format, quality), largest first. Each box fits
+# inside the previous one, so every variant is derived from the one before.
+VARIANTS = (
+    ("hero.webp",  (1600, 1200), "WEBP", 85),
+    ("social.jpg", (1200, 630),  "JPEG", 86),
+    ("thumb.webp", (640, 480),   "WEBP", 82),
+)
+
+# Sidecar holding the hash of the source the variants were made from
+SOURCE_FILE = "source.json"
+
+def source_hash(data: bytes) -> str:
+    """Hash of the source bytes plus the variant spec, so spec changes re-encode too."""
+    h = hashlib.sha1(data)
+    h.update(json.dumps(VARIANTS).encode("utf-8"))
+    return h.hexdigest()
+
+def is_up_to_date(outdir: Path, digest: str) -> bool:
+    side = outdir / SOURCE_FILE
+    if not side.exists() or not all((outdir / name).exists() for name, *_ in VARIANTS):
+        return False
+    try:
+        return json.loads(side.read_text(encoding="utf-8")).get("sha1") == digest
+    except ValueError:
+        return False
+
+def encode_variants(data: bytes, outdir: Path, force=False) -> bool:
+    """Write all variants for one source image. Returns False if they were already current.
+
+    The source is decoded once: JPEG draft mode lets libjpeg scale down
+    during decoding, and thumbnail()'s reducing_gap does the remaining
+    integer reduce() before the final resample. Smaller variants are then
+    shrunk in place from the previous one instead of from the original.
+    """
+    outdir = Path(outdir)
+    digest = source_hash(data)
+    if not force and is_up_to_date(outdir, digest):
+        return False
+    outdir.mkdir(parents=True, exist_ok=True)
+
+    img = Image.open(BytesIO(data))
+    img.draft("RGB", VARIANTS[0][1])  # no-op for non-JPEG sources
+    if img.mode not in ("RGB", "RGBA"):
+        img = img.convert("RGB")
+    for name, box, fmt, quality in VARIANTS:
+        img.thumbnail(box, reducing_gap=2.0)
+        out = img.convert("RGB") if fmt == "JPEG" and img.mode != "RGB" else img
+        out.save(outdir / name, fmt, quality=quality)
+
+    # written last, so an interrupted encode is redone next time
+    (outdir / SOURCE_FILE).write_text(json.dumps({"sha1": digest}), encoding="utf-8")
+    return True
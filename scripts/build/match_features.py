@@ -0,0 +1,145 @@
+"""
+Name features for reconciliation, computed once per record and cached on it
+under "_match" (canonical_place never copies it out).
+
+    norm      normalized name; Arabic-only names are transliterated first
+    tokens    its words
+    core      norm without generic words ("hotel", "muscat", "مطعم", ...)
+    phonetic  consonant skeleton of the core words, script-agnostic:
+              "Al Sadaf Restaurant" and "مطعم الصدف" both give "sdf"
+    arabic    name is written in Arabic script only
+
+Names in the same script are compared on `norm`; an Arabic-only name and a
+Latin one on `phonetic`. Names with Latin letters keep their Latin part
+only, so mixed "Kargeen كارجين" compares like "Kargeen".
+"""
+
+import re, unicodedata
+from collections import namedtuple
+
+from rapidfuzz import fuzz
+
+from .utils import norm_name
+
+MatchFeatures = namedtuple("MatchFeatures", "norm tokens core phonetic arabic")
+
+ARABIC_LETTER = re.compile(r"[ء-يٱ-ۓ]")
+LATIN_LETTER = re.compile(r"[A-Za-z]")
+ARABIC_MARKS = re.compile(r"[ـً-ٰٟۖ-ۭ]")  # tatweel, harakat, Quranic marks
+
+AR_LATIN = {
+    "ا": "a", "أ": "a", "إ": "i", "آ": "a", "ٱ": "a", "ب": "b", "ت": "t", "ث": "th",
+    "ج": "j", "ح": "h", "خ": "kh", "د": "d", "ذ": "dh", "ر": "r", "ز": "z", "س": "s",
+    "ش": "sh", "ص": "s", "ض": "d", "ط": "t", "ظ": "z", "ع": "", "غ": "gh", "ف": "f",
+    "ق": "q", "ك": "k", "ل": "l", "م": "m", "ن": "n", "ه": "h", "و": "w", "ي": "y",
+    "ى": "a", "ة": "a", "ء": "", "ؤ": "", "ئ": "",
+    # Persian/Urdu letters seen in loanword spellings
+    "پ": "p", "چ": "ch", "ژ": "zh", "ک": "k", "گ": "g", "ی": "y", "ۃ": "a", "ے": "e",
+    "،": " ", "؛": " ", "؟": " ",
+}
+AR_LATIN.update({chr(0x660 + d): str(d) for d in range(10)})  # Arabic-Indic digits
+AR_LATIN.update({chr(0x6f0 + d): str(d) for d in range(10)})  # Eastern Arabic-Indic digits
+_AR_TABLE = str.maketrans(AR_LATIN)
+
+# Words that say what a venue is rather than which one; ignored when
+# comparing names within one source ("Crowne Plaza Hotel" ~ "Crowne Plaza Muscat")
+GENERIC_WORDS = (
+    "a", "an", "the", "and", "&", "of", "by", "at",
+    "hotel", "hotels", "guest", "restaurant", "restaurants", "cafe", "mall",
+    "muscat", "oman", "llc",
+    "فندق", "نزل", "مطعم", "مطاعم", "مقهى", "كافيه", "مول", "مسقط", "عمان",
+)
+
+# Leading article forms, written alone ("al sadaf") or hyphenated
+# ("al-sadaf", "as-sadaf" with the sun-letter assimilation)
+ARTICLES = {"al", "el"}
+HYPHEN_ARTICLES = ARTICLES | {"ad", "adh", "an", "ar", "as", "ash", "at", "ath", "az", "ud", "ul"}
+
+# Consonant classes for the phonetic key (longest first); vowels, y, w and
+# separators drop out, repeats collapse
+PHONETIC_SUBS = [("kh", "k"), ("gh", "g"), ("sh", "s"), ("ch", "s"), ("th", "t"), ("dh", "d"),
+                 ("ph", "f"), ("ck", "k"), ("q", "k"), ("c", "k"), ("x", "ks"), ("z", "s"),
+                 ("p", "b"), ("v", "f"), ("g", "j"), ("e", ""), ("a", ""), ("i", ""), ("o", ""),
+                 ("u", ""), ("y", ""), ("w", ""), ("'", "")]
+_REPEATS = re.compile(r"(.)\1+")
+PHONETIC_MIN = 3  # shorter skeletons ("m", "bt") match far too much to use
+
+def transliterate(s: str) -> str:
+    """Arabic script to a rough Latin spelling; the article gets its own word."""
+    s = ARABIC_MARKS.sub("", unicodedata.normalize("NFKC", s or ""))
+    words = []
+    for w in s.split():
+        if w.startswith("ال") and len(w) > 3:
+            words.append("al")
+            w = w[2:]
+        words.append(w.translate(_AR_TABLE))
+    return " ".join(words)
+
+def is_arabic(name: str) -> bool:
+    return bool(ARABIC_LETTER.search(name or "")) and not LATIN_LETTER.search(name or "")
+
+def _phonetic_word(w: str) -> str:
+    for a, b in PHONETIC_SUBS:
+        w = w.replace(a, b)
+    return _REPEATS.sub(r"\1", w)
+
+def phonetic(words) -> str:
+    """Consonant skeleton of normalized words, articles dropped."""
+    out = []
+    for word in words:
+        parts = word.split("-")
+        if len(parts) > 1 and parts[0] in HYPHEN_ARTICLES:
+            parts = parts[1:]
+        for p in parts:
+            if p and p not in ARTICLES:
+                key = _phonetic_word(p)
+                if key:
+                    out.append(key)
+    return " ".join(out)
+
+def _normalize(name: str, arabic: bool) -> str:
+    return norm_name(transliterate(name) if arabic else name).strip()
+
+GENERIC_TOKENS = {_normalize(w, is_arabic(w)) for w in GENERIC_WORDS}
+
+def extract(name: str) -> MatchFeatures:
+    arabic = is_arabic(name)
+    norm = _normalize(name, arabic)
+    tokens = tuple(norm.split())
+    core = tuple(t for t in tokens if t not in GENERIC_TOKENS)
+    key = phonetic(core)
+    if len(key.replace(" ", "")) < PHONETIC_MIN:
+        key = ""
+    return MatchFeatures(norm, frozenset(tokens), " ".join(core), key, arabic)
+
+def of(rec) -> MatchFeatures:
+    """The record's features, extracted on first use."""
+    f = rec.get("_match")
+    if f is None:
+        f = rec["_match"] = extract(rec.get("name"))
+    return f
+
+def similarity(a: MatchFeatures, b: MatchFeatures) -> float:
+    """Name similarity (0..1) of two records' features; the pairwise twin of batch_match.name_scores."""
+    x, y = (a.phonetic, b.phonetic) if a.arabic != b.arabic else (a.norm, b.norm)
+    if not x or not y:
+        return 0.0
+    return fuzz.token_sort_ratio(x, y) / 100.0
+
+def _distinct_words(core):
+    return sum(len(t) > 2 for t in core.split())
+
+def dup_similarity(a: MatchFeatures, b: MatchFeatures) -> float:
+    """Same-venue score (0..1) within one source; the pairwise twin of batch_match.dup_scores.
+
+    Core names compare with token_sort_ratio, raised to token_set_ratio when
+    both keep two distinctive words; Arabic/Latin pairs use the phonetic keys.
+    """
+    if a.arabic != b.arabic:
+        return similarity(a, b)
+    if not a.core or not b.core:
+        return 0.0
+    score = fuzz.token_sort_ratio(a.core, b.core)
+    if _distinct_words(a.core) >= 2 and _distinct_words(b.core) >= 2:
+        score = max(score, fuzz.token_set_ratio(a.core, b.core))
+    return score / 100.0
@@ -0,0 +1,239 @@
+"""
+Site build orchestrator:  python -m scripts.build [--force] [--only STAGE ...]
+
+Loads the canonical places (data/places.ndjson) once and runs the build stages below over the same
+in-memory list (stages must treat it as read-only). Stages form a DAG;
+independent stages run in parallel threads (BUILD_WORKERS) as soon as
+their dependencies finish.
+
+Each stage is skipped when its fingerprint matches the last run and its
+outputs are still on disk unchanged. The fingerprint covers the input
+files, the source of the stage's module and every module of this repo it
+imports (transitively: scripts/build/utils.py, match_features.py,
+scripts/enrich/hours_parser.py, ...), the environment variables it reads
+and the output digests of the stages it depends on. A stage that exited
+with an error code (qa over its thresholds) keeps that verdict: while its
+fingerprint holds it is reported failed again without rerunning; stages
+that raised are always rerun. State is kept in data/build_state.json.
+Places are only parsed if some stage has to run, so a no-op rebuild just
+hashes files.
+"""
+
+import argparse, ast, fnmatch, hashlib, json, os, sys, time
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from importlib import import_module
+from pathlib import Path
+
+from scripts.utils import instrument
+from .utils import ROOT, DATA_DIR, places_path, read_places
+
+STATE_PATH = DATA_DIR / "build_state.json"
+TREE = DATA_DIR.parent  # stage outputs are relative to this; ROOT unless PIPELINE_DATA_DIR is set
+
+# name: (module, dependencies, extra input files, env vars read, outputs)
+# Env names may end in or contain "*" to cover a family, e.g. per-category limits.
+STAGES = {
+    "tools":      ("generate_tools_from_places", (), (), (),
+                   ("data/tools.json",)),
+    "search":     ("build_search_index", ("tools",), (), (),
+                   ("data/search",)),
+    "sitemaps":   ("build_sitemaps", (), (), ("SITE_BASE_URL", "SITEMAP_CHUNK_SIZE"),
+                   ("data/sitemaps", "data/sitemap_state.json")),
+    "categories": ("emit_category_feeds", (), (), ("FEED_PAGE_SIZE",),
+                   ("data/categories",)),
+    "open_now":   ("emit_open_now", (), (), ("HOURS_UTC_OFFSET_MIN",),
+                   ("data/open_now.json",)),
+    "qa":         ("qa_checks", (), (), ("ALLOW_QA_SOFT_FAIL", "QA_SAMPLES", "MAX_*_PCT*"),
+                   ("data_quality_issues.csv", "data/qa_summary.json")),
+}
+
+WORKERS = int(os.getenv("BUILD_WORKERS", str(min(len(STAGES), os.cpu_count() or 2))))
+
+def digest_path(path: Path):
+    """sha1 of a file, or of every file (name + bytes) under a directory; None if missing."""
+    if path.is_file():
+        return hashlib.sha1(path.read_bytes()).hexdigest()
+    if not path.is_dir():
+        return None
+    h = hashlib.sha1()
+    for f in sorted(p for p in path.rglob("*") if p.is_file()):
+        h.update(f.relative_to(path).as_posix().encode("utf-8") + b"\0")
+        h.update(hashlib.sha1(f.read_bytes()).digest())
+    return h.hexdigest()
+
+def _module_file(dotted):
+    base = ROOT.joinpath(*dotted.split("."))
+    for f in (base.with_suffix(".py"), base / "__init__.py"):
+        if f.is_file():
+            return f
+    return None
+
+def local_imports(path: Path):
+    """Source files of this repo that a module imports (directly)."""
+    package = ".".join(path.relative_to(ROOT).with_suffix("").parts[:-1])
+    names = []
+    for node in ast.walk(ast.parse(path.read_text(encoding="utf-8"))):
+        if isinstance(node, ast.Import):
+            names.extend(a.name for a in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            base = node.module or ""
+            if node.level:
+                parent = package.split(".")[:len(package.split(".")) - node.level + 1]
+                base = ".".join(parent + ([node.module] if node.module else []))
+            names.append(base)
+            names.extend(f"{base}.{a.name}" for a in node.names)  # "from . import batch_match"
+    return {f for f in map(_module_file, names) if f is not None and f != path}
+
+def code_closure(path: Path):
+    """The module and everything of this repo it imports, transitively, sorted."""
+    seen, todo = set(), [path]
+    while todo:
+        f = todo.pop()
+        if f not in seen:
+            seen.add(f)
+            todo.extend(local_imports(f))
+    return sorted(seen)
+
+def load_state():
+    try:
+        return json.loads(STATE_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+
+def save_state(state):
+    STATE_PATH.write_text(json.dumps(state, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+
+class Build:
+    def __init__(self, stages, force=False):
+        self.stages = stages
+        self.force = force
+        self.state = load_state()
+        self.places_hash = digest_path(places_path())
+        self._places = None
+        self._file_hashes = {}
+
+    @property
+    def places(self):
+        if self._places is None:
+            self._places = read_places()
+        return self._places
+
+    def fingerprint(self, name):
+        module, deps, files, env, _ = STAGES[name]
+        h = hashlib.sha1()
+        h.update(f"places {self.places_hash}\n".encode("utf-8"))
+        for f in files:
+            if f not in self._file_hashes:
+                self._file_hashes[f] = digest_path(ROOT / f)
+            h.update(f"file {f} {self._file_hashes[f]}\n".encode("utf-8"))
+        for src in code_closure(Path(__file__).resolve().with_name(f"{module}.py")):
+            if src not in self._file_hashes:
+                self._file_hashes[src] = digest_path(src)
+            h.update(f"code {src.relative_to(ROOT).as_posix()} {self._file_hashes[src]}\n".encode("utf-8"))
+        for k in env:
+            names = sorted(n for n in os.environ if fnmatch.fnmatchcase(n, k)) if "*" in k else [k]
+            for n in names:
+                h.update(f"env {n}={os.getenv(n)}\n".encode("utf-8"))
+        for d in deps:
+            h.update(f"dep {d} {json.dumps(self.state.get(d, {}).get('outputs'), sort_keys=True)}\n".encode("utf-8"))
+        return h.hexdigest()
+
+    def up_to_date(self, name, fp):
+        prev = self.state.get(name)
+        if self.force or not prev or prev.get("fingerprint") != fp:
+            return False
+        return all(digest_path(TREE / out) == d and d is not None for out, d in prev["outputs"].items())
+
+    def run_stage(self, name, places):
+        t0 = time.perf_counter()
+        with instrument.stage(name):
+            import_module(f".{STAGES[name][0]}", __package__).run(places)
+        return time.perf_counter() - t0
+
+    def run(self):
+        """Run every selected stage once its dependencies are done. Returns the exit code."""
+        waiting = dict(self.stages)  # name -> pending dependencies
+        failed, pending, code = set(), {}, 0
+        with ThreadPoolExecutor(WORKERS) as ex:
+            while waiting or pending:
+                ready = [n for n, deps in waiting.items() if not deps]
+                for name in ready:
+                    del waiting[name]
+                    fp = self.fingerprint(name)
+                    if self.up_to_date(name, fp):
+                        prev = self.state[name].get("exit")
+                        if prev is not None:  # same inputs as a run that failed: same verdict
+                            print(f"[build] {name}: failed (exit {prev}), unchanged since")
+                            failed.add(name)
+                            code = code or prev
+                            continue
+                        print(f"[build] {name}: up to date")
+                        self._done(name)
+                        continue
+                    pending[ex.submit(self.run_stage, name, self.places)] = (name, fp)
+                for name, deps in list(waiting.items()):
+                    if deps & failed:
+                        print(f"[build] {name}: skipped, {', '.join(sorted(deps & failed))} failed")
+                        failed.add(name)
+                        del waiting[name]
+                if not pending:
+                    if waiting and not ready:
+                        raise RuntimeError(f"build stages form a cycle: {sorted(waiting)}")
+                    continue
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    name, fp = pending.pop(fut)
+                    try:
+                        secs = fut.result()
+                    except SystemExit as e:  # stages keep their CLI-style exits
+                        if e.code in (None, 0):
+                            secs = None
+                        else:
+                            print(f"[build] {name}: failed (exit {e.code})")
+                            failed.add(name)
+                            code = code or (e.code if isinstance(e.code, int) else 1)
+                            self._record(name, fp, exit=e.code if isinstance(e.code, int) else 1)
+                            continue
+                    except Exception as e:
+                        print(f"[build] {name}: failed ({type(e).__name__}: {e})")
+                        failed.add(name)
+                        code = code or 1
+                        continue
+                    self._record(name, fp)
+                    print(f"[build] {name}: done" + (f" in {secs:.2f}s" if secs is not None else ""))
+                    self._done(name)
+        return code
+
+    def _record(self, name, fp, exit=None):
+        self.state[name] = {
+            "fingerprint": fp,
+            "outputs": {out: digest_path(TREE / out) for out in STAGES[name][4]},
+        }
+        if exit is not None:
+            self.state[name]["exit"] = exit
+        save_state(self.state)
+
+    def _done(self, name):
+        for deps in self.stages.values():
+            deps.discard(name)
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description="Build site artifacts from the canonical places")
+    ap.add_argument("--force", action="store_true", help="Run every selected stage even if up to date")
+    ap.add_argument("--only", nargs="+", choices=sorted(STAGES), help="Run these stages (and what they depend on)")
+    args = ap.parse_args(argv)
+
+    selected = set(args.only or STAGES)
+    todo = list(selected)
+    while todo:
+        for d in STAGES[todo.pop()][1]:
+            if d not in selected:
+                selected.add(d)
+                todo.append(d)
+    stages = {n: set(STAGES[n][1]) for n in STAGES if n in selected}
+
+    t0 = time.perf_counter()
+    with instrument.run("build"):
+        code = Build(stages, force=args.force).run()
+        print(f"[build] finished in {time.perf_counter() - t0:.2f}s")
+        sys.exit(code)
@@ -1,43 +1,145 @@
-import csv, sys, os
-from .utils import DATA_DIR, read_json
+"""
+Data-quality checks over the canonical places, in one streaming pass.
+
+Rules are registered with @rule; each takes a place and returns None when
+it passes, or a detail (True or a short string) for an offender. Every
+rule keeps counters and the first QA_SAMPLES offender ids, overall and per
+category.
+
+Thresholds: a rule with `max_pct` fails the build when its offender share
+exceeds the limit, which $<env> overrides. $<env>_<CATEGORY> (e.g.
+MAX_NO_PHOTO_PCT_RESTAURANT=0.5) adds a limit for one category's share.
+
+Outputs: data_quality_issues.csv (one row per offence) and
+data/qa_summary.json (counters, thresholds, samples).
+"""
+
+import csv, re, sys, os
+
+from .utils import DATA_DIR, iter_places, write_json
 
 # Temporarily allow soft-fail via env var:
 SOFT_FAIL = os.getenv("ALLOW_QA_SOFT_FAIL", "0") == "1"
+SAMPLES = int(os.getenv("QA_SAMPLES", "5"))
+
+ISSUES_CSV = DATA_DIR.parent / "data_quality_issues.csv"
+SUMMARY = DATA_DIR / "qa_summary.json"
+
+RULES = {}
+
+def rule(name, max_pct=None, env=None, categories=None):
+    """Register a check. `categories` limits it to those place categories."""
+    def register(fn):
+        RULES[name] = {"check": fn, "max_pct": max_pct, "env": env,
+                       "categories": set(categories) if categories else None}
+        return fn
+    return register
+
+def threshold(r, category=None):
+    """Limit for the whole run, or for one category (None unless set for it)."""
+    if not r["env"]:
+        return None if category else r["max_pct"]
+    v = os.getenv(f"{r['env']}_{category.upper()}" if category else r["env"])
+    return float(v) if v else (None if category else r["max_pct"])
 
 # You can tighten these later (e.g., 0.20 and 0.40)
-MAX_MISSING_ADDR_PCT = float(os.getenv("MAX_MISSING_ADDR_PCT", "0.90"))
-MAX_NO_PHOTO_PCT     = float(os.getenv("MAX_NO_PHOTO_PCT", "0.99"))
+@rule("missing_address", max_pct=0.90, env="MAX_MISSING_ADDR_PCT")
+def _missing_address(p):
+    return not (p.get("location") or {}).get("address")
 
-def main():
-    places = read_json(DATA_DIR/"places.json", default=[]) or []
-    if not places:
-        print("No places found; failing QA.")
-        sys.exit(2)
+@rule("no_photo", max_pct=0.99, env="MAX_NO_PHOTO_PCT")
+def _no_photo(p):
+    return not p.get("photos")
+
+# Listing fields a category should carry (reported, not enforced)
+REQUIRED_BY_CATEGORY = {
+    "restaurant": ["cuisines", "price_tier", "open_hours"],
+}
+
+@rule("missing_fields", categories=REQUIRED_BY_CATEGORY)
+def _missing_fields(p):
+    miss = [f for f in REQUIRED_BY_CATEGORY[p.get("category")] if not p.get(f)]
+    return " ".join(miss) or None
+
+_URL = re.compile(r"^https?://", re.I)
+
+@rule("bad_url")
+def _bad_url(p):
+    links = {"website": (p.get("contacts") or {}).get("website"), **(p.get("actions") or {})}
+    bad = [k for k, v in links.items() if v and not _URL.match(str(v))]
+    return " ".join(bad) or None
 
-    issues = []
+def evaluate(places, rules=None, on_issue=None):
+    """Run `rules` (default: all) over places in one pass; returns the summary dict.
+
+    on_issue(place, rule name, detail) is called for every offence.
+    """
+    active = [(name, RULES[name]) for name in (rules or RULES)]
+    stats = {name: {"by_category": {}, "samples": []} for name, _ in active}
+    n = 0
     for p in places:
-        if not p.get("location",{}).get("address"):
-            issues.append({"id": p["id"], "issue": "missing_address"})
-        if not p.get("photos"):
-            issues.append({"id": p["id"], "issue": "no_photo"})
+        n += 1
+        cat = p.get("category") or ""
+        for name, r in active:
+            if r["categories"] is not None and cat not in r["categories"]:
+                continue
+            c = stats[name]["by_category"].setdefault(cat, {"checked": 0, "failed": 0, "samples": []})
+            c["checked"] += 1
+            detail = r["check"](p)
+            if not detail:
+                continue
+            c["failed"] += 1
+            if on_issue:
+                on_issue(p, name, "" if detail is True else detail)
+            for samples in (stats[name]["samples"], c["samples"]):
+                if len(samples) < SAMPLES:
+                    samples.append(p.get("id"))
 
-    out = DATA_DIR.parent / "data_quality_issues.csv"
-    with open(out, "w", newline='', encoding='utf-8') as f:
-        w = csv.DictWriter(f, fieldnames=["id","issue"])
-        w.writeheader(); w.writerows(issues)
+    ok = True
+    for name, r in active:
+        s = stats[name]
+        s["checked"] = sum(c["checked"] for c in s["by_category"].values())
+        s["failed"] = sum(c["failed"] for c in s["by_category"].values())
+        s["pct"] = s["failed"] / s["checked"] if s["checked"] else 0.0
+        s["max_pct"] = threshold(r)
+        s["ok"] = s["max_pct"] is None or s["pct"] <= s["max_pct"]
+        ok &= s["ok"]
+        for cat, c in s["by_category"].items():
+            c["pct"] = c["failed"] / c["checked"]
+            c["max_pct"] = threshold(r, cat)
+            c["ok"] = c["max_pct"] is None or c["pct"] <= c["max_pct"]
+            ok &= c["ok"]
+    return {"places": n, "ok": ok, "rules": stats}
 
-    n = len(places)
-    miss_addr_pct = sum(1 for i in issues if i["issue"]=="missing_address")/n
-    no_photo_pct  = sum(1 for i in issues if i["issue"]=="no_photo")/n
+def run(places):
+    """Write the issues CSV and summary; exits non-zero when thresholds are exceeded."""
+    with open(ISSUES_CSV, "w", newline='', encoding='utf-8') as f:
+        w = csv.writer(f)
+        w.writerow(["id", "issue", "category", "detail"])
+        summary = evaluate(places, on_issue=lambda p, name, detail:
+                           w.writerow([p.get("id"), name, p.get("category") or "", detail]))
+    if not summary["places"]:
+        print("No places found; failing QA.")
+        sys.exit(2)
+    write_json(SUMMARY, summary)
 
-    print(f"QA: {n} places | missing_address={miss_addr_pct:.1%} | no_photo={no_photo_pct:.1%}")
+    parts = [f"{name}={s['pct']:.1%}" for name, s in summary["rules"].items()]
+    print(f"QA: {summary['places']} places | " + " | ".join(parts))
+    for name, s in summary["rules"].items():
+        over = [("all", s)] + list(s["by_category"].items())
+        for scope, c in over:
+            if not c["ok"]:
+                print(f"QA: {name} ({scope}): {c['pct']:.1%} > {c['max_pct']:.1%}, e.g. {', '.join(c['samples'])}")
 
     if SOFT_FAIL:
         print("ALLOW_QA_SOFT_FAIL=1 set → not failing build even if thresholds exceeded.")
         sys.exit(0)
 
-    if miss_addr_pct > MAX_MISSING_ADDR_PCT or no_photo_pct > MAX_NO_PHOTO_PCT:
+    if not summary["ok"]:
         sys.exit(3)
 
+def main():
+    run(iter_places())
+
 if __name__ == "__main__":
     main()
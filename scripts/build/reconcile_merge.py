@@ -1,15 +1,33 @@
-import json
+import argparse, copy, json, os, sys
 from pathlib import Path
-from rapidfuzz import fuzz
 
 from .utils import (
-    ROOT, DATA_DIR, RAW_DIR, write_json, read_json,
-    slugify, haversine_m, norm_name, load_taxonomy
+    ROOT, DATA_DIR, RAW_DIR, PLACES_NDJSON, write_places, read_json,
+    slugify, haversine_m, load_taxonomy, UnionFind
 )
+from .spatial_index import GridIndex, max_abs_lat
+from . import batch_match, match_features, reconcile_state
+from scripts.enrich import hours_parser
+from scripts.utils import instrument
 
-OUT = DATA_DIR / "places.json"
+OUT = PLACES_NDJSON
 TARGET_CATEGORIES = {"hotel", "restaurant", "mall"}
 
+# Match radii (metres) for OTM→OSM merges and Wikidata enrichment
+OTM_RADIUS_M = 200
+WD_RADIUS_M = 120
+
+# Same-venue duplicates within one source (e.g. an OSM node and way):
+# same category, within DUP_RADIUS_M and at DUP_SIM_THR (batch_match.dup_matrix)
+DUP_RADIUS_M = 150
+DUP_SIM_THR = 0.9
+
+# Matching engine: batch (vectorized blocks) | index (grid, pairwise) | brute (all pairs)
+ENGINES = ("batch", "index", "brute")
+ENGINE = os.getenv("RECONCILE_ENGINE", "batch")
+
+SOURCES = ("osm", "opentripmap", "wikidata")
+
 def extract_otm():
     path = RAW_DIR / "opentripmap/places.json"
     items = read_json(path, default=[]) or []
@@ -46,6 +64,7 @@ def extract_osm():
             "category": cat,
             "location": {"lat": lat, "lon": lon, "address": loc.get("address")},
             "contacts": {"website": (r.get("contacts") or {}).get("website")},
+            "opening_hours": r.get("opening_hours"),
             "sources": {"osm": r.get("sources",{}).get("osm")}
         })
     return mapped
@@ -78,94 +97,325 @@ def extract_wd():
         })
     return mapped
 
-def reconcile_and_merge():
-    otm = extract_otm()  # now includes addresses
-    osm = extract_osm()  # good for addresses
-    wd  = extract_wd()   # websites + possible images
-
-    merged = []
-
-    # seed with OSM (addresses) then enrich with OTM (maybe website) and WD (website/image)
-    for p in osm:
-        merged.append(p)
-
-    def try_merge(target, candidate, dist=200, sim_thr=0.85):
-        n1, n2 = norm_name(target["name"]), norm_name(candidate["name"])
-        name_sim = fuzz.token_sort_ratio(n1, n2) / 100.0
-        d = haversine_m(target["location"]["lat"], target["location"]["lon"],
-                        candidate["location"]["lat"], candidate["location"]["lon"])
-        if name_sim >= sim_thr and d <= dist:
-            # prefer non-empty fields, keep best
-            target["location"]["address"] = target["location"].get("address") or candidate.get("location",{}).get("address")
-            tweb = target.get("contacts",{}).get("website")
-            cweb = candidate.get("contacts",{}).get("website")
-            if not tweb and cweb:
-                target.setdefault("contacts",{})["website"] = cweb
-            ts = target.setdefault("sources",{})
-            for k,v in candidate.get("sources",{}).items():
-                ts[k] = v
-            if candidate.get("wikimedia_image_url") and not target.get("wikimedia_image_url"):
-                target["wikimedia_image_url"] = candidate["wikimedia_image_url"]
-            return True
-        return False
+def merge_fields(target, candidate):
+    # prefer non-empty fields, keep best
+    target["location"]["address"] = target["location"].get("address") or candidate.get("location",{}).get("address")
+    tweb = target.get("contacts",{}).get("website")
+    cweb = candidate.get("contacts",{}).get("website")
+    if not tweb and cweb:
+        target.setdefault("contacts",{})["website"] = cweb
+    ts = target.setdefault("sources",{})
+    for k,v in candidate.get("sources",{}).items():
+        ts[k] = v
+    if candidate.get("wikimedia_image_url") and not target.get("wikimedia_image_url"):
+        target["wikimedia_image_url"] = candidate["wikimedia_image_url"]
+    if candidate.get("opening_hours") and not target.get("opening_hours"):
+        target["opening_hours"] = candidate["opening_hours"]
+
+def merge_duplicate(target, dup):
+    # same source twice: keep the target's id and list the duplicate's under it
+    ts = target.setdefault("sources", {})
+    own = {k: v for k, v in dup.get("sources", {}).items() if k not in ts}
+    merge_fields(target, {**dup, "sources": own})
+    for k, v in dup.get("sources", {}).items():
+        if k not in own:
+            ts[k] = {**ts[k], "duplicates": ts[k].get("duplicates", []) + [(v or {}).get("id")]}
+
+def cluster_duplicates(records, lat_bound, on_merge):
+    """Fold same-source near-duplicates together; returns the survivors in order.
+
+    Candidate pairs come from batch_match.duplicate_pairs and are grouped
+    with union-find, so chains (A~B, B~C) collapse into one record: the
+    group's first, which keeps its name and location.
+    """
+    uf = UnionFind(range(len(records)))
+    for i, j in batch_match.duplicate_pairs(records, lat_bound, radius=DUP_RADIUS_M, sim_thr=DUP_SIM_THR):
+        uf.union(i, j)
+    keep = []
+    for group in uf.groups().values():
+        t = records[group[0]]
+        for i in group[1:]:
+            merge_duplicate(t, records[i])
+            on_merge(t, records[i])
+        keep.append(group[0])
+    return [records[i] for i in sorted(keep)]
+
+def enrich_from_wd(t, c):
+    if c.get("contacts",{}).get("website") and not t.get("contacts",{}).get("website"):
+        t.setdefault("contacts",{})["website"] = c["contacts"]["website"]
+    if c.get("wikimedia_image_url") and not t.get("wikimedia_image_url"):
+        t["wikimedia_image_url"] = c["wikimedia_image_url"]
+    t.setdefault("sources",{}).update(c.get("sources",{}))
+
+def try_merge(target, candidate, dist=OTM_RADIUS_M, sim_thr=0.85):
+    name_sim = match_features.similarity(match_features.of(target), match_features.of(candidate))
+    d = haversine_m(target["location"]["lat"], target["location"]["lon"],
+                    candidate["location"]["lat"], candidate["location"]["lon"])
+    if name_sim >= sim_thr and d <= dist:
+        merge_fields(target, candidate)
+        return True
+    return False
+
+def _ll(r):
+    return r["location"]["lat"], r["location"]["lon"]
+
+def _merge_batch(osm, otm, wd, lat_bound, on_merge):
+    merged = list(osm)
+    pool = osm + otm
+    for c, k in zip(otm, batch_match.match_otm(osm, otm, lat_bound, radius=OTM_RADIUS_M)):
+        if k is None:
+            merged.append(c)
+        else:
+            merge_fields(pool[k], c)
+            on_merge(pool[k], c)
+    for c, i in zip(wd, batch_match.match_wd(merged, wd, lat_bound, radius=WD_RADIUS_M)):
+        if i is not None:
+            enrich_from_wd(merged[i], c)
+            on_merge(merged[i], c)
+    return merged
+
+def merge_sources(osm, otm, wd, engine="batch", on_merge=None):
+    """Seed with OSM (addresses) then enrich with OTM (maybe website) and WD (website/image).
+
+    Near-duplicates within OSM and within OTM are collapsed first (see
+    cluster_duplicates), whichever engine does the cross-source matching.
+
+    engine="batch" scores whole spatial blocks with distance/name matrices,
+    "index" walks the grid index pair by pair, and "brute" scans every pair.
+    All three produce identical output. `on_merge(target, candidate)` is
+    called whenever a record is folded into an existing place.
+    """
+    if engine not in ENGINES:
+        raise ValueError(f"unknown reconcile engine: {engine}")
+    lat_bound = max_abs_lat(osm + otm + wd)
+    on_merge = on_merge or (lambda t, c: None)
+    osm = cluster_duplicates(osm, lat_bound, on_merge)
+    otm = cluster_duplicates(otm, lat_bound, on_merge)
+    if engine == "batch":
+        return _merge_batch(osm, otm, wd, lat_bound, on_merge)
+
+    use_index = engine == "index"
+    merged = list(osm)
+
+    # one grid per category, since OTM only merges within its own category
+    by_cat = {}
+    def _index_otm(i, t):
+        by_cat.setdefault(t["category"], GridIndex(OTM_RADIUS_M, lat_bound)).add(i, *_ll(t))
+    if use_index:
+        for i, t in enumerate(merged):
+            _index_otm(i, t)
 
     # merge OTM into OSM-seeded list
     for c in otm:
+        if use_index:
+            grid = by_cat.get(c["category"])
+            candidates = grid.near(*_ll(c)) if grid else []
+        else:
+            candidates = range(len(merged))
         matched = False
-        for t in merged:
+        for i in candidates:
+            t = merged[i]
             if t["category"] != c["category"]:
                 continue
             if try_merge(t, c):
+                on_merge(t, c)
                 matched = True
                 break
         if not matched:
             merged.append(c)
+            if use_index:
+                _index_otm(len(merged) - 1, c)
+
+    if use_index:
+        wd_grid = GridIndex(WD_RADIUS_M, lat_bound)
+        for i, t in enumerate(merged):
+            wd_grid.add(i, *_ll(t))
 
     # WD enrichment (tight distance)
     for c in wd:
         # find nearest by category-agnostic enrichment, but close by
+        candidates = wd_grid.near(*_ll(c)) if use_index else range(len(merged))
         best_i, best_score = None, 0
-        for i, t in enumerate(merged):
+        for i in candidates:
+            t = merged[i]
             d = haversine_m(t["location"]["lat"], t["location"]["lon"], c["location"]["lat"], c["location"]["lon"])
-            if d > 120:
+            if d > WD_RADIUS_M:
                 continue
-            sim = fuzz.token_sort_ratio(norm_name(t["name"]), norm_name(c["name"])) / 100.0
-            score = sim + (1 - min(d/120,1)) * 0.2
+            sim = match_features.similarity(match_features.of(t), match_features.of(c))
+            score = sim + (1 - min(d/WD_RADIUS_M,1)) * 0.2
             if score > best_score:
                 best_score, best_i = score, i
         if best_i is not None:
-            t = merged[best_i]
-            if c.get("contacts",{}).get("website") and not t.get("contacts",{}).get("website"):
-                t.setdefault("contacts",{})["website"] = c["contacts"]["website"]
-            if c.get("wikimedia_image_url") and not t.get("wikimedia_image_url"):
-                t["wikimedia_image_url"] = c["wikimedia_image_url"]
-            t.setdefault("sources",{}).update(c.get("sources",{}))
-
-    # finalize
-    canonical = []
-    for p in merged:
-        if p.get("category") not in TARGET_CATEGORIES:
+            enrich_from_wd(merged[best_i], c)
+            on_merge(merged[best_i], c)
+
+    return merged
+
+def canonical_place(p, cid):
+    if p.get("category") not in TARGET_CATEGORIES:
+        return None
+    return {
+        "id": cid,
+        "name": p["name"],
+        "category": p["category"],
+        "subcategories": [],
+        "location": p["location"],
+        "contacts": p.get("contacts", {}),
+        "open_hours": hours_parser.normalize(p.get("opening_hours")),
+        "price_tier": None,
+        "rating": {},
+        "amenities": [],
+        "photos": [],
+        "wikimedia_image_url": p.get("wikimedia_image_url"),
+        "sources": p.get("sources", {}),
+        "status": "active"
+    }
+
+def fold(recs, sources, group):
+    """Merged record for a cluster of record indices; the first non-Wikidata one is the seed."""
+    group = sorted(group)
+    seed = next(i for i in group if sources[i] != "wikidata")
+    t = copy.deepcopy(recs[seed])
+    for i in group:
+        if i == seed:
             continue
-        slug = slugify(p["name"])[:80]
-        canonical.append({
-            "id": f"bestmuscat:{p['category']}:{slug}",
-            "name": p["name"],
-            "category": p["category"],
-            "subcategories": [],
-            "location": p["location"],
-            "contacts": p.get("contacts", {}),
-            "open_hours": None,
-            "price_tier": None,
-            "rating": {},
-            "amenities": [],
-            "photos": [],
-            "wikimedia_image_url": p.get("wikimedia_image_url"),
-            "sources": p.get("sources", {}),
-            "status": "active"
-        })
+        if sources[i] == "wikidata":
+            enrich_from_wd(t, recs[i])
+        elif sources[i] in t["sources"]:
+            merge_duplicate(t, recs[i])
+        else:
+            merge_fields(t, recs[i])
+    return t
+
+def build_places(engine="batch", registry=None, rematch=False):
+    """Reconcile the raw sources; returns (canonical places, updated id registry).
 
-    write_json(OUT, canonical)
+    Records whose source id is in the registry, with the same content hash
+    as when it was bound, are attached to their place by lookup. New and
+    changed ones (renamed, moved or recategorised upstream) are
+    fuzzy-matched: among themselves with merge_sources, then against the
+    known places (batch_match.match_known and, for Wikidata rows,
+    match_wd). `rematch` fuzzy-matches every
+    record again; places still keep their registered ids where possible.
+    """
+    registry = reconcile_state.IdRegistry.load() if registry is None else registry
+    with instrument.stage("extract"):
+        otm = extract_otm()  # now includes addresses
+        osm = extract_osm()  # good for addresses
+        wd  = extract_wd()   # websites + possible images
+
+    recs = osm + otm + wd
+    hashes = [reconcile_state.record_hash(r) for r in recs]  # before "_match" is cached on them
+    with instrument.stage("features"):
+        for r in recs:
+            match_features.of(r)
+    sources = ["osm"] * len(osm) + ["opentripmap"] * len(otm) + ["wikidata"] * len(wd)
+    keys = (reconcile_state.record_keys("osm", osm) + reconcile_state.record_keys("opentripmap", otm)
+            + reconcile_state.record_keys("wikidata", wd))
+    lat_bound = max_abs_lat(recs)
+
+    known, new, changed = {}, [], 0
+    for i, k in enumerate(keys):
+        cid = None if rematch else registry.get(k, hashes[i])
+        changed += bool(cid is None and not rematch and registry.get(k))
+        if cid:
+            known.setdefault(cid, []).append(i)
+        else:
+            new.append(i)
+    for cid, group in list(known.items()):
+        if all(sources[i] == "wikidata" for i in group):  # its place is gone
+            new.extend(known.pop(cid))
+    new.sort()
+    clusters = list(known.values())
+
+    # new records among themselves; on copies, since fold() rebuilds merged content
+    copies = {i: copy.deepcopy(recs[i]) for i in new}
+    pos = {id(r): i for i, r in copies.items()}
+    members = {}
+    def on_merge(t, c):
+        members.setdefault(pos[id(t)], []).append(pos[id(c)])
+
+    def pick(src):
+        return [copies[i] for i in new if sources[i] == src]
+    with instrument.stage("match_new"):
+        merged = merge_sources(pick("osm"), pick("opentripmap"), pick("wikidata"), engine=engine, on_merge=on_merge)
+    fresh = []
+    for t in merged:
+        group, todo = [], [pos[id(t)]]
+        while todo:  # members can have members: duplicates folded in before the cross-source merge
+            m = todo.pop()
+            group.append(m)
+            todo.extend(members.get(m, []))
+        fresh.append(sorted(group))
+
+    # ...then against the known places
+    def seed(group):
+        return recs[min(i for i in group if sources[i] != "wikidata")]
+    def src_mask(group):
+        return sum(1 << SOURCES.index(s) for s in {sources[i] for i in group})
+    n_known = len(clusters)
+    with instrument.stage("match_known"):
+        targets = batch_match.match_known(
+            [seed(g) for g in clusters], [seed(g) for g in fresh], lat_bound,
+            [src_mask(g) for g in clusters], [src_mask(g) for g in fresh],
+            cross_src=1 << SOURCES.index("opentripmap"), radius=OTM_RADIUS_M, dup_radius=DUP_RADIUS_M, dup_thr=DUP_SIM_THR)
+        for g, k in zip(fresh, targets):
+            if k is None:
+                clusters.append(g)
+            else:
+                clusters[k].extend(g)
+        matched = {i for g in fresh for i in g}
+        loose = [i for i in new if sources[i] == "wikidata" and i not in matched]
+        if loose and n_known:
+            for i, k in zip(loose, batch_match.match_wd([seed(g) for g in clusters[:n_known]],
+                                                        [recs[i] for i in loose], lat_bound, radius=WD_RADIUS_M)):
+                if k is not None:
+                    clusters[k].append(i)
+
+    canonical, taken = [], set()
+    with instrument.stage("fold"):
+        for group in sorted(clusters, key=lambda g: min(i for i in g if sources[i] != "wikidata")):
+            t = fold(recs, sources, group)
+            group = sorted(group)
+            cid = registry.assign([keys[i] for i in group], f"bestmuscat:{t['category']}:",
+                                  slugify(t["name"])[:reconcile_state.SLUG_MAX], taken, [hashes[i] for i in group])
+            place = canonical_place(t, cid)
+            if place is not None:
+                canonical.append(place)
+    instrument.count("records", len(recs))
+    instrument.count("records_attached", len(recs) - len(new))
+    instrument.count("records_changed", changed)
+    instrument.count("places", len(canonical))
+    print(f"Reconcile: {len(recs) - len(new)}/{len(recs)} records attached by id, "
+          f"{len(new)} matched ({changed} changed upstream, {len(fresh) - targets.count(None)} joined known places)")
+    return canonical, registry
+
+def reconcile_and_merge(engine=None, rematch=False):
+    canonical, registry = build_places(engine=engine or ENGINE, rematch=rematch)
+    with instrument.stage("write"):
+        write_places(canonical)
+        registry.save()
     print(f"Wrote {len(canonical)} places → {OUT}")
 
+def compare_engines():
+    """Run every engine and check they agree with the brute-force scan."""
+    def run(engine):
+        return build_places(engine=engine, registry=reconcile_state.IdRegistry())[0]
+    expected = run("brute")
+    bad = [e for e in ENGINES if e != "brute" and run(e) != expected]
+    if bad:
+        print(f"MISMATCH: {', '.join(bad)} disagree with brute force")
+        sys.exit(1)
+    print(f"OK: all engines agree on {len(expected)} places")
+
 if __name__ == "__main__":
-    reconcile_and_merge()
+    ap = argparse.ArgumentParser(description="Reconcile raw OSM/OTM/Wikidata into data/places.json")
+    ap.add_argument("--engine", choices=ENGINES, help="Matching engine (default: $RECONCILE_ENGINE or batch)")
+    ap.add_argument("--compare", action="store_true", help="Check all engines agree with brute force; writes nothing")
+    ap.add_argument("--full", action="store_true", help="Fuzzy-match every record again instead of attaching known ids")
+    args = ap.parse_args()
+    if args.compare:
+        compare_engines()
+    else:
+        with instrument.run("reconcile"):
+            reconcile_and_merge(engine=args.engine, rematch=args.full)
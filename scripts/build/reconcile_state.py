@@ -0,0 +1,88 @@
+import hashlib, json
+
+from .utils import DATA_DIR, read_json, write_json
+
+# Persisted source id -> canonical id registry for reconcile runs
+REGISTRY_PATH = DATA_DIR / "id_registry.json"
+REGISTRY_VERSION = 2  # 2 adds per-record content hashes; version 1 files load without them
+SLUG_MAX = 80
+
+def record_keys(source, records):
+    """Stable per-record keys like "osm:node/123"; repeats get a "#n" suffix."""
+    seen = {}
+    keys = []
+    for r in records:
+        sid = ((r.get("sources") or {}).get(source) or {}).get("id")
+        base = f"{source}:{sid}"
+        n = seen.get(base, 0)
+        seen[base] = n + 1
+        keys.append(base if n == 0 else f"{base}#{n}")
+    return keys
+
+def record_hash(rec) -> str:
+    blob = json.dumps(rec, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha1(blob).hexdigest()[:16]
+
+def registrable(key):
+    # records without a source id (or repeating one) can't be recognised next run
+    return not key.endswith(":None") and "#" not in key
+
+class IdRegistry:
+    """Which canonical id every source record belongs to, and every id ever issued.
+
+    sources: record key ("osm:node/123") -> canonical id
+    ids:     canonical id -> key of the record it was first issued for
+    hashes:  record key -> record_hash of the record when it was bound
+
+    Issued ids stay reserved even after their place disappears, so a slug
+    is never handed to a different venue.
+    """
+
+    def __init__(self, sources=None, ids=None, hashes=None):
+        self.sources = dict(sources or {})
+        self.ids = dict(ids or {})
+        self.hashes = dict(hashes or {})
+
+    @classmethod
+    def load(cls, path=REGISTRY_PATH):
+        data = read_json(path, default=None)
+        if not data or data.get("version") not in (1, REGISTRY_VERSION):
+            return cls()
+        return cls(data.get("sources"), data.get("ids"), data.get("hashes"))
+
+    def save(self, path=REGISTRY_PATH):
+        write_json(path, {"version": REGISTRY_VERSION, "sources": self.sources, "ids": self.ids,
+                          "hashes": self.hashes})
+
+    def get(self, key, rec_hash=None):
+        """The key's canonical id; None if unknown or, given `rec_hash`, if the record changed since."""
+        if rec_hash is not None and self.hashes.get(key) != rec_hash:
+            return None
+        return self.sources.get(key)
+
+    def assign(self, keys, prefix, slug, taken, hashes=None):
+        """Canonical id for a cluster of record keys (in record order).
+
+        Reuses the first registered id among the keys that no other cluster
+        in this run has `taken`; otherwise issues prefix + slug, or slug-2,
+        slug-3, ... (still at most SLUG_MAX chars) when that is reserved.
+        Binds every registrable key to the id (recording its content hash
+        from `hashes`, parallel to `keys`), and only reserves it if there
+        is one.
+        """
+        cid = next((c for c in map(self.sources.get, keys) if c and c not in taken), None)
+        stable = [k for k in keys if registrable(k)]
+        if cid is None:
+            cid, n = prefix + slug, 1
+            while cid in self.ids or cid in taken:
+                n += 1
+                cid = f"{prefix}{slug[:SLUG_MAX - len(str(n)) - 1]}-{n}"
+            if stable:
+                self.ids[cid] = stable[0]
+        taken.add(cid)
+        for k, h in zip(keys, hashes or [None] * len(keys)):
+            if registrable(k):
+                self.sources[k] = cid
+                if h is not None:
+                    self.hashes[k] = h
+        return cid
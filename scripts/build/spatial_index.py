@@ -0,0 +1,42 @@
+import math
+from collections import defaultdict
+
+# Metres per degree of latitude on the sphere used by utils.haversine_m
+M_PER_DEG = 6371000.0 * math.pi / 180.0
+
+class GridIndex:
+    """Buckets points into lat/lon cells at least `radius_m` wide.
+
+    Any point within `radius_m` of a query lies in the 3x3 block of cells
+    around it, so `near()` only has to look at those. Keys come back in
+    insertion order, which keeps first-match / best-score ties identical
+    to a linear scan over the same list.
+    """
+
+    def __init__(self, radius_m: float, max_abs_lat: float = 0.0):
+        # 1% slack so rounding at cell borders can never drop a true neighbour
+        self.lat_step = radius_m * 1.01 / M_PER_DEG
+        lat_bound = min(abs(max_abs_lat) + self.lat_step, 89.0)
+        self.lon_step = self.lat_step / math.cos(math.radians(lat_bound))
+        self.cells = defaultdict(list)
+
+    def cell(self, lat, lon):
+        return (math.floor(lat / self.lat_step), math.floor(lon / self.lon_step))
+
+    def add(self, key: int, lat: float, lon: float):
+        self.cells[self.cell(lat, lon)].append(key)
+
+    def near(self, lat: float, lon: float) -> list[int]:
+        return self.near_cell(self.cell(lat, lon))
+
+    def near_cell(self, cell) -> list[int]:
+        cy, cx = cell
+        out = []
+        for dy in (-1, 0, 1):
+            for dx in (-1, 0, 1):
+                out.extend(self.cells.get((cy + dy, cx + dx), ()))
+        out.sort()
+        return out
+
+def max_abs_lat(records) -> float:
+    return max((abs(r["location"]["lat"]) for r in records), default=0.0)
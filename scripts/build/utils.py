@@ -4,10 +4,19 @@ from slugify import slugify as _slugify
 
 # Paths (relative to repo)
 ROOT = Path(__file__).resolve().parents[2]  # repo root
-DATA_DIR = ROOT / "data"
+# PIPELINE_DATA_DIR points every stage at another data tree (used by scripts.bench)
+DATA_DIR = Path(os.getenv("PIPELINE_DATA_DIR") or ROOT / "data")
 RAW_DIR = DATA_DIR / "raw"
 MEDIA_DIR = DATA_DIR / "media"
 
+# Canonical places: one JSON record per line. places.json is the compact
+# array published next to it for the browser and older tools.
+PLACES_NDJSON = DATA_DIR / "places.ndjson"
+PLACES_JSON = DATA_DIR / "places.json"
+
+# Build outputs are minified; PRETTY_JSON=1 indents them for reading
+PRETTY_JSON = os.getenv("PRETTY_JSON", "0") == "1"
+
 MEDIA_DIR.mkdir(parents=True, exist_ok=True)
 RAW_DIR.mkdir(parents=True, exist_ok=True)
 
@@ -33,10 +42,54 @@ def read_json(path: Path, default=None):
     with open(path, "r", encoding="utf-8") as f:
         return json.load(f)
 
-def write_json(path: Path, obj):
+def dumps_json(obj, pretty=None) -> str:
+    if pretty if pretty is not None else PRETTY_JSON:
+        return json.dumps(obj, ensure_ascii=False, indent=2)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+def write_json(path: Path, obj, pretty=None):
     path.parent.mkdir(parents=True, exist_ok=True)
     with open(path, "w", encoding="utf-8") as f:
-        json.dump(obj, f, ensure_ascii=False, indent=2)
+        f.write(dumps_json(obj, pretty))
+
+# NDJSON IO (one record per line, streamed)
+def iter_ndjson(path: Path):
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def write_ndjson(path: Path, records) -> int:
+    """Write an iterable of records, one per line; replaces `path` only once complete."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    n = 0
+    with open(tmp, "w", encoding="utf-8") as f:
+        for rec in records:
+            f.write(json.dumps(rec, ensure_ascii=False, separators=(",", ":")))
+            f.write("\n")
+            n += 1
+    os.replace(tmp, path)
+    return n
+
+def places_path() -> Path:
+    """The canonical places file; trees that predate NDJSON only have places.json."""
+    return PLACES_NDJSON if PLACES_NDJSON.exists() else PLACES_JSON
+
+def iter_places():
+    path = places_path()
+    if path == PLACES_NDJSON:
+        yield from iter_ndjson(path)
+    elif path.exists():
+        yield from read_json(path, default=[]) or []
+
+def read_places() -> list:
+    return list(iter_places())
+
+def write_places(places):
+    """Write the canonical NDJSON and the compact places.json published from it."""
+    write_ndjson(PLACES_NDJSON, places)
+    write_json(PLACES_JSON, places)
 
 # Taxonomy (fallback)
 def load_taxonomy():
@@ -56,3 +109,27 @@ def norm_name(s: str) -> str:
     s = re.sub(r"[^a-z0-9\s&-]", "", s)
     s = re.sub(r"\s+", " ", s)
     return s
+
+# Disjoint sets (union-find) for clustering record ids
+class UnionFind:
+    def __init__(self, items=()):
+        self.parent = {x: x for x in items}
+
+    def find(self, x):
+        parent = self.parent
+        parent.setdefault(x, x)
+        while parent[x] != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    def union(self, a, b):
+        ra, rb = self.find(a), self.find(b)
+        if ra != rb:
+            self.parent[rb] = ra
+
+    def groups(self):
+        out = {}
+        for x in self.parent:
+            out.setdefault(self.find(x), []).append(x)
+        return out
@@ -1 +1,277 @@
-# Placeholder: parse hours formats into canonical hours map.
+"""
+Opening hours as a weekly bitmap: 7 days x 96 quarter hours, Monday 00:00
+(local time) first. While parsing a week is one 672-bit int; stored and
+shipped it is packed into 21 uint32 words (3 per day, bit q of the day's
+slots in word q // 32), which stay exact as JSON numbers in a browser.
+
+parse() reads
+  - OSM opening_hours strings, the common subset: "24/7", "Mo-Fr 09:00-17:00",
+    "Sa-Th 12:00-15:00,18:00-01:00; Fr off", "Mo,We 10:00-14:00, Su 12:00-16:00";
+    later ";" rules replace the days they name, times past midnight run into
+    the next day and belong to the day they start on (so "Th 18:00-01:00;
+    Fr off" keeps Thursday night's hour on Friday), a day list without
+    times means all day, and PH/SH (holiday) rules are left out of the
+    regular week
+  - Google Places {"periods": [{"open": {"day": 0, "time": "0800"}, "close": {...}}]}
+  - Foursquare {"regular": [{"day": 1, "open": "0800", "close": "+0200"}]}
+  - day-keyed maps {"mon": "09:00-17:00", "fri": "closed", "sat": ["10:00-14:00", ...]}
+  - an already packed list of 21 words
+format_week() writes a week back as a normalized OSM string, so normalize()
+gives every source the same spelling in places.json.
+
+Times are rounded outwards to whole slots (12:10-12:50 counts 12:00-13:00).
+Selectors outside that subset (months, sunrise, week numbers) raise
+ValueError.
+"""
+
+import os, re
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+SLOT_MIN = 15
+DAY_SLOTS = 24 * 60 // SLOT_MIN       # 96
+WEEK_SLOTS = 7 * DAY_SLOTS            # 672
+WORDS = WEEK_SLOTS // 32              # 21
+FULL = (1 << WEEK_SLOTS) - 1
+UTC_OFFSET_MIN = int(os.getenv("HOURS_UTC_OFFSET_MIN", "240"))  # Asia/Muscat, no DST
+
+DAYS = ("Mo", "Tu", "We", "Th", "Fr", "Sa", "Su")
+DAY_INDEX = {}
+for _i, _d in enumerate(("monday", "tuesday", "wednesday", "thursday", "friday", "saturday", "sunday")):
+    DAY_INDEX.update({_d: _i, _d[:3]: _i, _d[:2]: _i})
+
+_TOKEN = re.compile(r"""\s*(?:
+    (?P<always>24/7)
+  | (?P<time>\d{1,2}:?\d{2}\s*-\s*\d{1,2}:?\d{2})
+  | (?P<days>[A-Za-z]+(?:\s*-\s*[A-Za-z]+)?)
+  | (?P<comma>,)
+)""", re.X)
+_CLOSED = {"off", "closed"}
+_HOLIDAYS = {"ph", "sh"}  # public/school holidays: not part of the regular week
+
+def _minutes(t: str) -> int:
+    t = t.strip().lstrip("+").replace(":", "")
+    if not t.isdigit() or len(t) not in (3, 4):
+        raise ValueError(f"bad time {t!r}")
+    h, m = int(t[:-2]), int(t[-2:])
+    if h > 24 or m > 59 or (h == 24 and m):
+        raise ValueError(f"bad time {t!r}")
+    return h * 60 + m
+
+def _span(start: int, end: int) -> int:
+    """Bits for [start, end) in week minutes; wraps past Sunday midnight."""
+    a, n = start // SLOT_MIN, -(-end // SLOT_MIN) - start // SLOT_MIN
+    if n <= 0:
+        return 0
+    if n >= WEEK_SLOTS:
+        return FULL
+    bits = ((1 << n) - 1) << (a % WEEK_SLOTS)
+    return (bits | bits >> WEEK_SLOTS) & FULL
+
+def _day(name: str) -> int:
+    try:
+        return DAY_INDEX[name.lower()]
+    except KeyError:
+        raise ValueError(f"unsupported selector {name!r}") from None
+
+def _day_range(tok: str):
+    if "-" not in tok:
+        return [_day(tok)]
+    a, b = (_day(x.strip()) for x in tok.split("-"))
+    return [(a + k) % 7 for k in range((b - a) % 7 + 1)]
+
+def _times(day: int, spec: str) -> int:
+    a, b = (_minutes(x) for x in spec.split("-"))
+    if b <= a:  # past midnight
+        b += 24 * 60
+    return _span(day * 1440 + a, day * 1440 + b)
+
+def _day_bits(days) -> int:
+    return sum(((1 << DAY_SLOTS) - 1) << (d * DAY_SLOTS) for d in set(days))
+
+def _parse_osm(s: str) -> int:
+    by_day = [0] * 7  # bits each day's times give, spill past midnight included
+    for rule in re.split(r";|\|\|", s.replace("–", "-").replace("—", "-")):
+        rule = rule.strip()
+        if not rule:
+            continue
+        ruled = {}  # day -> its bits under this rule
+        days, times, closed, holiday = [], [], False, False
+
+        def close_group():
+            if holiday and not days:
+                return
+            for d in days or range(7):
+                bits = 0
+                if not closed:
+                    bits = sum(_times(d, t) for t in times) if times else _day_bits([d])
+                ruled[d] = ruled.get(d, 0) | bits
+
+        pos = 0
+        while pos < len(rule):
+            m = _TOKEN.match(rule, pos)
+            if not m or m.end() == pos:
+                raise ValueError(f"can't parse {rule[pos:]!r}")
+            pos = m.end()
+            if m["always"]:
+                days, times = list(range(7)), ["00:00-24:00"]
+            elif m["time"]:
+                times.append(m["time"])
+            elif m["days"] and m["days"].lower() in _CLOSED:
+                closed = True
+            elif m["days"]:
+                if times or closed:  # "Mo-Fr 09:00-17:00, Sa 10:00-14:00": an additional rule
+                    close_group()
+                    days, times, closed, holiday = [], [], False, False
+                if m["days"].lower() in _HOLIDAYS:
+                    holiday = True
+                else:
+                    days.extend(_day_range(m["days"]))
+        close_group()
+        for d, bits in ruled.items():
+            by_day[d] = bits
+    week = 0
+    for bits in by_day:
+        week |= bits
+    return week
+
+def _parse_google(periods) -> int:
+    week = 0
+    for p in periods:
+        o, c = p.get("open") or {}, p.get("close")
+        start = ((o.get("day", 0) - 1) % 7) * 1440 + _minutes(o.get("time", "0000"))
+        if not c:  # open with no close: always open
+            return FULL
+        end = ((c.get("day", 0) - 1) % 7) * 1440 + _minutes(c.get("time", "0000"))
+        if end <= start:
+            end += 7 * 1440
+        week |= _span(start, end)
+    return week
+
+def _parse_foursquare(regular) -> int:
+    week = 0
+    for r in regular:
+        day = (int(r["day"]) - 1) % 7
+        start = day * 1440 + _minutes(r["open"])
+        end = day * 1440 + _minutes(r["close"]) + (1440 if str(r["close"]).startswith("+") else 0)
+        if end <= start:
+            end += 1440
+        week |= _span(start, end)
+    return week
+
+def _parse_day_map(m) -> int:
+    week, named = 0, 0
+    for k, v in m.items():
+        days = _day_range(k)
+        named |= _day_bits(days)
+        specs = [v] if isinstance(v, str) else list(v or [])
+        for d in days:
+            for spec in specs:
+                spec = spec.strip()
+                if spec.lower() in _CLOSED or not spec:
+                    continue
+                week |= _day_bits([d]) if spec.lower() in ("24h", "24 hours", "open 24 hours") else _times(d, spec)
+    return week
+
+def parse(value):
+    """Week bitmap (672-bit int) for any supported format; None when there are no hours."""
+    if value is None or value == "" or value == {} or value == []:
+        return None
+    if isinstance(value, str):
+        return _parse_osm(value)
+    if isinstance(value, (list, tuple)) and len(value) == WORDS and all(isinstance(w, int) for w in value):
+        return unpack(value)
+    if isinstance(value, dict):
+        if "periods" in value:
+            return _parse_google(value["periods"] or [])
+        if "regular" in value:
+            return _parse_foursquare(value["regular"] or [])
+        return _parse_day_map(value)
+    raise ValueError(f"unsupported hours value {type(value).__name__}")
+
+def pack(week: int) -> list:
+    return [(week >> (32 * i)) & 0xFFFFFFFF for i in range(WORDS)]
+
+def unpack(words) -> int:
+    return sum(int(w) << (32 * i) for i, w in enumerate(words))
+
+def _clock(slot: int) -> str:
+    return f"{slot * SLOT_MIN // 60:02d}:{slot * SLOT_MIN % 60:02d}"
+
+def _day_intervals(week: int):
+    """Per day, [start, end) slot intervals; an evening that runs past
+    midnight keeps its small-hours tail (ending by 06:00) as end > 96."""
+    out = []
+    for d in range(7):
+        bits, ivs, s = (week >> (d * DAY_SLOTS)) & ((1 << DAY_SLOTS) - 1), [], None
+        for q in range(DAY_SLOTS + 1):
+            on = q < DAY_SLOTS and bits >> q & 1
+            if on and s is None:
+                s = q
+            elif not on and s is not None:
+                ivs.append([s, q])
+                s = None
+        out.append(ivs)
+    for d in range(7):
+        ivs, nxt = out[d], out[(d + 1) % 7]
+        if (ivs and ivs[-1][1] == DAY_SLOTS and ivs[-1][0] > 0 and nxt and nxt[0][0] == 0
+                and nxt[0][1] <= 6 * 60 // SLOT_MIN and nxt[0][1] < ivs[-1][0]):
+            # only when the end clock reads earlier than the start, or "01:15-04:15" would be same-day
+            ivs[-1][1] += nxt.pop(0)[1]
+    return out
+
+def format_week(week) -> str:
+    """Normalized OSM opening_hours string for a week bitmap."""
+    if not week:
+        return "off"
+    if week == FULL:
+        return "24/7"
+    spec = [",".join(f"{_clock(a)}-{_clock(b % DAY_SLOTS) if b != DAY_SLOTS else '24:00'}" for a, b in ivs)
+            for ivs in _day_intervals(week)]
+    groups = []  # [first day, last day, spec]
+    for d, s in enumerate(spec):
+        if groups and groups[-1][2] == s and groups[-1][1] == d - 1:
+            groups[-1][1] = d
+        else:
+            groups.append([d, d, s])
+    if len(groups) > 1 and groups[0][2] == groups[-1][2] and groups[0][0] == 0 and groups[-1][1] == 6:
+        first = groups.pop(0)  # wrap round the week: "Sa-Th"
+        groups[-1][1] = first[1]
+    rules = []
+    for a, b, s in groups:
+        if s:
+            days = DAYS[a] if a == b else f"{DAYS[a]}{',' if (b - a) % 7 == 1 else '-'}{DAYS[b]}"
+            rules.append(f"{days} {s}")
+    # additional rules (","), not ";": a later ";" rule would replace the day an overnight span runs into
+    return ", ".join(rules)
+
+def normalize(value):
+    """Normalized opening_hours string, the input (as text) if it can't be parsed, or None."""
+    try:
+        week = parse(value)
+    except (ValueError, KeyError, TypeError, AttributeError):
+        return value.strip() if isinstance(value, str) else None
+    return None if week is None else format_week(week)
+
+def week_slot(when=None) -> int:
+    """Slot of the week (0 = Monday 00:00 local) for a datetime; naive ones are taken as local."""
+    when = when or datetime.now(timezone.utc)
+    if when.tzinfo is not None:
+        when = when.astimezone(timezone(timedelta(minutes=UTC_OFFSET_MIN)))
+    return when.weekday() * DAY_SLOTS + (when.hour * 60 + when.minute) // SLOT_MIN
+
+def to_array(weeks) -> np.ndarray:
+    """Packed bitmaps (n, WORDS) uint32 for a list of week ints."""
+    return np.array([pack(w) for w in weeks], dtype=np.uint32).reshape(-1, WORDS)
+
+def open_at(bits: np.ndarray, when=None) -> np.ndarray:
+    """Which of the packed bitmaps `bits` (n, WORDS) are open at `when` (a datetime or week slot)."""
+    slot = when if isinstance(when, (int, np.integer)) else week_slot(when)
+    word, bit = divmod(int(slot), 32)
+    return ((bits[:, word] >> np.uint32(bit)) & np.uint32(1)).astype(bool)
+
+def open_matrix(bits: np.ndarray) -> np.ndarray:
+    """(n, WEEK_SLOTS) bool: every place in every slot of the week."""
+    as_bytes = np.ascontiguousarray(bits, dtype="<u4").view(np.uint8)
+    return np.unpackbits(as_bytes, axis=1, bitorder="little").astype(bool)
@@ -10,33 +10,60 @@ Strategy per tool (when logo is missing or "generic.png"):
    - <meta property="og:image" ...> / <meta name="twitter:image" ...>
 The first image we can successfully fetch becomes the logo.
 
-We save logos to assets/logos/<slug>.png and write that path back into tools.json.
+Lookups run once per domain (many tools share one, e.g. hotel chains), in a
+thread pool with a per-host request cap. Results, including "no logo found",
+are kept in data/logo_cache.json and reused until their retry TTL expires.
+Logos are stored by content hash as assets/logos/<hash>.png, so identical
+logos are written once and shared; that path is written back into tools.json.
+
+Run from the repo root:  python -m scripts.fetch_logos
 """
 
+import hashlib
 import json
 import os
-import re
 import sys
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from io import BytesIO
+from pathlib import Path
 from urllib.parse import urlparse, urljoin
 
 import requests
 from bs4 import BeautifulSoup
 from PIL import Image
+from requests.adapters import HTTPAdapter
+
+from scripts.build.utils import write_json
+from scripts.utils.ratelimit import HostLimiter
 
-ROOT = os.path.dirname(os.path.dirname(__file__))  # repo root from scripts/
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))  # repo root from scripts/
 DATA_JSON = os.path.join(ROOT, "data", "tools.json")
 LOGO_DIR = os.path.join(ROOT, "assets", "logos")
+CACHE_JSON = os.path.join(ROOT, "data", "logo_cache.json")
 
 HEADERS = {
     "User-Agent": "Mozilla/5.0 (compatible; LogoFetcher/1.0; +https://github.com/)"
 }
 TIMEOUT = 15
 
+WORKERS = int(os.getenv("LOGO_WORKERS", "16"))
+PER_HOST = int(os.getenv("LOGO_PER_HOST", "4"))  # every domain hits clearbit/google, so this matters
+
+# How long a cached result is trusted before the domain is looked up again
+FOUND_TTL = 90 * 86400
+NOT_FOUND_TTL = 14 * 86400
 
-def slugify(s: str) -> str:
-    return re.sub(r"(^-|-$)", "", re.sub(r"[^a-z0-9]+", "-", s.lower()))[:128]
+HOSTS = HostLimiter(PER_HOST)
+SESSION = requests.Session()
+SESSION.mount("http://", HTTPAdapter(pool_connections=WORKERS, pool_maxsize=WORKERS))
+SESSION.mount("https://", HTTPAdapter(pool_connections=WORKERS, pool_maxsize=WORKERS))
+SESSION.headers.update(HEADERS)
+
+
+def _get(url: str, **kw) -> requests.Response:
+    with HOSTS.slot(url):
+        return SESSION.get(url, timeout=TIMEOUT, **kw)
 
 
 def ensure_dirs():
@@ -50,7 +77,7 @@ def is_image_response(resp: requests.Response) -> bool:
 
 def download_image(url: str) -> Image.Image | None:
     try:
-        r = requests.get(url, headers=HEADERS, timeout=TIMEOUT, allow_redirects=True)
+        r = _get(url, allow_redirects=True)
         if not is_image_response(r):
             return None
         im = Image.open(BytesIO(r.content))
@@ -60,14 +87,52 @@ def download_image(url: str) -> Image.Image | None:
         return None
 
 
-def save_png(im: Image.Image, path: str):
+def png_bytes(im: Image.Image) -> bytes:
     # If very small (e.g., 16px favicon), upscale a bit for nicer display
     w, h = im.size
     if max(w, h) < 64:
         scale = 128 // max(1, max(w, h))
         if scale > 1:
             im = im.resize((max(64, w * scale), max(64, h * scale)), Image.LANCZOS)
-    im.save(path, format="PNG", optimize=True)
+    buf = BytesIO()
+    im.save(buf, format="PNG", optimize=True)
+    return buf.getvalue()
+
+
+def store_logo(im: Image.Image) -> str:
+    """Write the logo under its content hash (once) and return the repo-relative path."""
+    data = png_bytes(im)
+    out_rel = f"assets/logos/{hashlib.sha1(data).hexdigest()[:16]}.png"
+    out_abs = os.path.join(ROOT, out_rel)
+    if not os.path.exists(out_abs):
+        tmp = f"{out_abs}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, out_abs)
+    return out_rel
+
+
+def load_cache() -> dict:
+    try:
+        with open(CACHE_JSON, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(cache: dict):
+    with open(CACHE_JSON, "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False, indent=2, sort_keys=True)
+        f.write("\n")
+
+
+def cache_is_fresh(entry: dict | None, now: float) -> bool:
+    if not entry:
+        return False
+    if entry.get("logo") and not os.path.exists(os.path.join(ROOT, entry["logo"])):
+        return False  # file was removed; fetch again
+    ttl = FOUND_TTL if entry.get("logo") else NOT_FOUND_TTL
+    return now - entry.get("checked_at", 0) < ttl
 
 
 def domain_from_url(url: str) -> str:
@@ -81,7 +146,7 @@ def domain_from_url(url: str) -> str:
 def homepage_icons(home_url: str) -> list[str]:
     """Scrape a homepage for candidate icon/image URLs (absolute)."""
     try:
-        r = requests.get(home_url, headers=HEADERS, timeout=TIMEOUT)
+        r = _get(home_url)
         r.raise_for_status()
     except Exception:
         return []
@@ -149,6 +214,12 @@ def best_logo_for(url: str) -> Image.Image | None:
     return None
 
 
+def resolve_domain(url: str) -> str | None:
+    """Worker: find and store the logo for the domain of `url`; returns its path or None."""
+    im = best_logo_for(url)
+    return store_logo(im) if im else None
+
+
 def main():
     ensure_dirs()
 
@@ -158,43 +229,54 @@ def main():
             print("ERROR: data/tools.json must be an array of tools.")
             sys.exit(1)
 
-    updated = 0
+    cache = load_cache()
+    now = time.time()
     skipped = 0
 
+    # group tools needing a logo by domain: one lookup serves them all
+    by_domain: dict[str, list[dict]] = {}
     for t in tools:
-        name = t.get("name") or t.get("id") or "tool"
-        slug = (t.get("slug") or slugify(name))
         url = t.get("url") or ""
         logo = t.get("logo") or ""
 
         # Only fetch when (a) we have a URL and (b) logo is missing or generic
         needs_logo = (not logo) or logo.endswith("/generic.png") or logo.endswith("generic.png")
+        dom = domain_from_url(url) if url else ""
 
-        if not url or not needs_logo:
+        if not dom or not needs_logo:
             skipped += 1
             continue
+        by_domain.setdefault(dom, []).append(t)
 
-        print(f"[logo] Fetching for: {name}  ({url})")
-        im = best_logo_for(url)
-        if not im:
-            print("  - No logo found. Leaving as is.")
-            continue
-
-        out_rel = f"assets/logos/{slug}.png"
-        out_abs = os.path.join(ROOT, out_rel)
-        save_png(im, out_abs)
+    stale = {dom: ts[0]["url"] for dom, ts in by_domain.items() if not cache_is_fresh(cache.get(dom), now)}
+    print(f"[logo] {len(by_domain)} domains need logos; {len(by_domain) - len(stale)} cached, {len(stale)} to fetch")
 
-        t["logo"] = out_rel
-        updated += 1
+    try:
+        with ThreadPoolExecutor(WORKERS) as ex:
+            futures = {ex.submit(resolve_domain, url): dom for dom, url in stale.items()}
+            for fut in as_completed(futures):
+                dom = futures[fut]
+                try:
+                    path = fut.result()
+                except Exception as e:
+                    print(f"  - {dom}: lookup failed ({e}); will retry next run")
+                    continue
+                cache[dom] = {"logo": path, "checked_at": time.time()}
+                print(f"[logo] {dom}: {path or 'no logo found'}")
+    finally:
+        save_cache(cache)  # keep finished lookups even if interrupted
 
-        # Be nice to endpoints
-        time.sleep(0.3)
+    updated = 0
+    for dom, ts in by_domain.items():
+        path = (cache.get(dom) or {}).get("logo")
+        if not path:
+            continue
+        for t in ts:
+            t["logo"] = path
+            updated += 1
 
     if updated:
-        # Write back pretty but compact
-        with open(DATA_JSON, "w", encoding="utf-8") as f:
-            json.dump(tools, f, ensure_ascii=False, indent=2)
-            f.write("\n")
+        write_json(Path(DATA_JSON), tools)  # minified unless PRETTY_JSON=1
         print(f"Updated {updated} logo(s).")
     else:
         print("No logos updated (either all set or no matches).")
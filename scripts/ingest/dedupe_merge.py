@@ -1,13 +1,139 @@
-# Minimal dedupe/merge stub: pass-through normalized -> merged
+# Dedupe/merge normalized places:  python -m scripts.ingest.dedupe_merge [--window N]
+# Streams scripts/tmp/normalized.jsonl -> scripts/tmp/merged.jsonl in bounded memory.
+#
+# Sorted-neighbourhood dedupe: every record gets a blocking key (geohash cell
+# plus the first letters of its phonetic name key from
+# scripts/build/match_features.py, so Arabic and Latin spellings share a
+# block), records are put in key order by an external merge sort (sorted runs
+# spilled to a temp dir, DEDUPE_TMPDIR), and each one is compared with the
+# places of the last WINDOW in that order. Name features are extracted once,
+# before the sort, and travel with the record. Within DIST_M and at SIM_THR
+# name similarity (match_features.dup_similarity, generic words ignored) it
+# is folded into the earlier place field by field: empty location/action
+# fields and hours are filled, categories and provenance unioned, and its id
+# listed under "duplicates". Output is in block order.
+#
+# Places either side of a geohash cell edge sort apart and are not compared;
+# the cell (GEOHASH_PREFIX characters, about 5 km) is wide so this is rare.
+# Records without coordinates are passed through unmerged.
+import argparse, json, os, tempfile
+from collections import deque
 from pathlib import Path
-import json
 
-src = Path('scripts/tmp/normalized.jsonl')
-dst = Path('scripts/tmp/merged.jsonl')
-dst.parent.mkdir(parents=True, exist_ok=True)
+from scripts.build.match_features import MatchFeatures, dup_similarity, extract
+from scripts.build.utils import haversine_m
+from scripts.utils import instrument
+from scripts.utils.stream import external_sort, read_jsonl, write_jsonl
 
-if not src.exists():
-    dst.write_text('', encoding='utf-8')
-else:
-    dst.write_text(src.read_text(), encoding='utf-8')
-print(f"Wrote {dst}")
+ROOT = Path(__file__).resolve().parents[2]
+SRC = ROOT / "scripts/tmp/normalized.jsonl"
+DST = ROOT / "scripts/tmp/merged.jsonl"
+
+WINDOW = int(os.getenv("DEDUPE_WINDOW", "20"))
+TMPDIR = os.getenv("DEDUPE_TMPDIR") or None
+DIST_M = 150
+SIM_THR = 0.9
+GEOHASH_PREFIX = 5
+NAME_PREFIX = 3
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+def geohash(lat, lon, precision=9):
+    lat_rng, lon_rng = [-90.0, 90.0], [-180.0, 180.0]
+    out, ch, bits, even = [], 0, 0, True
+    while len(out) < precision:
+        rng, v = (lon_rng, lon) if even else (lat_rng, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if v >= mid:
+            ch, rng[0] = ch << 1 | 1, mid
+        else:
+            ch, rng[1] = ch << 1, mid
+        even = not even
+        bits += 1
+        if bits == 5:
+            out.append(_BASE32[ch])
+            ch = bits = 0
+    return "".join(out)
+
+def _coords(rec):
+    loc = rec.get("location") or {}
+    lat, lng = loc.get("lat"), loc.get("lng")
+    if isinstance(lat, (int, float)) and isinstance(lng, (int, float)):
+        return lat, lng
+    return None
+
+def block_key(rec, feats):
+    """Sort key: geohash cell, name prefix, then the full geohash so neighbours stay adjacent."""
+    ll = _coords(rec)
+    gh = geohash(*ll) if ll else "~" * 9  # no location: sorted last
+    name = (feats.phonetic or feats.norm).replace(" ", "")[:NAME_PREFIX]
+    return f"{gh[:GEOHASH_PREFIX]}{name:~<{NAME_PREFIX}}{gh}"
+
+def _empty(v):
+    return v is None or v == "" or v == [] or v == {}
+
+def merge_into(t, d):
+    """Fold duplicate d into t; t keeps its id, slug, name and coordinates."""
+    for section in ("location", "actions"):
+        ts = t.setdefault(section, {})
+        for k, v in (d.get(section) or {}).items():
+            if _empty(ts.get(k)) and not _empty(v):
+                ts[k] = v
+    cats = t.setdefault("categories", [])
+    cats.extend(c for c in d.get("categories") or [] if c not in cats)
+    if _empty(t.get("hours")) and not _empty(d.get("hours")):
+        t["hours"] = d["hours"]
+    prov = t.setdefault("provenance", [])
+    prov.extend(p for p in d.get("provenance") or [] if p not in prov)
+    if (d.get("last_updated") or "") > (t.get("last_updated") or ""):
+        t["last_updated"] = d["last_updated"]
+    t.setdefault("duplicates", []).extend([d.get("id")] + (d.get("duplicates") or []))
+
+def _same_place(a, b):
+    """a, b: (features, coords) of two records."""
+    if a[1] is None or b[1] is None or haversine_m(*a[1], *b[1]) > DIST_M:
+        return False
+    return dup_similarity(a[0], b[0]) >= SIM_THR
+
+def _sort_line(seq, rec):
+    """'<block key><seq>\t<features>\t<record>': JSON escapes tabs, so the fields split cleanly."""
+    f = extract(rec.get("name"))
+    feats = json.dumps([f.norm, f.core, f.phonetic, f.arabic], ensure_ascii=False)
+    return f"{block_key(rec, f)}{seq:012d}\t{feats}\t{json.dumps(rec, ensure_ascii=False)}\n"
+
+def _from_line(line):
+    _, feats, rec = line.split("\t", 2)
+    norm, core, key, arabic = json.loads(feats)
+    return MatchFeatures(norm, frozenset(norm.split()), core, key, arabic), json.loads(rec)
+
+def dedupe(records, window=WINDOW, tmpdir=TMPDIR):
+    """Generator stage: places with their duplicates folded in, in block order."""
+    with tempfile.TemporaryDirectory(prefix="dedupe-", dir=tmpdir) as work:
+        lines = (_sort_line(seq, r) for seq, r in enumerate(records))
+        recent = deque()  # (merged record, [(features, coords) of its members])
+        for line in external_sort(lines, work):
+            feats, rec = _from_line(line)
+            me = (feats, _coords(rec))
+            hit = next((c for c in recent if any(_same_place(me, m) for m in c[1])), None)
+            if hit is not None:
+                merge_into(hit[0], rec)
+                hit[1].append(me)
+                instrument.count("duplicates")
+                continue
+            recent.append((rec, [me]))
+            if len(recent) > window:
+                yield recent.popleft()[0]
+        while recent:
+            yield recent.popleft()[0]
+
+def main():
+    ap = argparse.ArgumentParser(description="Dedupe normalized places (JSONL in, JSONL out)")
+    ap.add_argument("--window", type=int, default=WINDOW, help="Places each record is compared with")
+    args = ap.parse_args()
+    n = write_jsonl(DST, dedupe(read_jsonl(SRC), args.window))
+    dups = instrument.report()["counters"].get("duplicates", 0)
+    print(f"Wrote {DST} with {n} records ({dups} duplicates merged).")
+
+if __name__ == "__main__":
+    with instrument.run("dedupe_merge"):
+        main()
@@ -1,15 +1,27 @@
 # Placeholder: discovery via Google Places (Text Search / Nearby). Requires API key.
-# For safety, this stub writes an empty discovered_raw.jsonl.
-import json, sys, argparse, os
+# For safety, this stub discovers nothing and writes an empty discovered_raw.jsonl.
+#   python -m scripts.ingest.discover_google_places --category C --lat LAT --lng LNG [--radius M]
+import argparse
 from pathlib import Path
 
-parser = argparse.ArgumentParser()
-parser.add_argument('--category', required=True)
-parser.add_argument('--lat', type=float, required=True)
-parser.add_argument('--lng', type=float, required=True)
-parser.add_argument('--radius', type=int, default=2000)
-args = parser.parse_args()
+from scripts.utils.stream import write_jsonl
 
-out = Path('scripts/tmp'); out.mkdir(parents=True, exist_ok=True)
-(out / 'discovered_raw.jsonl').write_text('', encoding='utf-8')
-print("Wrote scripts/tmp/discovered_raw.jsonl (empty stub)")
+ROOT = Path(__file__).resolve().parents[2]
+OUT = ROOT / "scripts/tmp/discovered_raw.jsonl"
+
+def discover(category, lat, lng, radius=2000):
+    """Yield raw place records page by page as the API returns them (stub: none)."""
+    return iter(())
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--category', required=True)
+    parser.add_argument('--lat', type=float, required=True)
+    parser.add_argument('--lng', type=float, required=True)
+    parser.add_argument('--radius', type=int, default=2000)
+    args = parser.parse_args()
+    n = write_jsonl(OUT, discover(args.category, args.lat, args.lng, args.radius))
+    print(f"Wrote {OUT} with {n} records (stub)")
+
+if __name__ == "__main__":
+    main()
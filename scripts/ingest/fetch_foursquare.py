@@ -1,6 +1,8 @@
-import os, time, json, requests
+import os, time, json
 from pathlib import Path
 
+from scripts.utils import http_client as http, instrument
+
 ROOT = Path(__file__).resolve().parents[2]
 OUTDIR = ROOT / "data/raw/foursquare"
 OUTDIR.mkdir(parents=True, exist_ok=True)
@@ -20,7 +22,7 @@ BASE = "https://api.foursquare.com/v3/places/search"
 HEADERS = {"Authorization": FSQ_KEY, "accept": "application/json"}
 
 def fetch(params):
-    r = requests.get(BASE, headers=HEADERS, params=params, timeout=30)
+    r = http.get(BASE, headers=HEADERS, params=params, timeout=30, ttl=http.DAY)
     r.raise_for_status()
     return r.json()
 
@@ -50,4 +52,5 @@ def main():
         json.dump(all_results, f, ensure_ascii=False, indent=2)
 
 if __name__ == "__main__":
-    main()
+    with instrument.run("fetch_foursquare"):
+        main()
@@ -1,6 +1,11 @@
-import os, time, json, requests
+import asyncio, os, time, json
 from pathlib import Path
 
+import requests
+
+from scripts.utils import http_client as http, instrument
+from scripts.utils.ratelimit import TokenBucket, backoff_delay
+
 ROOT = Path(__file__).resolve().parents[2]
 OUTDIR = ROOT / "data/raw/opentripmap"
 OUTDIR.mkdir(parents=True, exist_ok=True)
@@ -13,6 +18,18 @@ BBOX = (58.20, 23.45, 58.80, 23.80)
 BASE_BBOX = "https://api.opentripmap.com/0.1/en/places/bbox"
 BASE_XID  = "https://api.opentripmap.com/0.1/en/places/xid/"
 
+# Listings change daily at most; per-place details far less often
+BBOX_TTL = http.DAY
+DETAIL_TTL = 7 * http.DAY
+
+# Detail hydration: match OTM_RATE to the API key's requests/second quota
+DETAIL_RATE = float(os.getenv("OTM_RATE", "10"))
+DETAIL_CONCURRENCY = int(os.getenv("OTM_CONCURRENCY", "8"))
+DETAIL_RETRIES = 5
+
+# One JSON line per hydrated xid; lets a crashed run resume without refetching
+CHECKPOINT = OUTDIR / "details_checkpoint.jsonl"
+
 # IMPORTANT: OTM 'kinds' taxonomy is finicky. We try candidates in order.
 # If an option returns 400, we'll fall back to the next one automatically.
 
@@ -42,7 +59,7 @@ def fetch_bbox(kinds, offset=0, limit=500):
         "limit": limit,
         "offset": offset,
     }
-    r = requests.get(BASE_BBOX, params=params, timeout=30)
+    r = http.get(BASE_BBOX, params=params, timeout=30, ttl=BBOX_TTL)
     # Let the caller inspect status to try fallbacks on 400
     if r.status_code == 400:
         return None, 400
@@ -50,7 +67,7 @@ def fetch_bbox(kinds, offset=0, limit=500):
     return r.json(), r.status_code
 
 def fetch_detail(xid):
-    r = requests.get(BASE_XID + xid, params={"apikey": API_KEY}, timeout=30)
+    r = http.get(BASE_XID + xid, params={"apikey": API_KEY}, timeout=30, ttl=DETAIL_TTL)
     r.raise_for_status()
     return r.json()
 
@@ -89,43 +106,103 @@ def pull_category(cat_name, kind_options):
         print(f"[OTM] WARNING: No valid kinds for category={cat_name}. Skipping OTM for this category.")
         return []
     # fetch details to enrich with address/website
-    detailed = []
-    for x in collected:
-        xid = x.get("xid")
-        if not xid:
-            continue
+    return asyncio.run(hydrate_details(collected, cat_name))
+
+def _simplify(x, d, cat_name):
+    lat = (d.get("point") or {}).get("lat")
+    lon = (d.get("point") or {}).get("lon")
+    addr = d.get("address") or {}
+    address = ", ".join(filter(None, [
+        addr.get("house_number"),
+        addr.get("road"),
+        addr.get("suburb"),
+        addr.get("city"),
+        addr.get("postcode"),
+    ])) or None
+    return {
+        "xid": x["xid"],
+        "name": d.get("name") or x.get("name"),
+        "_bm_category": cat_name,
+        "location": {"lat": lat, "lon": lon, "address": address},
+        "contacts": {"website": d.get("url")},
+    }
+
+def _load_checkpoint():
+    done = {}
+    if CHECKPOINT.exists():
+        for line in CHECKPOINT.read_text(encoding="utf-8").splitlines():
+            try:
+                row = json.loads(line)
+            except ValueError:
+                continue  # torn last line from an interrupted write
+            done[row["xid"]] = row["detail"]
+    return done
+
+async def _fetch_detail_retrying(xid, bucket):
+    """fetch_detail under the rate limit, retrying 429/5xx and network errors with jittered backoff."""
+    for attempt in range(DETAIL_RETRIES):
+        await bucket.acquire()
+        wait = backoff_delay(attempt)
         try:
-            d = fetch_detail(xid)
-            lat = (d.get("point") or {}).get("lat")
-            lon = (d.get("point") or {}).get("lon")
-            addr = d.get("address") or {}
-            address = ", ".join(filter(None, [
-                addr.get("house_number"),
-                addr.get("road"),
-                addr.get("suburb"),
-                addr.get("city"),
-                addr.get("postcode"),
-            ])) or None
-            detailed.append({
-                "xid": xid,
-                "name": d.get("name") or x.get("name"),
-                "_bm_category": cat_name,
-                "location": {"lat": lat, "lon": lon, "address": address},
-                "contacts": {"website": d.get("url")},
-            })
-            time.sleep(0.15)
-        except Exception:
-            continue
+            return await asyncio.to_thread(fetch_detail, xid)
+        except requests.HTTPError as e:
+            resp = e.response
+            if resp is None or (resp.status_code != 429 and resp.status_code < 500):
+                raise
+            retry_after = resp.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                wait = max(wait, float(retry_after))
+        except requests.RequestException:
+            pass  # timeouts / resets
+        await asyncio.sleep(wait)
+    raise RuntimeError(f"gave up after {DETAIL_RETRIES} attempts")
+
+async def hydrate_details(collected, cat_name):
+    """Fetch details for every listed xid, DETAIL_CONCURRENCY at a time within DETAIL_RATE.
+
+    Finished xids are appended to CHECKPOINT, so a crashed run picks up
+    where it stopped. An xid that still fails after retries keeps its
+    listing name/point instead of being dropped.
+    """
+    done = _load_checkpoint()
+    bucket = TokenBucket(DETAIL_RATE)
+    sem = asyncio.Semaphore(DETAIL_CONCURRENCY)
+    failed = 0
+
+    with open(CHECKPOINT, "a", encoding="utf-8") as ckpt:
+        async def one(x):
+            nonlocal failed
+            xid = x["xid"]
+            if xid not in done:
+                async with sem:
+                    try:
+                        done[xid] = await _fetch_detail_retrying(xid, bucket)
+                    except Exception as e:
+                        print(f"[OTM] detail {xid} failed: {e}")
+                        failed += 1
+                        instrument.count("details_failed")
+                        return _simplify(x, {"point": x.get("point")}, cat_name)
+                ckpt.write(json.dumps({"xid": xid, "detail": done[xid]}, ensure_ascii=False) + "\n")
+                ckpt.flush()
+            return _simplify(x, done[xid], cat_name)
+
+        detailed = await asyncio.gather(*(one(x) for x in collected if x.get("xid")))
+
+    if failed:
+        print(f"[OTM] {failed} details failed for category={cat_name}; kept listing data for those.")
     return detailed
 
 def main():
     all_items = []
     for cat, options in KIND_CANDIDATES.items():
-        all_items.extend(pull_category(cat, options))
+        with instrument.stage(f"category:{cat}"):
+            all_items.extend(pull_category(cat, options))
 
     with open(OUTDIR/"places.json", "w", encoding="utf-8") as f:
         json.dump(all_items, f, ensure_ascii=False, indent=2)
     print(f"[OTM] Wrote {len(all_items)} detailed records to {OUTDIR/'places.json'}")
+    CHECKPOINT.unlink(missing_ok=True)
 
 if __name__ == "__main__":
-    main()
+    with instrument.run("fetch_opentripmap"):
+        main()
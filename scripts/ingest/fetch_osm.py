@@ -1,6 +1,14 @@
-import json, time, requests
+import codecs, json, re, time
+from collections import deque
+from contextlib import contextmanager
 from pathlib import Path
 
+import requests
+from urllib3.exceptions import ReadTimeoutError
+
+from scripts.utils import http_client as http, instrument
+from scripts.utils.ratelimit import backoff_delay
+
 ROOT = Path(__file__).resolve().parents[2]
 OUTDIR = ROOT / "data/raw/osm"
 OUTDIR.mkdir(parents=True, exist_ok=True)
@@ -8,56 +16,221 @@ OUTDIR.mkdir(parents=True, exist_ok=True)
 # Muscat Governorate-ish bbox (lon_min, lat_min, lon_max, lat_max)
 BBOX = (58.20, 23.45, 58.80, 23.80)
 
-# amenity/shop tags we care about
-QUERIES = {
-    "restaurant": 'node["amenity"="restaurant"]({s});way["amenity"="restaurant"]({s});relation["amenity"="restaurant"]({s});',
-    "hotel":      'node["tourism"="hotel"]({s});way["tourism"="hotel"]({s});relation["tourism"="hotel"]({s});',
-    "mall":       'node["shop"="mall"]({s});way["shop"="mall"]({s});relation["shop"="mall"]({s});'
+# amenity/shop tags we care about; every category goes into one query per tile
+TAGS = {
+    "restaurant": ("amenity", "restaurant"),
+    "hotel":      ("tourism", "hotel"),
+    "mall":       ("shop", "mall"),
 }
 
 OVERPASS = "https://overpass-api.de/api/interpreter"
+CACHE_TTL = 12 * http.HOUR
+
+# Tiling: start from tiles no wider than MAX_TILE_DEG and split a tile into
+# four whenever Overpass times out or runs out of memory on it.
+MAX_TILE_DEG = 1.0
+MAX_DEPTH = 8
+QUERY_TIMEOUT = 120
+MAX_RETRIES = 4  # for 429 "too many requests"
+
+TYPE_ORDER = {"node": 0, "way": 1, "relation": 2}
+
+class TileTooBig(Exception):
+    """Overpass gave up on this tile (timeout / memory); it should be split."""
+
+class Overloaded(Exception):
+    """Overpass rate-limited us; the same tile should be retried later."""
 
 def bbox_str(b):
     return f"{b[1]},{b[0]},{b[3]},{b[2]}"  # lat_min,lon_min,lat_max,lon_max
 
-def fetch(query):
-    data = {"data": query}
-    r = requests.post(OVERPASS, data=data, timeout=120, headers={"User-Agent":"bestmuscat/1.0"})
+def build_query(b):
+    s = bbox_str(b)
+    body = "".join(f'nwr["{k}"="{v}"]({s});' for k, v in TAGS.values())
+    return f'[out:json][timeout:{QUERY_TIMEOUT}];({body});out center tags;'
+
+def split(b):
+    lon0, lat0, lon1, lat1 = b
+    lonm, latm = (lon0 + lon1) / 2, (lat0 + lat1) / 2
+    return [(lon0, lat0, lonm, latm), (lonm, lat0, lon1, latm),
+            (lon0, latm, lonm, lat1), (lonm, latm, lon1, lat1)]
+
+def initial_tiles(b):
+    tiles = deque([b])
+    out = []
+    while tiles:
+        t = tiles.popleft()
+        if t[2] - t[0] > MAX_TILE_DEG or t[3] - t[1] > MAX_TILE_DEG:
+            tiles.extend(split(t))
+        else:
+            out.append(t)
+    return out
+
+_REMARK = re.compile(r'"remark"\s*:\s*"((?:[^"\\]|\\.)*)"')
+
+def iter_elements(chunks, tail):
+    """Yield each object of the top-level "elements" array from a stream of text chunks.
+
+    Objects are decoded one at a time with raw_decode, so only the current
+    element (plus one chunk) is held in memory. Overpass puts its "remark"
+    (runtime errors) after the array; it is stored in tail["remark"].
+    """
+    dec = json.JSONDecoder()
+    it = iter(chunks)
+    buf, pos = "", 0
+
+    def more():
+        nonlocal buf, pos
+        chunk = next(it, None)
+        if chunk is None:
+            return False
+        buf, pos = buf[pos:] + chunk, 0
+        return True
+
+    # find the start of the array
+    while True:
+        i = buf.find('"elements"', pos)
+        j = buf.find("[", i) if i >= 0 else -1
+        if j >= 0:
+            pos = j + 1
+            break
+        pos = i if i >= 0 else max(pos, len(buf) - 16)
+        if not more():
+            tail["remark"] = _remark(buf)
+            return
+
+    while True:
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n,":
+                pos += 1
+            if pos < len(buf):
+                break
+            if not more():
+                raise ValueError("Overpass response ended inside the elements array")
+        if buf[pos] == "]":
+            pos += 1
+            break
+        while True:
+            try:
+                obj, pos = dec.raw_decode(buf, pos)
+                break
+            except json.JSONDecodeError:
+                if not more():
+                    raise
+        yield obj
+
+    tail["remark"] = _remark(buf[pos:] + "".join(it))
+
+def _remark(text):
+    m = _REMARK.search(text)
+    return json.loads(f'"{m.group(1)}"') if m else None
+
+@contextmanager
+def client_timeouts():
+    """Our read timeout firing first also means the tile is too big. Body reads
+    (streamed to the cache, or iterated) report it as a ConnectionError."""
+    try:
+        yield
+    except requests.Timeout as e:
+        raise TileTooBig(f"client timeout: {e}")
+    except requests.ConnectionError as e:
+        if not any(isinstance(a, ReadTimeoutError) for a in e.args):
+            raise
+        raise TileTooBig(f"client read timeout: {e}")
+
+def fetch_tile(b, on_element):
+    """Stream one tile's elements into on_element(); returns how many were seen."""
+    data = {"data": build_query(b)}
+    with client_timeouts():
+        r = http.post(OVERPASS, data=data, timeout=QUERY_TIMEOUT + 30, ttl=CACHE_TTL, stream=True)
+    if r.status_code == 429:
+        raise Overloaded("429")
+    if r.status_code == 504:
+        raise TileTooBig("504 gateway timeout")
     r.raise_for_status()
-    return r.json()
+
+    tail = {}
+    decoder = codecs.getincrementaldecoder("utf-8")()
+    n = 0
+    with client_timeouts():
+        for el in iter_elements((decoder.decode(c) for c in r.iter_content(1 << 16)), tail):
+            on_element(el)
+            n += 1
+    remark = tail.get("remark") or ""
+    if "runtime error" in remark or "runtime remark" in remark:
+        http.client().forget("POST", OVERPASS, data=data)  # don't replay a partial result
+        raise TileTooBig(remark)
+    return n
+
+def to_records(el):
+    """One raw record per category the element is tagged for."""
+    lat, lon = None, None
+    if "lat" in el and "lon" in el:
+        lat, lon = el["lat"], el["lon"]
+    elif "center" in el:
+        lat, lon = el["center"]["lat"], el["center"]["lon"]
+    tags = el.get("tags", {}) or {}
+    name = tags.get("name")
+    if not name or lat is None or lon is None:
+        return []
+    addr = []
+    for k in ["addr:housenumber","addr:street","addr:suburb","addr:city","addr:postcode"]:
+        v = tags.get(k)
+        if v: addr.append(v)
+    address = ", ".join(addr) or None
+    return [(cat, {
+        "id": f"osm:{el.get('type')}:{el.get('id')}",
+        "name": name,
+        "category": cat,
+        "location": {"lat": lat, "lon": lon, "address": address},
+        "contacts": {"website": tags.get("website")},
+        "opening_hours": tags.get("opening_hours"),
+        "sources": {"osm": {"id": f"{el.get('type')}/{el.get('id')}" }}
+    }) for cat, (k, v) in TAGS.items() if tags.get(k) == v]
 
 def main():
-    bboxS = bbox_str(BBOX)
-    results = []
-    for cat, body in QUERIES.items():
-        q = f'[out:json][timeout:120];({body.format(s=bboxS)});out center tags;'
-        data = fetch(q)
-        for el in data.get("elements", []):
-            lat, lon = None, None
-            if "lat" in el and "lon" in el:
-                lat, lon = el["lat"], el["lon"]
-            elif "center" in el:
-                lat, lon = el["center"]["lat"], el["center"]["lon"]
-            name = (el.get("tags", {}) or {}).get("name")
-            if not name or lat is None or lon is None:
-                continue
-            addr = []
-            tags = el.get("tags", {})
-            for k in ["addr:housenumber","addr:street","addr:suburb","addr:city","addr:postcode"]:
-                v = tags.get(k)
-                if v: addr.append(v)
-            address = ", ".join(addr) or None
-            results.append({
-                "id": f"osm:{el.get('type')}:{el.get('id')}",
-                "name": name,
-                "category": cat,
-                "location": {"lat": lat, "lon": lon, "address": address},
-                "contacts": {"website": tags.get("website")},
-                "sources": {"osm": {"id": f"{el.get('type')}/{el.get('id')}" }}
-            })
+    by_cat = {cat: [] for cat in TAGS}
+    seen = set()  # (type, id): tiles overlap on their borders, and split tiles refetch
+
+    def on_element(el):
+        key = (el.get("type"), el.get("id"))
+        if key in seen:
+            return
+        seen.add(key)
+        for cat, rec in to_records(el):
+            by_cat[cat].append((TYPE_ORDER.get(key[0], 3), key[1], rec))
+
+    tiles = deque((t, 0, 0) for t in initial_tiles(BBOX))
+    while tiles:
+        b, depth, attempt = tiles.popleft()
+        try:
+            n = fetch_tile(b, on_element)
+            instrument.count("tiles")
+            print(f"[OSM] tile {bbox_str(b)} depth={depth}: {n} elements")
+        except TileTooBig as e:
+            if depth >= MAX_DEPTH:
+                raise SystemExit(f"[OSM] tile {bbox_str(b)} still too big at depth {depth}: {e}")
+            print(f"[OSM] tile {bbox_str(b)} too big ({e}); splitting")
+            tiles.extend((t, depth + 1, 0) for t in split(b))
+            instrument.count("tiles_split")
+        except Overloaded:
+            if attempt >= MAX_RETRIES:
+                raise SystemExit(f"[OSM] Overpass kept rate-limiting tile {bbox_str(b)}")
+            instrument.count("tiles_rate_limited")
+            time.sleep(5 + backoff_delay(attempt, base=5))
+            tiles.append((b, depth, attempt + 1))
+            continue
         time.sleep(1.0)  # be polite
+
+    # same order as one query per category: category, then Overpass (type, id) order
+    results = []
+    for cat, rows in by_cat.items():
+        rows.sort(key=lambda x: (x[0], x[1]))
+        results.extend(rec for _, _, rec in rows)
     with open(OUTDIR/"places.json", "w", encoding="utf-8") as f:
         json.dump(results, f, ensure_ascii=False, indent=2)
+    print(f"[OSM] Wrote {len(results)} records from {len(seen)} elements")
 
 if __name__ == "__main__":
-    main()
+    with instrument.run("fetch_osm"):
+        main()
@@ -1,6 +1,8 @@
-import json, requests
+import json
 from pathlib import Path
 
+from scripts.utils import http_client as http, instrument
+
 ROOT = Path(__file__).resolve().parents[2]
 OUTDIR = ROOT / "data/raw/wikidata"
 OUTDIR.mkdir(parents=True, exist_ok=True)
@@ -16,11 +18,11 @@ SELECT ?item ?itemLabel ?coord ?website ?image WHERE {
 """
 
 def main():
-    r = requests.get(
+    r = http.get(
         "https://query.wikidata.org/sparql",
         params={"query": SPARQL, "format": "json"},
-        headers={"User-Agent": "bestmuscat/1.0"},
         timeout=60,
+        ttl=http.DAY,
     )
     r.raise_for_status()
     data = r.json()
@@ -28,4 +30,5 @@ def main():
         json.dump(data, f, ensure_ascii=False, indent=2)
 
 if __name__ == "__main__":
-    main()
+    with instrument.run("fetch_wikidata"):
+        main()
@@ -1 +1,23 @@
 # Placeholder: call Place Details + download photos.
+#   python -m scripts.ingest.hydrate_details
+# Streams scripts/tmp/merged.jsonl -> scripts/tmp/hydrated.jsonl; detail lookups are
+# I/O-bound, so the stage is prefetched rather than run in worker processes.
+from pathlib import Path
+
+from scripts.utils.stream import prefetch, read_jsonl, write_jsonl
+
+ROOT = Path(__file__).resolve().parents[2]
+SRC = ROOT / "scripts/tmp/merged.jsonl"
+DST = ROOT / "scripts/tmp/hydrated.jsonl"
+PREFETCH = 64
+
+def hydrate(records):
+    """Generator stage: records with details and photos filled in (stub: unchanged)."""
+    yield from records
+
+def main():
+    n = write_jsonl(DST, prefetch(hydrate(read_jsonl(SRC)), PREFETCH))
+    print(f"Wrote {DST} with {n} records.")
+
+if __name__ == "__main__":
+    main()
@@ -1,27 +1,41 @@
-import json, uuid, sys
+# Normalize discovered records:  python -m scripts.ingest.normalize_places [--workers N]
+# Streams scripts/tmp/discovered_raw.jsonl -> scripts/tmp/normalized.jsonl line by line,
+# normalizing in INGEST_WORKERS processes.
+import argparse, uuid
 from pathlib import Path
+
 from scripts.utils.slugify import slugify
 from scripts.utils.provenance import make_prov
+from scripts.utils.stream import WORKERS, parallel_map, read_jsonl, write_jsonl
+
+ROOT = Path(__file__).resolve().parents[2]
+SRC = ROOT / "scripts/tmp/discovered_raw.jsonl"
+DST = ROOT / "scripts/tmp/normalized.jsonl"
+
+def normalize(rec):
+    slug = slugify(rec.get("name",""), rec.get("neighborhood"))
+    return {
+        "id": str(uuid.uuid4()),
+        "slug": slug,
+        "name": rec.get("name","").strip(),
+        "categories": rec.get("categories",[]),
+        "location": {"lat": rec.get("lat"), "lng": rec.get("lng"), "address": rec.get("address",""), "neighborhood": rec.get("neighborhood")},
+        "actions": {"website": rec.get("website"), "phone": rec.get("phone"), "maps_url": rec.get("maps_url")},
+        "hours": rec.get("hours") or {},
+        "provenance": [make_prov("discovery", rec.get("provider"), list(rec.keys()))],
+        "last_updated": rec.get("collected_at")
+    }
+
+def normalize_all(records, workers=WORKERS):
+    """Generator stage: normalized records, in input order."""
+    return parallel_map(normalize, records, workers)
 
-src = Path('scripts/tmp/discovered_raw.jsonl')
-dst = Path('scripts/tmp/normalized.jsonl')
-dst.parent.mkdir(parents=True, exist_ok=True)
+def main():
+    ap = argparse.ArgumentParser(description="Normalize discovered places (JSONL in, JSONL out)")
+    ap.add_argument("--workers", type=int, default=WORKERS, help="Normalization processes (1 = in-process)")
+    args = ap.parse_args()
+    n = write_jsonl(DST, normalize_all(read_jsonl(SRC), args.workers))
+    print(f"Wrote {DST} with {n} records.")
 
-out = []
-if src.exists() and src.read_text().strip():
-    for line in src.read_text().splitlines():
-        rec = json.loads(line)
-        slug = slugify(rec.get("name",""), rec.get("neighborhood"))
-        out.append({
-            "id": str(uuid.uuid4()),
-            "slug": slug,
-            "name": rec.get("name","").strip(),
-            "categories": rec.get("categories",[]),
-            "location": {"lat": rec.get("lat"), "lng": rec.get("lng"), "address": rec.get("address",""), "neighborhood": rec.get("neighborhood")},
-            "actions": {"website": rec.get("website"), "phone": rec.get("phone"), "maps_url": rec.get("maps_url")},
-            "hours": rec.get("hours") or {},
-            "provenance": [make_prov("discovery", rec.get("provider"), list(rec.keys()))],
-            "last_updated": rec.get("collected_at")
-        })
-dst.write_text("\n".join(json.dumps(x) for x in out), encoding="utf-8")
-print(f"Wrote {dst} with {len(out)} records.")
+if __name__ == "__main__":
+    main()
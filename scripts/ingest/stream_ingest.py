@@ -0,0 +1,52 @@
+# Discover -> normalize -> dedupe -> hydrate in one streaming pass:
+#   python -m scripts.ingest.stream_ingest --category C --lat LAT --lng LNG [--radius M]
+#   python -m scripts.ingest.stream_ingest --from scripts/tmp/discovered_raw.jsonl
+#
+# The stages are the generator functions of the per-step scripts, chained
+# without intermediate files; records flow one at a time (normalization in
+# INGEST_WORKERS processes), so memory stays flat however many places
+# discovery returns. Output: scripts/tmp/hydrated.jsonl (or --out).
+import argparse
+
+from scripts.utils import instrument
+from scripts.utils.stream import WORKERS, prefetch, read_jsonl, write_jsonl
+
+from .dedupe_merge import dedupe
+from .discover_google_places import discover
+from .hydrate_details import DST, PREFETCH, hydrate
+from .normalize_places import normalize_all
+
+def counted(records, name):
+    for rec in records:
+        instrument.count(name)
+        yield rec
+
+def pipeline(raw, workers=WORKERS):
+    records = counted(raw, "discovered")
+    records = normalize_all(records, workers)
+    records = dedupe(records)
+    records = prefetch(hydrate(records), PREFETCH)
+    return counted(records, "hydrated")
+
+def main():
+    ap = argparse.ArgumentParser(description="Streaming ingest: discover, normalize, dedupe, hydrate")
+    ap.add_argument("--from", dest="src", help="Read discovered records from this JSONL instead of discovering")
+    ap.add_argument("--category")
+    ap.add_argument("--lat", type=float)
+    ap.add_argument("--lng", type=float)
+    ap.add_argument("--radius", type=int, default=2000)
+    ap.add_argument("--workers", type=int, default=WORKERS, help="Normalization processes (1 = in-process)")
+    ap.add_argument("--out", default=str(DST))
+    args = ap.parse_args()
+    if args.src:
+        raw = read_jsonl(args.src)
+    elif args.category and args.lat is not None and args.lng is not None:
+        raw = discover(args.category, args.lat, args.lng, args.radius)
+    else:
+        ap.error("give --from FILE or --category/--lat/--lng")
+    n = write_jsonl(args.out, pipeline(raw, args.workers))
+    print(f"Wrote {args.out} with {n} records.")
+
+if __name__ == "__main__":
+    with instrument.run("stream_ingest"):
+        main()
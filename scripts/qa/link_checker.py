@@ -1,10 +1,158 @@
-import json, re
-places = json.load(open("data/places.json"))
-url_re = re.compile(r'^https?://', re.I)
-bad = []
-for p in places:
-    actions = p.get("actions",{})
-    for k,v in actions.items():
-        if v and not url_re.match(v):
-            bad.append({"slug": p.get("slug"), "field": k, "value": v})
-print(json.dumps(bad, indent=2))
+# Website liveness checker.
+#   python -m scripts.qa.link_checker [--all] [--report PATH]
+#
+# Collects contacts.website / actions links from the places and url from
+# data/tools.json, first flags values that aren't http(s) URLs (rule
+# "bad_url" in scripts/build/qa_checks.py), then probes the rest: HEAD,
+# falling back to GET when a server refuses HEAD, following redirects and
+# recording the chain. Probes run on asyncio with LINK_CONCURRENCY in flight
+# and at most LINK_PER_HOST per host.
+#
+# Results are cached in data/link_cache.json; a link is only rechecked once
+# its entry is older than OK_TTL (or FAIL_TTL for failures). --all ignores
+# the cache. A summary of dead and redirected links goes to stdout and
+# data/link_report.json.
+import argparse, asyncio, os, time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from scripts.build.qa_checks import evaluate
+from scripts.build.utils import DATA_DIR, iter_places, read_json, write_json
+from scripts.utils import instrument
+from scripts.utils.ratelimit import AsyncHostLimiter
+
+CACHE_PATH = DATA_DIR / "link_cache.json"
+REPORT_PATH = DATA_DIR / "link_report.json"
+TOOLS = DATA_DIR / "tools.json"
+
+CONCURRENCY = int(os.getenv("LINK_CONCURRENCY", "32"))
+PER_HOST = int(os.getenv("LINK_PER_HOST", "2"))
+TIMEOUT = float(os.getenv("LINK_TIMEOUT", "10"))
+OK_TTL = 7 * 86400
+FAIL_TTL = 86400  # failures are often transient; retry them sooner
+
+USER_AGENT = "Mozilla/5.0 (compatible; bestmuscat-linkcheck/1.0)"
+HEAD_REFUSED = {403, 405, 501}  # servers that mishandle HEAD but serve GET
+
+def collect_links(places, tools=()):
+    """url -> sorted ids of the places/tools that link to it (http(s) only)."""
+    links = {}
+    def add(url, who):
+        if isinstance(url, str) and url.lower().startswith(("http://", "https://")):
+            links.setdefault(url.strip(), set()).add(who)
+    for p in places:
+        add((p.get("contacts") or {}).get("website"), p.get("id"))
+        for v in (p.get("actions") or {}).values():
+            add(v, p.get("id"))
+    for t in tools:
+        add(t.get("url"), f"tool:{t.get('slug')}")
+    return {u: sorted(filter(None, ids)) for u, ids in links.items()}
+
+def make_session():
+    s = requests.Session()
+    adapter = HTTPAdapter(pool_connections=CONCURRENCY, pool_maxsize=CONCURRENCY)
+    s.mount("http://", adapter)
+    s.mount("https://", adapter)
+    s.headers["User-Agent"] = USER_AGENT
+    return s
+
+def probe(session, url, timeout=TIMEOUT):
+    """One blocking check: HEAD, then GET if HEAD was refused or failed."""
+    result = {"checked_at": time.time()}
+    t0 = time.perf_counter()
+    try:
+        r = session.head(url, allow_redirects=True, timeout=timeout)
+        if r.status_code in HEAD_REFUSED or r.status_code >= 500:
+            r = session.get(url, allow_redirects=True, timeout=timeout, stream=True)
+            r.close()  # status and headers are enough
+    except requests.RequestException:
+        try:
+            r = session.get(url, allow_redirects=True, timeout=timeout, stream=True)
+            r.close()
+        except requests.RequestException as e:
+            result.update(status=None, error=f"{type(e).__name__}: {e}"[:300])
+            instrument.record_http("GET", url, type(e).__name__, time.perf_counter() - t0)
+            return result
+    instrument.record_http(r.request.method, url, r.status_code, time.perf_counter() - t0)
+    result.update(
+        status=r.status_code,
+        final_url=r.url,
+        chain=[[h.status_code, h.headers.get("Location")] for h in r.history],
+    )
+    return result
+
+def is_fresh(entry, now):
+    if not entry:
+        return False
+    ttl = OK_TTL if is_ok(entry) else FAIL_TTL
+    return now - entry.get("checked_at", 0) < ttl
+
+def is_ok(entry):
+    return entry.get("status") is not None and entry["status"] < 400
+
+async def check_links(urls, cache, session=None, now=None):
+    """Probe every url whose cache entry is stale; updates `cache` in place and returns how many were probed."""
+    now = now or time.time()
+    stale = [u for u in urls if not is_fresh(cache.get(u), now)]
+    if not stale:
+        return 0
+    session = session or make_session()
+    hosts = AsyncHostLimiter(PER_HOST)
+    total = asyncio.Semaphore(CONCURRENCY)
+    loop = asyncio.get_running_loop()
+    loop.set_default_executor(ThreadPoolExecutor(CONCURRENCY))
+
+    async def one(url):
+        async with hosts.slot(url), total:
+            cache[url] = await asyncio.to_thread(probe, session, url)
+
+    await asyncio.gather(*(one(u) for u in stale))
+    return len(stale)
+
+def summarize(links, cache):
+    dead, redirected = [], []
+    for url, ids in sorted(links.items()):
+        e = cache.get(url) or {}
+        if not is_ok(e):
+            dead.append({"url": url, "status": e.get("status"), "error": e.get("error"), "used_by": ids})
+        elif e.get("chain"):
+            redirected.append({"url": url, "final_url": e.get("final_url"), "chain": e["chain"], "used_by": ids})
+    return {"checked": len(links), "dead": dead, "redirected": redirected}
+
+def main():
+    ap = argparse.ArgumentParser(description="Check that place/tool websites resolve")
+    ap.add_argument("--all", action="store_true", help="Recheck every link, ignoring cached results")
+    ap.add_argument("--report", default=str(REPORT_PATH), help="Where to write the JSON summary")
+    args = ap.parse_args()
+
+    places = list(iter_places())
+    bad = []
+    evaluate(places, rules=["bad_url"],
+             on_issue=lambda p, _, detail: bad.append({"id": p.get("id"), "fields": detail.split()}))
+    for b in bad:
+        print(f"[links] not a URL: {b['id']} {', '.join(b['fields'])}")
+
+    links = collect_links(places, read_json(TOOLS, default=[]) or [])
+    cache = {} if args.all else (read_json(CACHE_PATH, default={}) or {})
+    t0 = time.perf_counter()
+    try:
+        probed = asyncio.run(check_links(list(links), cache))
+    finally:
+        write_json(CACHE_PATH, {u: e for u, e in cache.items() if u in links})
+
+    report = summarize(links, cache)
+    report["malformed"] = bad
+    write_json(Path(args.report), report)
+    print(f"[links] {len(links)} links, {probed} probed in {time.perf_counter() - t0:.1f}s "
+          f"({len(links) - probed} cached): {len(report['dead'])} dead, {len(report['redirected'])} redirected")
+    for d in report["dead"]:
+        print(f"  DEAD {d['status'] or d['error']}  {d['url']}")
+    for r in report["redirected"]:
+        print(f"  MOVED {r['url']} -> {r['final_url']}")
+
+if __name__ == "__main__":
+    with instrument.run("link_checker"):
+        main()
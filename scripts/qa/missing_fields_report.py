@@ -1,19 +1,11 @@
-import json, sys
-from pathlib import Path
+# Places missing the listing fields their category needs (rule "missing_fields"
+# in scripts/build/qa_checks.py).  python -m scripts.qa.missing_fields_report
+import json
 
-required_by_category = {
-    "Restaurants": ["cuisines", "price_range", "hours"]
-}
+from scripts.build.qa_checks import evaluate
+from scripts.build.utils import iter_places
 
-places = json.load(open("data/places.json"))
 rows = []
-for p in places:
-    cats = p.get("categories",[])
-    miss = set()
-    for c in cats:
-        for f in required_by_category.get(c, []):
-            if not p.get(f):
-                miss.add(f)
-    if miss:
-        rows.append({"slug": p.get("slug"), "missing": sorted(miss)})
+evaluate(iter_places(), rules=["missing_fields"],
+         on_issue=lambda p, _, detail: rows.append({"id": p.get("id"), "missing": detail.split()}))
 print(json.dumps(rows, indent=2))
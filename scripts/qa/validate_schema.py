@@ -1,18 +1,95 @@
-import json, sys
+# Validate places against scripts/utils/schema_place.json.
+#   python -m scripts.qa.validate_schema [--full]
+#
+# The schema is checked and compiled into one validator per process, and
+# records are validated in chunks across SCHEMA_WORKERS processes. Records
+# whose content hash passed under the same schema last time are skipped
+# (cache in .cache/validate_schema.json; --full revalidates everything).
+# Errors are reported as: [record index] id $.json.path: message
+import argparse, hashlib, json, os, sys
+from concurrent.futures import ProcessPoolExecutor
+
 from jsonschema import Draft202012Validator
-from pathlib import Path
-
-schema = json.load(open("scripts/utils/schema_place.json"))
-places_path = Path("data/places.json")
-if not places_path.exists():
-    print("No data/places.json found."); sys.exit(1)
-places = json.load(open(places_path))
-
-errors = []
-for p in places:
-    for e in Draft202012Validator(schema).iter_errors(p):
-        errors.append(f"[{p.get('slug')}] {e.message}")
-
-if errors:
-    print("\n".join(errors)); sys.exit(1)
-print("Schema OK")
+
+from scripts.build.utils import ROOT, iter_places, places_path
+from scripts.build.reconcile_state import record_hash
+
+SCHEMA_PATH = ROOT / "scripts/utils/schema_place.json"
+CACHE_PATH = ROOT / ".cache" / "validate_schema.json"
+WORKERS = int(os.getenv("SCHEMA_WORKERS", str(os.cpu_count() or 2)))
+CHUNK = 2000
+
+_validator = None
+
+def _init(schema):
+    global _validator
+    Draft202012Validator.check_schema(schema)
+    _validator = Draft202012Validator(schema)
+
+def _validate_chunk(chunk):
+    """[(index, id, json path, message)] for a list of (index, record)."""
+    out = []
+    for i, p in chunk:
+        for e in _validator.iter_errors(p):
+            out.append((i, p.get("id") if isinstance(p, dict) else None, e.json_path, e.message))
+    return out
+
+def load_cache(schema_hash):
+    try:
+        cache = json.loads(CACHE_PATH.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return set()
+    return set(cache.get("valid", [])) if cache.get("schema") == schema_hash else set()
+
+def save_cache(schema_hash, valid):
+    CACHE_PATH.parent.mkdir(parents=True, exist_ok=True)
+    CACHE_PATH.write_text(json.dumps({"schema": schema_hash, "valid": sorted(valid)}), encoding="utf-8")
+
+def validate(places, schema, known_valid=frozenset(), workers=WORKERS):
+    """Returns (errors sorted by record index, hashes of all valid records, number validated)."""
+    todo, hashes, skipped = [], {}, set()
+    for i, p in enumerate(places):
+        h = record_hash(p)
+        if h in known_valid:
+            skipped.add(h)
+        else:
+            todo.append((i, p))
+            hashes[i] = h
+    chunks = [todo[k:k + CHUNK] for k in range(0, len(todo), CHUNK)]
+    if workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(min(workers, len(chunks)), initializer=_init, initargs=(schema,)) as ex:
+            results = list(ex.map(_validate_chunk, chunks))
+    else:
+        _init(schema)
+        results = [_validate_chunk(c) for c in chunks]
+    errors = sorted(e for r in results for e in r)
+    bad = {e[0] for e in errors}
+    passed = skipped | {h for i, h in hashes.items() if i not in bad}
+    return errors, passed, len(todo)
+
+def main():
+    ap = argparse.ArgumentParser(description="Validate places against the place schema")
+    ap.add_argument("--full", action="store_true", help="Ignore the cache of already-valid records")
+    args = ap.parse_args()
+
+    if not places_path().exists():
+        print("No places found."); sys.exit(1)
+    schema_bytes = SCHEMA_PATH.read_bytes()
+    schema_hash = hashlib.sha1(schema_bytes).hexdigest()
+    schema = json.loads(schema_bytes)
+    known = set() if args.full else load_cache(schema_hash)
+
+    places = list(iter_places())
+    errors, passed, checked = validate(places, schema, known)
+    save_cache(schema_hash, passed)
+
+    for i, pid, path, msg in errors:
+        print(f"[{i}] {pid} {path}: {msg}")
+    print(f"Validated {checked} of {len(places)} places ({len(places) - checked} unchanged and valid), "
+          f"{len({e[0] for e in errors})} invalid, {len(errors)} errors")
+    if errors:
+        sys.exit(1)
+    print("Schema OK")
+
+if __name__ == "__main__":
+    main()
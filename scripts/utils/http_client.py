@@ -0,0 +1,247 @@
+"""
+Shared HTTP client for the ingest fetchers.
+
+- one pooled requests.Session for every call
+- content-addressed on-disk cache: response bodies are stored once under
+  bodies/<sha256>, and meta/<request key>.json points at them
+- per-call TTL: a cached 200 younger than `ttl` seconds is served without
+  touching the network; older entries are revalidated with
+  If-None-Match / If-Modified-Since and a 304 just refreshes the entry
+- stream=True spools the body to the cache in chunks and hands back a
+  response whose iter_content() reads from disk, so large bodies are
+  never held in memory
+- HTTP_CACHE_MODE selects the behaviour:
+    online   (default) as above
+    refresh  always revalidate, ignore TTLs
+    offline  replay from cache only; a miss raises OfflineCacheMiss
+    off      no caching at all
+
+Every call is recorded per host in the run report (scripts/utils/instrument.py).
+
+Request headers that change the response (VARY_HEADERS: credentials,
+content negotiation) are part of the cache key, so a call with another
+Authorization or Accept-Language never replays someone else's body; they
+only enter the key's hash and are never written to the cache.
+API keys passed as params (see SECRET_PARAMS) are left out of cache keys
+and stored URLs, so a recorded cache directory can be used as a test
+fixture:
+HTTP_CACHE_MODE=offline HTTP_CACHE_DIR=path/to/fixtures python -m ...
+"""
+
+import hashlib, io, json, os, threading, time
+from pathlib import Path
+from urllib.parse import urlencode
+
+import requests
+from requests.adapters import HTTPAdapter
+from requests.structures import CaseInsensitiveDict
+
+from . import instrument
+
+ROOT = Path(__file__).resolve().parents[2]
+CACHE_DIR = Path(os.getenv("HTTP_CACHE_DIR", str(ROOT / ".cache" / "http")))
+MODE = os.getenv("HTTP_CACHE_MODE", "online")
+MODES = ("online", "refresh", "offline", "off")
+
+USER_AGENT = "bestmuscat/1.0"
+SECRET_PARAMS = {"apikey", "api_key", "key", "token"}
+KEPT_HEADERS = ("Content-Type", "ETag", "Last-Modified")
+VARY_HEADERS = ("accept", "accept-language", "authorization")  # lower-case
+
+# Common TTLs (seconds)
+HOUR = 3600
+DAY = 24 * HOUR
+
+class OfflineCacheMiss(requests.ConnectionError):
+    pass
+
+def _public_params(params):
+    return sorted((k, str(v)) for k, v in (params or {}).items() if k not in SECRET_PARAMS)
+
+def _vary(headers):
+    return sorted((k.lower(), str(v)) for k, v in (headers or {}).items() if k.lower() in VARY_HEADERS)
+
+def cache_key(method, url, params=None, data=None, headers=None) -> str:
+    body = data if isinstance(data, (str, bytes)) else urlencode(sorted((data or {}).items()))
+    if isinstance(body, str):
+        body = body.encode("utf-8")
+    h = hashlib.sha256(f"{method.upper()} {url}?{urlencode(_public_params(params))}\n".encode("utf-8"))
+    h.update(body)
+    vary = _vary(headers)
+    if vary:  # keys of calls without such headers stay as they were
+        h.update(b"\0" + json.dumps(vary).encode("utf-8"))
+    return h.hexdigest()
+
+class HttpClient:
+    def __init__(self, cache_dir=CACHE_DIR, mode=MODE, pool_size=32):
+        if mode not in MODES:
+            raise ValueError(f"HTTP_CACHE_MODE must be one of {MODES}, got {mode!r}")
+        self.cache_dir = Path(cache_dir)
+        self.mode = mode
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["User-Agent"] = USER_AGENT
+        self._lock = threading.Lock()
+
+    def get(self, url, params=None, ttl=0, **kw):
+        return self.request("GET", url, params=params, ttl=ttl, **kw)
+
+    def post(self, url, data=None, ttl=0, **kw):
+        return self.request("POST", url, data=data, ttl=ttl, **kw)
+
+    def forget(self, method, url, params=None, data=None, headers=None):
+        """Drop a cached entry, e.g. a 200 whose payload turned out to be an error."""
+        self._meta_path(cache_key(method, url, params, data, headers)).unlink(missing_ok=True)
+
+    def request(self, method, url, params=None, data=None, headers=None, ttl=0, timeout=30, stream=False, **kw):
+        """Like Session.request, plus caching. `ttl=None` bypasses the cache for this call."""
+        t0 = time.perf_counter()
+        try:
+            r = self._request(method, url, params, data, headers, ttl, timeout, stream, **kw)
+        except requests.RequestException as e:
+            instrument.record_http(method, url, type(e).__name__, time.perf_counter() - t0)
+            raise
+        cached = getattr(r, "from_cache", False) and not getattr(r, "revalidated", False)
+        instrument.record_http(method, url, r.status_code, time.perf_counter() - t0, _body_size(r), cached)
+        return r
+
+    def _request(self, method, url, params, data, headers, ttl, timeout, stream, **kw):
+        if self.mode == "off" or ttl is None:
+            return self.session.request(method, url, params=params, data=data, headers=headers,
+                                        timeout=timeout, stream=stream, **kw)
+
+        key = cache_key(method, url, params, data, headers)
+        entry = self._load(key)
+        if self.mode == "offline":
+            if entry is None:
+                raise OfflineCacheMiss(f"no cached response for {method} {url}?{urlencode(_public_params(params))}")
+            return self._response(entry, stream)
+        if entry and self.mode == "online" and time.time() - entry["fetched_at"] < ttl:
+            return self._response(entry, stream)
+
+        headers = dict(headers or {})
+        if entry:
+            if entry["headers"].get("ETag"):
+                headers["If-None-Match"] = entry["headers"]["ETag"]
+            if entry["headers"].get("Last-Modified"):
+                headers["If-Modified-Since"] = entry["headers"]["Last-Modified"]
+        r = self.session.request(method, url, params=params, data=data, headers=headers,
+                                 timeout=timeout, stream=stream, **kw)
+        if r.status_code == 304 and entry:
+            r.close()
+            entry["fetched_at"] = time.time()
+            self._write(self._meta_path(key), json.dumps(entry).encode("utf-8"))
+            out = self._response(entry, stream)
+            out.revalidated = True
+            return out
+        if r.status_code == 200 and stream:
+            entry = self._store_stream(key, method, url, params, r)
+            out = self._response(entry, stream)
+            out.from_cache = False
+            return out
+        if r.status_code == 200:
+            self._store(key, method, url, params, r)
+        r.from_cache = False
+        return r
+
+    # -- storage --------------------------------------------------------------
+    def _meta_path(self, key):
+        return self.cache_dir / "meta" / key[:2] / f"{key}.json"
+
+    def _body_path(self, digest):
+        return self.cache_dir / "bodies" / digest[:2] / digest
+
+    def _write(self, path, blob: bytes):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f"{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+        tmp.write_bytes(blob)
+        os.replace(tmp, path)
+
+    def _load(self, key):
+        path = self._meta_path(key)
+        try:
+            entry = json.loads(path.read_text(encoding="utf-8"))
+        except (OSError, ValueError):
+            return None
+        return entry if self._body_path(entry["body"]).exists() else None
+
+    def _store(self, key, method, url, params, r):
+        digest = hashlib.sha256(r.content).hexdigest()
+        body = self._body_path(digest)
+        with self._lock:
+            if not body.exists():
+                self._write(body, r.content)
+        return self._store_meta(key, method, url, params, r, digest)
+
+    def _store_stream(self, key, method, url, params, r, chunk_size=1 << 16):
+        spool = self.cache_dir / "bodies" / f"spool.{os.getpid()}.{threading.get_ident()}.tmp"
+        spool.parent.mkdir(parents=True, exist_ok=True)
+        h = hashlib.sha256()
+        try:
+            with open(spool, "wb") as f:
+                for chunk in r.iter_content(chunk_size):
+                    h.update(chunk)
+                    f.write(chunk)
+            digest = h.hexdigest()
+            body = self._body_path(digest)
+            body.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(spool, body)
+        finally:
+            spool.unlink(missing_ok=True)  # a body read that failed part way
+        return self._store_meta(key, method, url, params, r, digest)
+
+    def _store_meta(self, key, method, url, params, r, digest):
+        entry = {
+            "method": method.upper(),
+            "url": url,
+            "params": _public_params(params),
+            "status": r.status_code,
+            "headers": {h: r.headers[h] for h in KEPT_HEADERS if h in r.headers},
+            "body": digest,
+            "fetched_at": time.time(),
+        }
+        self._write(self._meta_path(key), json.dumps(entry).encode("utf-8"))
+        return entry
+
+    def _response(self, entry, stream=False):
+        r = requests.Response()
+        r.status_code = entry["status"]
+        r.reason = "OK"
+        r.url = entry["url"]
+        r.headers = CaseInsensitiveDict(entry["headers"])
+        r.encoding = requests.utils.get_encoding_from_headers(r.headers)
+        if stream:
+            r.raw = open(self._body_path(entry["body"]), "rb")  # iter_content() reads from here
+        else:
+            r._content = self._body_path(entry["body"]).read_bytes()
+        r.from_cache = True
+        return r
+
+def _body_size(r):
+    """Bytes of body a response carried (0 for a 304 revalidation)."""
+    if getattr(r, "revalidated", False):
+        return 0
+    if isinstance(r._content, bytes):
+        return len(r._content)
+    if isinstance(r.raw, io.BufferedReader):  # streamed from the cache file
+        return os.fstat(r.raw.fileno()).st_size
+    return int(r.headers.get("Content-Length") or 0)
+
+_default = None
+_default_lock = threading.Lock()
+
+def client() -> HttpClient:
+    """Process-wide shared client."""
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = HttpClient()
+        return _default
+
+def get(url, params=None, ttl=0, **kw):
+    return client().get(url, params=params, ttl=ttl, **kw)
+
+def post(url, data=None, ttl=0, **kw):
+    return client().post(url, data=data, ttl=ttl, **kw)
@@ -0,0 +1,197 @@
+"""
+Run instrumentation: stage timings, memory peaks, counters and per-host
+HTTP stats, written as one JSON report per run.
+
+    from scripts.utils import instrument
+
+    if __name__ == "__main__":
+        with instrument.run("fetch_osm"):      # whole script; writes the report
+            main()
+
+    with instrument.stage("tiles"):            # also usable as @instrument.stage("tiles")
+        ...
+    instrument.count("tiles_split")
+
+HTTP calls made through scripts/utils/http_client.py are recorded per host
+(requests, cache hits, bytes, status codes, latency histogram) without any
+change to the fetchers.
+
+Reports go to data/reports/<run>-<UTC time>.json (git-ignored); the newest
+RUN_REPORT_KEEP per run are kept and RUN_REPORTS=0 turns them off. Stage
+memory is the process RSS high-water mark (and how much the stage raised
+it; null on Windows, which has no getrusage); with INSTRUMENT_TRACEMALLOC=1
+the Python-heap peak per stage is added, at some cost in speed. Stages that
+overlap in threads share these process-wide figures, so treat their memory
+as approximate.
+"""
+
+import contextlib, json, os, sys, threading, time, tracemalloc
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import urlsplit
+
+try:
+    import resource
+except ImportError:  # Windows: no RSS figures
+    resource = None
+
+ROOT = Path(__file__).resolve().parents[2]
+REPORTS = os.getenv("RUN_REPORTS", "1") != "0"
+KEEP = int(os.getenv("RUN_REPORT_KEEP", "30"))
+TRACEMALLOC = os.getenv("INSTRUMENT_TRACEMALLOC", "0") == "1"
+
+# Latency histogram bucket upper bounds (ms); the last bucket is open-ended
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+_lock = threading.Lock()
+
+def _empty(name=None):
+    return {"run": name, "stages": [], "counters": {}, "http": {}}
+
+_state = _empty()
+
+def rss_peak_mb():
+    """Process RSS high-water mark in MB (0.1 MB steps), or None where the platform doesn't report it."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / 2**20 if sys.platform == "darwin" else peak / 1024, 1)  # bytes on macOS, KiB elsewhere
+
+@contextlib.contextmanager
+def stage(name):
+    """Time a block (or, as a decorator, every call) and record its memory peak."""
+    t0, cpu0, rss0 = time.perf_counter(), time.process_time(), rss_peak_mb()
+    if tracemalloc.is_tracing():
+        tracemalloc.reset_peak()
+    ok = False
+    try:
+        yield
+        ok = True
+    finally:
+        rec = {
+            "name": name,
+            "seconds": round(time.perf_counter() - t0, 4),
+            "cpu_s": round(time.process_time() - cpu0, 4),
+            "rss_peak_mb": rss_peak_mb(),
+            "rss_growth_mb": None if rss0 is None else round(rss_peak_mb() - rss0, 1),
+            "ok": ok,
+        }
+        if tracemalloc.is_tracing():
+            rec["py_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+        with _lock:
+            _state["stages"].append(rec)
+
+def count(name, n=1):
+    with _lock:
+        _state["counters"][name] = _state["counters"].get(name, 0) + n
+
+def record_http(method, url, status, seconds, nbytes=0, cached=False):
+    """One HTTP call. `cached` calls were served from the local cache without a request."""
+    host = urlsplit(url).netloc or "?"
+    with _lock:
+        h = _state["http"].get(host)
+        if h is None:
+            h = _state["http"][host] = {"requests": 0, "cache_hits": 0, "bytes": 0, "seconds": 0.0,
+                                        "max_ms": 0.0, "status": {}, "methods": {},
+                                        "latency_ms": [0] * (len(LATENCY_BUCKETS_MS) + 1)}
+        h["methods"][method.upper()] = h["methods"].get(method.upper(), 0) + 1
+        h["status"][str(status)] = h["status"].get(str(status), 0) + 1
+        if cached:
+            h["cache_hits"] += 1
+            return
+        ms = seconds * 1000
+        h["requests"] += 1
+        h["bytes"] += nbytes
+        h["seconds"] += seconds
+        h["max_ms"] = max(h["max_ms"], ms)
+        h["latency_ms"][next((i for i, b in enumerate(LATENCY_BUCKETS_MS) if ms <= b), len(LATENCY_BUCKETS_MS))] += 1
+
+def _percentile(hist, q):
+    """Upper bound of the bucket holding the q-th quantile (None past the last bound)."""
+    total = sum(hist)
+    if not total:
+        return None
+    seen = 0
+    for i, n in enumerate(hist):
+        seen += n
+        if seen >= q * total:
+            return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else None
+    return None
+
+def report():
+    """Snapshot of everything recorded so far in this run."""
+    with _lock:
+        state = json.loads(json.dumps(_state))
+    labels = [f"<={b}" for b in LATENCY_BUCKETS_MS] + [f">{LATENCY_BUCKETS_MS[-1]}"]
+    for h in state["http"].values():
+        hist = h["latency_ms"]
+        h["latency_ms"] = dict(zip(labels, hist))
+        h["p50_ms"], h["p95_ms"] = _percentile(hist, 0.5), _percentile(hist, 0.95)
+        h["mean_ms"] = round(h["seconds"] * 1000 / h["requests"], 1) if h["requests"] else None
+        h["seconds"] = round(h["seconds"], 3)
+        h["max_ms"] = round(h["max_ms"], 1)
+    return state
+
+def _reports_dir():
+    from scripts.build.utils import DATA_DIR  # follows PIPELINE_DATA_DIR
+    return DATA_DIR / "reports"
+
+def write_report(rep):
+    out = _reports_dir()
+    out.mkdir(parents=True, exist_ok=True)
+    path = out / f"{rep['run']}-{rep['started'].replace(':', '').replace('-', '')[:15]}Z.json"
+    path.write_text(json.dumps(rep, indent=2) + "\n", encoding="utf-8")
+    for old in sorted(out.glob(f"{rep['run']}-*.json"))[:-max(KEEP, 1)]:
+        old.unlink()
+    return path
+
+def _summary(rep):
+    line = f"[run] {rep['run']}: {rep['seconds']:.1f}s"
+    if rep["rss_peak_mb"] is not None:
+        line += f", peak {rep['rss_peak_mb']:.0f} MB"
+    if rep["stages"]:
+        top = max(rep["stages"], key=lambda s: s["seconds"])
+        line += f", slowest stage {top['name']} {top['seconds']:.1f}s"
+    if rep["http"]:
+        reqs = sum(h["requests"] for h in rep["http"].values())
+        hits = sum(h["cache_hits"] for h in rep["http"].values())
+        host, h = max(rep["http"].items(), key=lambda kv: kv[1]["seconds"])
+        line += f", {reqs} HTTP requests (+{hits} cached), most time on {host} {h['seconds']:.1f}s"
+    return line
+
+@contextlib.contextmanager
+def run(name):
+    """Instrument a whole script run and write its report on the way out."""
+    global _state
+    with _lock:
+        _state = _empty(name)
+    started = datetime.now(timezone.utc)
+    t0, cpu0 = time.perf_counter(), time.process_time()
+    tracing = TRACEMALLOC and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    status = 0
+    try:
+        yield
+    except SystemExit as e:
+        status = e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+        raise
+    except BaseException as e:
+        status = f"{type(e).__name__}: {e}"[:300]
+        raise
+    finally:
+        if tracing:
+            tracemalloc.stop()
+        rep = {
+            "run": name,
+            "argv": sys.argv[1:],
+            "started": started.isoformat(timespec="seconds"),
+            "seconds": round(time.perf_counter() - t0, 3),
+            "cpu_s": round(time.process_time() - cpu0, 3),
+            "rss_peak_mb": rss_peak_mb(),
+            "exit": status,
+            **{k: v for k, v in report().items() if k != "run"},
+        }
+        print(_summary(rep))
+        if REPORTS:
+            print(f"[run] report → {write_report(rep)}")
@@ -0,0 +1,57 @@
+import asyncio, random, threading, time
+from urllib.parse import urlparse
+
+class TokenBucket:
+    """Async token bucket: refills `rate` tokens per second, holds at most `burst`."""
+
+    def __init__(self, rate: float, burst: float | None = None):
+        self.rate = rate
+        self.burst = burst or max(1.0, rate)
+        self.tokens = self.burst
+        self.stamp = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.stamp) * self.rate)
+                self.stamp = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+def backoff_delay(attempt: int, base: float = 0.5, cap: float = 30.0) -> float:
+    """Full-jitter exponential backoff for retry number `attempt` (0-based)."""
+    return random.uniform(0, min(cap, base * 2 ** attempt))
+
+class HostLimiter:
+    """Caps concurrent requests per host so one slow host can't take every worker thread."""
+
+    def __init__(self, per_host):
+        self.per_host = per_host
+        self.lock = threading.Lock()
+        self.sems = {}
+
+    def slot(self, url):
+        host = urlparse(url).netloc
+        with self.lock:
+            sem = self.sems.get(host)
+            if sem is None:
+                sem = self.sems[host] = threading.BoundedSemaphore(self.per_host)
+        return sem
+
+class AsyncHostLimiter:
+    """asyncio counterpart of HostLimiter: `async with limiter.slot(url):`."""
+
+    def __init__(self, per_host):
+        self.per_host = per_host
+        self.sems = {}
+
+    def slot(self, url):
+        host = urlparse(url).netloc
+        sem = self.sems.get(host)
+        if sem is None:
+            sem = self.sems[host] = asyncio.Semaphore(self.per_host)
+        return sem
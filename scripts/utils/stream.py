@@ -0,0 +1,179 @@
+"""
+Generator stages for the JSONL ingest path (scripts/ingest): every stage takes
+an iterable of records and yields records, so a pipeline is plain function
+composition and only a bounded window of records is in memory at a time.
+
+    records = read_jsonl(src)
+    records = parallel_map(normalize, records, workers=4)   # CPU-bound, in order
+    records = prefetch(hydrate(records), 64)                # overlap slow I/O
+    write_jsonl(dst, records)
+
+external_sort() orders arbitrarily many lines through sorted runs spilled
+to disk, for stages that need a global order (scripts/ingest/dedupe_merge.py).
+
+Stages are pulled by the consumer, so a slow writer slows everything
+upstream (backpressure); parallel_map and prefetch hold at most their
+window of records in flight.
+"""
+
+import heapq, json, os, queue, threading
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from itertools import islice
+from pathlib import Path
+
+WORKERS = int(os.getenv("INGEST_WORKERS", str(os.cpu_count() or 2)))
+CHUNK = 500      # records per task sent to a worker process
+INFLIGHT = 2     # chunks queued per worker beyond the ones running
+RUN_LINES = int(os.getenv("SORT_RUN_LINES", "100000"))  # lines sorted in memory per spilled run
+FANIN = 64       # runs merged at once (open files)
+
+def read_jsonl(path):
+    """Records of a JSONL file, one line at a time; blank lines are skipped. Missing file = no records."""
+    path = Path(path)
+    if not path.exists():
+        return
+    with path.open(encoding="utf-8") as f:
+        for n, line in enumerate(f, 1):
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError as e:
+                    raise ValueError(f"{path}:{n}: {e}") from None
+
+def write_jsonl(path, records) -> int:
+    """Write records one per line (atomically, via a temp file); returns how many."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_name(path.name + ".tmp")
+    n = 0
+    try:
+        with tmp.open("w", encoding="utf-8") as f:
+            for rec in records:
+                f.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                n += 1
+        os.replace(tmp, path)
+    finally:
+        tmp.unlink(missing_ok=True)
+    return n
+
+def chunked(items, size):
+    it = iter(items)
+    while chunk := list(islice(it, size)):
+        yield chunk
+
+def _map_chunk(fn, chunk):
+    return [fn(x) for x in chunk]
+
+def parallel_map(fn, items, workers=WORKERS, chunk=CHUNK):
+    """fn over items in worker processes, yielding results in input order.
+
+    fn must be picklable (a module-level function). At most
+    workers * (1 + INFLIGHT) chunks are read ahead, so memory stays bounded
+    however long the input is. workers <= 1 maps in-process.
+    """
+    if workers <= 1:
+        yield from map(fn, items)
+        return
+    with ProcessPoolExecutor(workers) as ex:
+        pending = deque()
+        for c in chunked(items, chunk):
+            pending.append(ex.submit(_map_chunk, fn, c))
+            if len(pending) >= workers * (1 + INFLIGHT):
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+
+def _spill(lines, path):
+    lines.sort()
+    with path.open("w", encoding="utf-8") as f:
+        f.writelines(lines)
+    return path
+
+def _merged(paths):
+    with ExitStack() as files:
+        yield from heapq.merge(*(files.enter_context(p.open(encoding="utf-8")) for p in paths))
+
+def external_sort(lines, workdir, run_lines=RUN_LINES, fanin=FANIN):
+    """Sort newline-terminated strings with bounded memory, yielding them in order.
+
+    Up to `run_lines` are sorted in memory and spilled as a run file under
+    `workdir`; runs are k-way merged (`fanin` at a time, in several passes
+    if needed). Input that fits in one run never touches the disk.
+    """
+    workdir = Path(workdir)
+    runs, buf = [], []
+    for line in lines:
+        buf.append(line)
+        if len(buf) >= run_lines:
+            runs.append(_spill(buf, workdir / f"run-{len(runs):06d}"))
+            buf = []
+    if not runs:
+        buf.sort()
+        yield from buf
+        return
+    if buf:
+        runs.append(_spill(buf, workdir / f"run-{len(runs):06d}"))
+    del buf
+    level = 0
+    while len(runs) > fanin:
+        level += 1
+        merged = []
+        for k in range(0, len(runs), fanin):
+            out = workdir / f"merge{level}-{len(merged):06d}"
+            with out.open("w", encoding="utf-8") as f:
+                f.writelines(_merged(runs[k:k + fanin]))
+            for p in runs[k:k + fanin]:
+                p.unlink()
+            merged.append(out)
+        runs = merged
+    yield from _merged(runs)
+
+_DONE = object()
+
+class _Failed:
+    def __init__(self, exc):
+        self.exc = exc
+
+def prefetch(items, size=256, batch=64):
+    """Pull up to `size` items ahead in a background thread (for I/O-bound stages).
+
+    Items cross the thread boundary in batches of up to `batch`, handed over
+    early whenever the consumer is waiting, so slow producers aren't held back.
+    """
+    q = queue.Queue(max(size // batch, 1))
+    stop = threading.Event()
+
+    def put(x):
+        while not stop.is_set():
+            try:
+                q.put(x, timeout=0.1)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        try:
+            buf = []
+            for x in items:
+                buf.append(x)
+                if len(buf) >= batch or q.empty():
+                    if not put(buf):
+                        return  # consumer went away
+                    buf = []
+            if buf and not put(buf):
+                return
+            put(_DONE)
+        except BaseException as e:
+            put(_Failed(e))
+
+    threading.Thread(target=produce, daemon=True).start()
+    try:
+        while (x := q.get()) is not _DONE:
+            if isinstance(x, _Failed):
+                raise x.exc
+            yield from x
+    finally:
+        stop.set()
@@ -0,0 +1,47 @@
+import random
+from functools import partial
+
+from scripts.ingest import dedupe_merge
+from scripts.ingest.dedupe_merge import dedupe
+from scripts.utils.stream import external_sort
+
+def test_external_sort_spills_and_merges_in_passes(tmp_path):
+    rng = random.Random(0)
+    lines = [f"{rng.randrange(1000):04d}-{i}\n" for i in range(200)]
+    # 7-line runs, 4-way merges: 29 runs need two merge passes
+    assert list(external_sort(iter(lines), tmp_path, run_lines=7, fanin=4)) == sorted(lines)
+    assert list(external_sort(iter(lines[:5]), tmp_path, run_lines=7, fanin=4)) == sorted(lines[:5])
+
+def place(pid, name, lat, lng, provider, **extra):
+    return {
+        "id": pid,
+        "name": name,
+        "categories": extra.pop("categories", ["restaurant"]),
+        "location": {"lat": lat, "lng": lng, "address": extra.pop("address", "")},
+        "actions": {"website": extra.pop("website", None), "phone": None},
+        "hours": {},
+        "provenance": [{"source": "discovery", "provider": provider}],
+        **extra,
+    }
+
+def test_near_duplicates_fold_and_keep_provenance(tmp_path, monkeypatch):
+    # spill every two records so the block order comes from merged runs
+    monkeypatch.setattr(dedupe_merge, "external_sort", partial(external_sort, run_lines=2, fanin=2))
+    records = [
+        place("a", "Al Sadaf Restaurant", 23.5880, 58.3829, "google"),
+        place("x", "Bait Al Luban", 23.6200, 58.5600, "google"),
+        place("b", "AL SADAF", 23.5881, 58.3830, "foursquare",
+              website="https://alsadaf.example", categories=["restaurant", "seafood"]),
+        place("c", "Al Sadaf Restaurant", 23.5879, 58.3828, "osm"),
+        place("far", "Al Sadaf Restaurant", 23.7000, 58.2000, "osm"),  # same name, other side of town
+    ]
+    out = {r["id"]: r for r in dedupe(iter(records), window=3, tmpdir=tmp_path)}
+
+    # a, b and c fold into whichever comes first in block order
+    assert len(out) == 3 and {"x", "far"} < set(out)
+    merged = next(r for r in out.values() if r.get("duplicates"))
+    assert sorted([merged["id"]] + merged["duplicates"]) == ["a", "b", "c"]
+    assert sorted(p["provider"] for p in merged["provenance"]) == ["foursquare", "google", "osm"]
+    assert merged["actions"]["website"] == "https://alsadaf.example"
+    assert merged["categories"] == ["restaurant", "seafood"]
+    assert "duplicates" not in out["far"] and len(out["far"]["provenance"]) == 1
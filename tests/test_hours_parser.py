@@ -0,0 +1,69 @@
+import random
+from datetime import datetime, timezone
+
+import numpy as np
+import pytest
+
+from scripts.enrich import hours_parser as h
+
+GOOGLE = {"periods": [
+    {"open": {"day": 5, "time": "1800"}, "close": {"day": 6, "time": "0200"}},  # Fri night
+    {"open": {"day": 6, "time": "1000"}, "close": {"day": 6, "time": "1400"}},
+]}
+FOURSQUARE = {"regular": [{"day": 4, "open": "1800", "close": "+0200"}, {"day": 7, "open": "0900", "close": "1200"}]}
+
+@pytest.mark.parametrize("value, expected", [
+    ("Fr 18:00-02:00", "Fr 18:00-02:00"),
+    ("Su 22:00-01:00", "Su 22:00-01:00"),  # spills into Monday, across the week boundary
+    ("Sa-Th 12:00-15:00,18:00-01:00; Fr off", "Sa-Th 12:00-15:00,18:00-01:00"),
+    ("Th 18:00-02:00; Th off", "off"),
+    ("24/7", "24/7"),
+    ("Mo-Su 00:00-24:00", "24/7"),
+    ("PH off; Mo 10:00-12:00", "Mo 10:00-12:00"),
+    ("Mo-Fr 09:00-17:00; PH off", "Mo-Fr 09:00-17:00"),
+    ("Mo-Fr 09:00-17:00; Sa 10:00-14:00", "Mo-Fr 09:00-17:00, Sa 10:00-14:00"),
+    ("Mo-Su 10:00-12:00; Mo 14:00-15:00", "Mo 14:00-15:00, Tu-Su 10:00-12:00"),
+    ("Mo 12:10-12:50", "Mo 12:00-13:00"),
+    (GOOGLE, "Fr 18:00-02:00, Sa 10:00-14:00"),
+    ({"periods": [{"open": {"day": 0, "time": "0000"}}]}, "24/7"),
+    (FOURSQUARE, "Th 18:00-02:00, Su 09:00-12:00"),
+    ({"mon": "09:00-17:00", "fri": "closed", "sat": ["10:00-12:00", "16:00-20:00"]},
+     "Mo 09:00-17:00, Sa 10:00-12:00,16:00-20:00"),
+    (None, None),
+    ("sunrise-sunset", "sunrise-sunset"),  # unsupported: kept as written
+])
+def test_normalize(value, expected):
+    assert h.normalize(value) == expected
+
+def test_overnight_spill_bits():
+    week = h.parse("Th 18:00-01:00; Fr off")
+    fri = 4 * h.DAY_SLOTS
+    assert week >> fri & 1 and week >> (fri + 3) & 1 and not week >> (fri + 4) & 1
+
+def test_unsupported_selector():
+    with pytest.raises(ValueError):
+        h.parse("Jan-Mar Mo 10:00-12:00")
+
+def test_format_week_parse_round_trip():
+    rng = random.Random(0)
+    for _ in range(2000):
+        week = 0
+        for _ in range(rng.randint(0, 8)):
+            start, n = rng.randrange(h.WEEK_SLOTS), rng.randint(1, 200)
+            week |= sum(1 << ((start + k) % h.WEEK_SLOTS) for k in range(n))
+        assert h.parse(h.format_week(week)) == week, h.format_week(week)
+        assert h.unpack(h.pack(week)) == week
+
+def test_open_at_matches_open_matrix():
+    weeks = [h.parse(s) for s in ("24/7", "Fr 18:00-02:00", "Mo-Fr 09:00-17:00", "off")]
+    bits = h.to_array(weeks)
+    matrix = h.open_matrix(bits)
+    assert matrix.shape == (4, h.WEEK_SLOTS)
+    for slot in range(h.WEEK_SLOTS):
+        assert np.array_equal(h.open_at(bits, slot), matrix[:, slot])
+        assert list(matrix[:, slot]) == [bool(w >> slot & 1) for w in weeks]
+
+def test_week_slot_uses_local_offset():
+    # Monday 05:00 UTC is 09:00 in Muscat (UTC+4)
+    assert h.week_slot(datetime(2026, 10, 19, 5, 0, tzinfo=timezone.utc)) == 9 * 4
+    assert h.week_slot(datetime(2026, 10, 19, 9, 0)) == 9 * 4
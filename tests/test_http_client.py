@@ -0,0 +1,51 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from scripts.utils import http_client
+from scripts.utils.http_client import HttpClient, cache_key
+
+class Handler(BaseHTTPRequestHandler):
+    hits = 0
+
+    def do_GET(self):
+        Handler.hits += 1
+        body = (self.headers.get("Accept-Language") or "-").encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture(scope="module")
+def base():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_port}"
+    srv.shutdown()
+
+def test_cache_key_varies_on_response_headers():
+    url = "https://api.example/places"
+    plain = cache_key("GET", url, {"q": "x"})
+    assert cache_key("GET", url, {"q": "x"}, headers={"X-Trace": "1"}) == plain  # not a vary header
+    a = cache_key("GET", url, {"q": "x"}, headers={"Authorization": "key-a"})
+    assert a != plain
+    assert cache_key("GET", url, {"q": "x"}, headers={"authorization": "key-a"}) == a
+    assert cache_key("GET", url, {"q": "x"}, headers={"Authorization": "key-b"}) != a
+
+def test_cached_body_is_per_language(base, tmp_path):
+    http = HttpClient(cache_dir=tmp_path, mode="online")
+    Handler.hits = 0
+    get = lambda lang: http.get(f"{base}/x", headers={"Accept-Language": lang}, ttl=http_client.HOUR)
+    assert get("en").text == "en"
+    assert get("ar").text == "ar"
+    assert get("en").from_cache and get("ar").text == "ar"
+    assert Handler.hits == 2
+
+    http.get(f"{base}/x", headers={"Authorization": "key-secret"}, ttl=http_client.HOUR)
+    assert Handler.hits == 3  # other credentials: not served from the cache
+    assert not any("key-secret" in p.read_text() for p in tmp_path.rglob("*.json"))
@@ -0,0 +1,83 @@
+import asyncio, socket, threading, time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from scripts.qa import link_checker as lc
+
+class Handler(BaseHTTPRequestHandler):
+    hits = []
+
+    def _reply(self, head):
+        Handler.hits.append((self.command, self.path))
+        if self.path == "/ok":
+            self.send_response(200)
+        elif self.path == "/no-head":
+            self.send_response(405 if head else 200)
+        elif self.path == "/old":
+            self.send_response(301)
+            self.send_header("Location", "/older")
+        elif self.path == "/older":
+            self.send_response(302)
+            self.send_header("Location", "/ok")
+        else:
+            self.send_response(404)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def do_HEAD(self):
+        self._reply(head=True)
+
+    def do_GET(self):
+        self._reply(head=False)
+
+    def log_message(self, *args):
+        pass
+
+@pytest.fixture(scope="module")
+def base():
+    srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{srv.server_port}"
+    srv.shutdown()
+
+def closed_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def check(urls, cache, **kw):
+    return asyncio.run(lc.check_links(urls, cache, **kw))
+
+def test_probe_cases(base):
+    refused = f"http://127.0.0.1:{closed_port()}/"
+    urls = [f"{base}/ok", f"{base}/no-head", f"{base}/old", f"{base}/missing", refused]
+    cache = {}
+    Handler.hits.clear()
+    assert check(urls, cache) == len(urls)
+
+    assert cache[f"{base}/ok"]["status"] == 200 and cache[f"{base}/ok"]["chain"] == []
+    assert cache[f"{base}/no-head"]["status"] == 200  # HEAD 405, then GET
+    assert ("GET", "/no-head") in Handler.hits
+    old = cache[f"{base}/old"]
+    assert old["status"] == 200 and old["final_url"] == f"{base}/ok"
+    assert old["chain"] == [[301, "/older"], [302, "/ok"]]
+    assert cache[f"{base}/missing"]["status"] == 404
+    assert cache[refused]["status"] is None and "ConnectionError" in cache[refused]["error"]
+
+    report = lc.summarize({u: ["place"] for u in urls}, cache)
+    assert {d["url"] for d in report["dead"]} == {f"{base}/missing", refused}
+    assert [r["url"] for r in report["redirected"]] == [f"{base}/old"]
+
+def test_cache_ttl(base):
+    url, now = f"{base}/ok", time.time()
+    cache = {}
+    assert check([url], cache, now=now) == 1
+    Handler.hits.clear()
+    assert check([url], cache, now=now + 60) == 0  # fresh: reused
+    assert Handler.hits == []
+    assert check([url], cache, now=now + lc.OK_TTL + 1) == 1  # stale: probed again
+
+    dead = f"{base}/missing"
+    check([dead], cache, now=now)
+    assert check([dead], cache, now=now + lc.FAIL_TTL + 1) == 1  # failures expire sooner
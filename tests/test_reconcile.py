@@ -0,0 +1,75 @@
+import random
+
+import pytest
+
+from scripts.bench import synth
+from scripts.build import reconcile_merge as rm
+from scripts.build.reconcile_state import IdRegistry, record_keys
+from scripts.build.spatial_index import GridIndex
+from scripts.build.utils import haversine_m
+
+@pytest.fixture(scope="module")
+def raw_dir(tmp_path_factory):
+    return synth.generate(400, tmp_path_factory.mktemp("synth"), seed=3) / "raw"
+
+@pytest.fixture
+def build(raw_dir, monkeypatch):
+    monkeypatch.setattr(rm, "RAW_DIR", raw_dir)
+    def run(registry, engine="batch", rematch=False):
+        return rm.build_places(engine=engine, registry=registry, rematch=rematch)[0]
+    return run
+
+def test_engines_agree(build):
+    expected = build(IdRegistry(), engine="brute")
+    assert len(expected) > 300
+    for engine in rm.ENGINES:
+        assert build(IdRegistry(), engine=engine) == expected, engine
+
+def test_second_run_and_full_keep_ids(build, tmp_path):
+    path = tmp_path / "id_registry.json"
+    registry = IdRegistry()
+    first = build(registry)
+    ids = [p["id"] for p in first]
+    assert len(set(ids)) == len(ids)
+    registry.save(path)
+
+    assert build(IdRegistry.load(path)) == first  # every record attached by lookup
+    full = build(IdRegistry.load(path), rematch=True)  # --full
+    assert [p["id"] for p in full] == ids
+
+def test_changed_record_is_rematched():
+    registry = IdRegistry()
+    rec = {"name": "Al Sadaf", "sources": {"osm": {"id": "node/1"}}}
+    key = record_keys("osm", [rec])[0]
+    registry.assign([key], "bestmuscat:restaurant:", "al-sadaf", set(), ["h1"])
+    assert registry.get(key, "h1") == "bestmuscat:restaurant:al-sadaf"
+    assert registry.get(key, "h2") is None  # changed upstream: fuzzy path
+    # the re-matched record keeps its id when it lands in a cluster on its own
+    assert registry.assign([key], "bestmuscat:restaurant:", "al-sadaf-express", set(), ["h2"]) \
+        == "bestmuscat:restaurant:al-sadaf"
+    assert registry.get(key, "h2") == "bestmuscat:restaurant:al-sadaf"
+
+def test_grid_index_finds_every_neighbour():
+    rng = random.Random(1)
+    pts = [(23.5 + rng.random() * 0.05, 58.3 + rng.random() * 0.05) for _ in range(500)]
+    index = GridIndex(150, max_abs_lat=24)
+    for k, (lat, lon) in enumerate(pts):
+        index.add(k, lat, lon)
+    for lat, lon in pts[:100]:
+        near = index.near(lat, lon)
+        assert near == sorted(near)
+        assert {k for k, p in enumerate(pts) if haversine_m(lat, lon, *p) <= 150} <= set(near)
+
+def osm(i, name, lat, lon):
+    return {"name": name, "category": "restaurant", "location": {"lat": lat, "lon": lon, "address": None},
+            "contacts": {"website": None}, "sources": {"osm": {"id": f"node/{i}"}}}
+
+def test_duplicate_chains_fold_into_one():
+    # 1 ~ 3 and 3 ~ 4 (100 m apart each) but 1 and 4 are 200 m apart: union-find still joins all three
+    recs = [osm(1, "Al Sadaf Restaurant", 23.5880, 58.3829), osm(2, "Bait Al Luban", 23.6000, 58.4000),
+            osm(3, "Al Sadaf", 23.5889, 58.3829), osm(4, "Al Sadaf Restaurant", 23.5898, 58.3829)]
+    merged = []
+    keep = rm.cluster_duplicates(recs, 24, lambda t, c: merged.append((t["sources"]["osm"]["id"], c["sources"]["osm"]["id"])))
+    assert [r["name"] for r in keep] == ["Al Sadaf Restaurant", "Bait Al Luban"]
+    assert sorted(merged) == [("node/1", "node/3"), ("node/1", "node/4")]
+    assert keep[0]["sources"]["osm"]["duplicates"] == ["node/3", "node/4"]